@@ -1,36 +1,183 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory, Response, stream_with_context
 import sqlite3
 import datetime
 import requests
 import os
-import pickle
-import pandas as pd
+import json
+import base64
+import functools
+import hashlib
+import hmac
+import mimetypes
+import atexit
+import logging
+import threading
+import time
+from werkzeug import formparser
+from werkzeug.exceptions import NotFound
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.utils import secure_filename
+from assets import IMMUTABLE_MAX_AGE, FragmentCache, StaticAssets
+from appointments import PAGE_SIZE as APPOINTMENTS_PAGE_SIZE, AppointmentQuery, ChangeFeed, MAX_CHANGES, appointment_dict, changes_since, get_appointment, latest_seq
+from cache import ResponseCache, SQLiteCache, TTLCache
+from credentials import SCRYPT_N, CredentialVerifier, PasswordHasher, RateLimiter, VerifierBusy
+from db_pool import ConnectionPool
+from file_delivery import FileDelivery, file_digest
+from doctor_directory import DEFAULT_LIMIT, INLINE_LIMIT, MAX_LIMIT, DoctorDirectory
+from geo_index import DoctorGeoIndex, haversine_km, rank_score
+from health_analytics import HistoryEntry, clamp_days, specialty_demand, symptom_timeline, top_symptoms
+from history_writer import HistoryWriter
+from llm_client import GeminiClient, UpstreamUnavailable
+from metrics import (LOG_SAMPLE_RATE, finish_request, gemini_request_duration, gemini_stream_duration, log_event,
+                     model_batch_size, model_inference_duration, record_query, record_uploads,
+                     registry as metrics_registry, start_request)
+from migrations import hash_plaintext_passwords, migrate
+import record_storage
+from record_storage import TooManySessions, UploadStateError, UploadTooLarge
+from scheduling import SlotFinder, SlotUnavailable, replace_schedule
+from shared_state import SharedVersions
+from session_store import AnalysisStore, ServerSideSessionInterface, SessionStore
+from predictor import MAX_BATCH_SIZE, ModelStore, encode, predict_batch as score_batch, read_symptom_list
+from symptom_graph import SymptomGraph
+from symptom_matcher import SymptomMatcher
 
 
 # Initialization
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"  
-DB_NAME = "health.db"
+# Behind a reverse proxy every request comes from the proxy's address, so the
+# per-IP login limiter would put all clients in one bucket. TRUSTED_PROXY_HOPS
+# is how many proxies in front of the app append X-Forwarded-For/-Proto;
+# request.remote_addr then comes from those entries. Leave it 0 when clients
+# connect directly, or they could pick their own address with the header.
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+DB_NAME = os.environ.get("HEALTH_DB", "health.db")
+
+def convert_plaintext_passwords():
+    try:
+        converted = hash_plaintext_passwords(DB_NAME, max_workers=2)
+    except Exception as e:
+        log_event("passwords.conversion_failed", level=logging.ERROR, error=str(e))
+        return
+    if converted:
+        log_event("passwords.converted", rows=converted)
+
+# Upgrade an existing database in place (new indexes/columns) before serving.
+# Legacy plaintext passwords are then hashed in short batches on a background
+# thread, so startup does not wait for the KDF and logins keep working meanwhile
+if os.path.exists(DB_NAME):
+    migrate(DB_NAME)
+    threading.Thread(target=convert_plaintext_passwords, name="password-conversion", daemon=True).start()
 
 
 UPLOAD_FOLDER = 'C:/Users/hp/OneDrive/Desktop/Doctormerging/uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024            # single-request uploads
+MAX_RESUMABLE_UPLOAD_BYTES = 200 * 1024 * 1024  # large scans sent in chunks
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Werkzeug rejects larger bodies from Content-Length before reading them
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Record files: strong ETags, Range support, optional hand-off to a front proxy.
+# Set USE_X_SENDFILE=1 for Apache/lighttpd, or X_ACCEL_REDIRECT_PREFIX to the
+# nginx internal location that aliases UPLOAD_FOLDER.
+app.config['USE_X_SENDFILE'] = os.environ.get("USE_X_SENDFILE") == "1"
+file_delivery = FileDelivery(
+    UPLOAD_FOLDER,
+    accel_prefix=os.environ.get("X_ACCEL_REDIRECT_PREFIX"),
+    max_age=int(os.environ.get("RECORD_MAX_AGE", 3600))
+)
+# (records version, user_id, record_id) -> record metadata
+record_lookup_cache = TTLCache(max_entries=4096, ttl=300)
+
 # Gemini API configuration 
-GEMINI_API_KEY = "GEMINI_API_KEY" 
-API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent"
+GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "GEMINI_API_KEY")
+GEMINI_API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-2.5-flash")
+gemini = GeminiClient(
+    GEMINI_API_BASE, GEMINI_API_KEY, GEMINI_MODEL,
+    connect_timeout=3.05, read_timeout=float(os.environ.get("GEMINI_READ_TIMEOUT", 30)),
+    max_concurrency=int(os.environ.get("GEMINI_MAX_CONCURRENCY", 8)),
+    on_call=lambda method, seconds, outcome: gemini_request_duration.observe(seconds, method, outcome)
+)
+
+# Chatbot reply cache: in-process LRU, plus a persistent SQLite tier when CHAT_CACHE_DB is set
+CHAT_CACHE_TTL = int(os.environ.get("CHAT_CACHE_TTL", 24 * 3600))
+CHAT_CACHE_DB = os.environ.get("CHAT_CACHE_DB")
+chat_cache = ResponseCache(
+    TTLCache(max_entries=2048, ttl=CHAT_CACHE_TTL),
+    SQLiteCache(CHAT_CACHE_DB, table="chat_responses", ttl=CHAT_CACHE_TTL) if CHAT_CACHE_DB else None
+)
+
+
+# Server-side sessions: the cookie holds only an opaque id, the data lives in
+# SESSION_DB behind a short-lived per-process cache. Expired rows are swept
+# periodically by SQLiteCache. Analysis results are stored by reference.
+SESSION_DB = os.environ.get("SESSION_DB", "sessions.db")
+SESSION_LIFETIME = int(os.environ.get("SESSION_LIFETIME", 7 * 24 * 3600))
+SESSION_MEMORY_TTL = int(os.environ.get("SESSION_MEMORY_TTL", 30))
+app.session_interface = ServerSideSessionInterface(
+    SessionStore(
+        SQLiteCache(SESSION_DB, table="sessions", ttl=SESSION_LIFETIME),
+        TTLCache(max_entries=4096, ttl=SESSION_MEMORY_TTL) if SESSION_MEMORY_TTL > 0 else None
+    ),
+    lifetime=SESSION_LIFETIME
+)
+analysis_store = AnalysisStore(SQLiteCache(SESSION_DB, table="analysis_results", ttl=SESSION_LIFETIME))
+
+# Passwords are scrypt hashes verified on a small bounded pool (SCRYPT_N sets
+# the cost of new hashes). Login attempts are throttled per email and per client IP.
+credential_verifier = CredentialVerifier(PasswordHasher(n=int(os.environ.get("SCRYPT_N", SCRYPT_N))))
+login_email_limiter = RateLimiter(capacity=5, refill_per_sec=1 / 60)
+login_ip_limiter = RateLimiter(capacity=30, refill_per_sec=0.5)
 
 
 #  Utility Functions
+# One pooled WAL connection per request; conn.close() inside a request is a no-op
+# and the connection goes back to the pool when the app context ends.
+db_pool = ConnectionPool(DB_NAME, max_size=8, timeout=10, on_query=record_query)
+db_pool.init_app(app)
+
 def get_connection():
-    conn = sqlite3.connect(DB_NAME, timeout=10)
-    conn.row_factory = sqlite3.Row  # Access columns by name
-    return conn
+    return db_pool.connection()
+
+# Set by serve.py while a worker finishes its in-flight requests before exiting
+draining = threading.Event()
+
+# Doctor panels follow Appointment_Changes through this feed; call
+# change_feed.notify() after committing an appointment write. Open streams
+# end when the worker starts draining.
+change_feed = ChangeFeed(db_pool.acquire, stopping=draining)
+
+# Writes to cached tables bump Cache_Versions counters (by trigger); each process
+# re-reads them at most every SHARED_STATE_INTERVAL seconds to drop stale copies
+# made before another worker's write.
+shared_versions = SharedVersions(DB_NAME, check_interval=float(os.environ.get("SHARED_STATE_INTERVAL", 1.0)))
+
+# Symptoms, Recommendations, Specialties, Doctors and the mapping tables are
+# served from memory; call symptom_graph.invalidate() after writing to them.
+# Other processes' writes are picked up through shared_versions.
+symptom_graph = SymptomGraph(get_connection, shared=shared_versions)
+# Free-text symptom matching over the graph's Symptoms, with the model's
+# symptom_list.csv names as extra aliases; follows symptom_graph's version.
+symptom_matcher = SymptomMatcher(symptom_graph, lambda: read_symptom_list("symptom_list.csv"))
+# Grid index over Doctors.location_lat/lon, rebuilt when symptom_graph's version changes
+doctor_locator = DoctorGeoIndex(symptom_graph, get_connection)
+# Bookable doctors in name order with prefix search, also following symptom_graph's
+# version; serves the booking dropdown and /api/doctors
+doctor_directory = DoctorDirectory(symptom_graph, get_connection, TTLCache(max_entries=1024, ttl=3600))
+# Free slots from Doctor_Schedule minus booked Appointments; also does atomic booking
+slot_finder = SlotFinder(get_connection)
+# Health_History rows are committed in batches by a background thread on its
+# own connection (never a pooled one); whatever is still queued is written at
+# interpreter exit.
+history_writer = HistoryWriter(lambda: sqlite3.connect(DB_NAME, timeout=10))
+atexit.register(history_writer.close)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -40,6 +187,38 @@ def utility_processor():
     return dict(datetime=datetime)
 app.context_processor(utility_processor)
 
+# static/ files are linked through asset_url(), which adds a content hash so
+# they can be cached as immutable. Rendered HTML that depends only on reference
+# data (or nothing) is kept in fragment_cache, keyed by the data's version.
+static_assets = StaticAssets(app)
+fragment_cache = FragmentCache(TTLCache(max_entries=256, ttl=24 * 3600))
+
+# Dashboard sections with no per-user markup: rendered once, served from
+# /patient_section/<name> and fetched by the page the first time they are shown
+STATIC_PATIENT_SECTIONS = ('chat', 'records', 'prediction')
+patient_section_urls = {}
+
+def patient_section(name):
+    return fragment_cache.get(('patient_section', name), None,
+                              lambda: render_template(f"patient/_{name}.html"))
+
+def patient_section_url(name):
+    # url_for is a noticeable share of the dashboard's render time; the URL only
+    # changes with the fragment's digest
+    key = (request.script_root, name, patient_section(name).digest)
+    url = patient_section_urls.get(key)
+    if url is None:
+        url = patient_section_urls[key] = url_for('patient_section_fragment', name=name, v=key[2])
+    return url
+
+app.jinja_env.globals.update(static_patient_sections=STATIC_PATIENT_SECTIONS, patient_section=patient_section,
+                             patient_section_url=patient_section_url)
+
+def preload_templates():
+    """Compile every template into Jinja's cache now instead of on first use."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
 
 #  File Upload Routes
 @app.route('/uploads/<filename>')
@@ -53,48 +232,89 @@ def upload_record():
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Login required'}), 401
 
-    # Check if file is in request
-    if 'document_file' not in request.files:
-        return jsonify({'status': 'error', 'message': 'No file uploaded'}), 400
-    
-    file = request.files['document_file']
-    description = request.form.get('document_description', '').strip()
     user_id = session['user_id']
+    writers = []
 
-    # Validate file
-    if file.filename == '':
-        return jsonify({'status': 'error', 'message': 'No file selected'}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({'status': 'error', 'message': 'Invalid file type. Only PDF, JPG, JPEG, PNG allowed'}), 400
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        writer = record_storage.BlobWriter(app.config['UPLOAD_FOLDER'], MAX_UPLOAD_BYTES)
+        writers.append(writer)
+        return writer
 
     try:
-        
+        # Parse the body ourselves instead of through request.files, so each
+        # file part is hashed and written to disk as it arrives rather than
+        # spooled by werkzeug first; duplicates then share one blob
+        try:
+            _, form, files = formparser.parse_form_data(
+                request.environ, stream_factory=stream_factory, silent=False,
+                max_content_length=app.config['MAX_CONTENT_LENGTH'],
+                max_form_memory_size=app.config['MAX_FORM_MEMORY_SIZE'], max_form_parts=10)
+        except UploadTooLarge as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 413
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'Malformed upload'}), 400
+        except Exception as e:
+            return jsonify({'status': 'error', 'message': f'Upload failed: {str(e)}'}), 500
+
+        # Check if file is in request
+        if 'document_file' not in files:
+            return jsonify({'status': 'error', 'message': 'No file uploaded'}), 400
+
+        file = files['document_file']
+        description = form.get('document_description', '').strip()
+
+        # Validate file
+        if file.filename == '':
+            return jsonify({'status': 'error', 'message': 'No file selected'}), 400
+
+        if not allowed_file(file.filename):
+            return jsonify({'status': 'error', 'message': 'Invalid file type. Only PDF, JPG, JPEG, PNG allowed'}), 400
+
         original_filename = secure_filename(file.filename)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"user{user_id}_{timestamp}_{original_filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        # Save file to disk
-        file.save(file_path)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
-        file_size_mb = round(file_size / (1024 * 1024), 2)
-        
-        # Save metadata to database
-        conn = get_connection()
-        cursor = conn.cursor()
-        upload_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute("""
-            INSERT INTO UserRecords (user_id, file_name, description, upload_date)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, filename, description if description else original_filename, upload_date))
-        
-        conn.commit()
-        record_id = cursor.lastrowid
-        conn.close()
+        writer = file.stream
+        writers.remove(writer)
+        blob = writer.finish(file.filename.rsplit('.', 1)[1].lower())
+    finally:
+        # Other file parts, or everything on an early return
+        for other in writers:
+            other.discard()
+
+    return save_record(user_id, blob, description if description else original_filename, original_filename)
+
+def format_file_size(size):
+    return f"{round(size / (1024 * 1024), 2)} MB"
+
+def save_record(user_id, blob, description, original_name):
+    """Move a stored upload into place, insert its UserRecords row and build the upload response"""
+    folder = app.config['UPLOAD_FOLDER']
+    try:
+        # Under the blob lock a concurrent delete cannot unlink the blob between
+        # the dedup check and the INSERT that starts referencing it
+        with record_storage.blob_lock(folder):
+            record_storage.commit_blob(folder, blob)
+            try:
+                conn = get_connection()
+                cursor = conn.cursor()
+                upload_date = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+                cursor.execute("""
+                    INSERT INTO UserRecords (user_id, file_name, original_name, description, upload_date,
+                                             file_size, file_digest, mime_type)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, (user_id, blob.file_name, original_name, description, upload_date, blob.size, blob.digest,
+                      blob.mime_type))
+
+                conn.commit()
+                record_id = cursor.lastrowid
+                conn.close()
+            except Exception:
+                # Clean up the blob if the insert fails and nothing else uses it
+                if not blob.deduplicated:
+                    record_storage.remove_blob(folder, blob.file_name)
+                raise
+        # Whether the blob already existed says another user stored the same
+        # document, so it goes to metrics only, never into the response
+        record_uploads.inc('true' if blob.deduplicated else 'false')
 
         # Return success response with record details
         return jsonify({
@@ -102,70 +322,219 @@ def upload_record():
             'message': 'File uploaded successfully',
             'record': {
                 'id': record_id,
-                'file_name': filename,
-                'description': description if description else original_filename,
+                'file_name': blob.file_name,
+                'original_name': original_name,
+                'description': description,
                 'upload_date': upload_date,
-                'file_size': f"{file_size_mb} MB",
-                'download_url': url_for('uploaded_file', filename=filename, _external=False)
+                'file_size': format_file_size(blob.size),
+                'mime_type': blob.mime_type,
+                'digest': blob.digest,
+                'download_url': url_for('uploaded_file', filename=blob.file_name, _external=False)
             }
         })
-        
+
     except Exception as e:
-        # Clean up file if database insert fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        record_storage.discard_upload(blob)
         return jsonify({'status': 'error', 'message': f'Upload failed: {str(e)}'}), 500
 
+# Resumable uploads for large scans:
+#   POST /upload_sessions                 {file_name, total_size, description} -> upload_id
+#   PUT  /upload_sessions/<id>            body = bytes, Content-Range: bytes start-end/total
+#   GET  /upload_sessions/<id>            -> current offset, to resume after a dropped connection
+#   POST /upload_sessions/<id>/complete   -> stores the file and creates the record
+#   DELETE /upload_sessions/<id>          -> abandons the upload
+@app.route('/upload_sessions', methods=['POST'])
+def create_upload_session():
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+
+    data = request.get_json(silent=True) or {}
+    original_filename = secure_filename(data.get('file_name', ''))
+    total_size = data.get('total_size')
+
+    if not original_filename or not allowed_file(original_filename):
+        return jsonify({'status': 'error', 'message': 'Invalid file type. Only PDF, JPG, JPEG, PNG allowed'}), 400
+    if not isinstance(total_size, int) or total_size <= 0:
+        return jsonify({'status': 'error', 'message': 'total_size must be a positive integer'}), 400
+    if total_size > MAX_RESUMABLE_UPLOAD_BYTES:
+        return jsonify({'status': 'error', 'message': f'File exceeds the {MAX_RESUMABLE_UPLOAD_BYTES // (1024 * 1024)} MB limit'}), 413
+
+    try:
+        upload_id = record_storage.create_session(
+            app.config['UPLOAD_FOLDER'], session['user_id'], original_filename,
+            original_filename.rsplit('.', 1)[1].lower(), total_size,
+            (data.get('description') or '').strip() or original_filename
+        )
+    except TooManySessions as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 429
+    return jsonify({
+        'status': 'success',
+        'upload_id': upload_id,
+        'offset': 0,
+        'chunk_size': MAX_UPLOAD_BYTES
+    }), 201
+
+@app.route('/upload_sessions/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_session(upload_id):
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+
+    folder = app.config['UPLOAD_FOLDER']
+    user_id = session['user_id']
+    try:
+        if request.method == 'GET':
+            state = record_storage.load_session(folder, upload_id, user_id)
+            return jsonify({'status': 'success', 'offset': state['offset'], 'total_size': state['total_size']})
+
+        if request.method == 'DELETE':
+            record_storage.abort_session(folder, upload_id, user_id)
+            return jsonify({'status': 'success', 'message': 'Upload cancelled'})
+
+        # Content-Range: bytes <start>-<end>/<total>
+        content_range = request.headers.get('Content-Range', '')
+        try:
+            start = int(content_range.split(' ', 1)[1].split('-', 1)[0])
+        except (IndexError, ValueError):
+            return jsonify({'status': 'error', 'message': 'Content-Range header required'}), 400
+
+        offset = record_storage.append_chunk(folder, upload_id, user_id, start, request.stream)
+        return jsonify({'status': 'success', 'offset': offset})
+
+    except UploadTooLarge as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 413
+    except UploadStateError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409 if request.method == 'PUT' else 404
+
+@app.route('/upload_sessions/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+
+    try:
+        state, blob = record_storage.complete_session(
+            app.config['UPLOAD_FOLDER'], upload_id, session['user_id']
+        )
+    except UploadStateError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 409
+
+    return save_record(session['user_id'], blob, state['description'], state['file_name'])
+
+RECORDS_PAGE_SIZE = 50
+RECORDS_MAX_PAGE_SIZE = 200
+
+def encode_records_cursor(upload_date, record_id):
+    return base64.urlsafe_b64encode(f"{upload_date}|{record_id}".encode()).decode()
+
+def decode_records_cursor(cursor_value):
+    upload_date, record_id = base64.urlsafe_b64decode(cursor_value.encode()).decode().rsplit('|', 1)
+    return upload_date, int(record_id)
+
 @app.route('/get_records', methods=['GET'])
 def get_records():
-    """Fetch all records for the logged-in user"""
+    """Fetch the logged-in user's records, newest first, one page at a time"""
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Login required'}), 401
 
     user_id = session['user_id']
+    limit = min(max(request.args.get('limit', RECORDS_PAGE_SIZE, type=int), 1), RECORDS_MAX_PAGE_SIZE)
+    page_cursor = request.args.get('cursor')
+    try:
+        after = decode_records_cursor(page_cursor) if page_cursor else None
+    except (ValueError, UnicodeDecodeError):
+        return jsonify({'status': 'error', 'message': 'Invalid cursor'}), 400
     
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        
+
+        # Records are only ever inserted or deleted, so count + id aggregates identify
+        # the list's state; answer unchanged lists with 304 before touching any rows.
         cursor.execute("""
-            SELECT record_id, file_name, description, upload_date
-            FROM UserRecords
-            WHERE user_id=?
-            ORDER BY upload_date DESC
+            SELECT COUNT(*) AS total, MAX(record_id) AS max_id, TOTAL(record_id) AS id_sum
+            FROM UserRecords WHERE user_id=?
         """, (user_id,))
+        summary = cursor.fetchone()
+        etag = hashlib.md5(
+            f"{user_id}:{summary['total']}:{summary['max_id']}:{summary['id_sum']}:{page_cursor}:{limit}".encode()
+        ).hexdigest()
+        if request.if_none_match.contains(etag):
+            conn.close()
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        # Keyset pagination on (upload_date, record_id) using idx_userrecords_user_page
+        if after:
+            cursor.execute("""
+                SELECT record_id, file_name, original_name, description, upload_date, file_size, mime_type
+                FROM UserRecords
+                WHERE user_id=? AND (upload_date, record_id) < (?, ?)
+                ORDER BY upload_date DESC, record_id DESC
+                LIMIT ?
+            """, (user_id, after[0], after[1], limit + 1))
+        else:
+            cursor.execute("""
+                SELECT record_id, file_name, original_name, description, upload_date, file_size, mime_type
+                FROM UserRecords
+                WHERE user_id=?
+                ORDER BY upload_date DESC, record_id DESC
+                LIMIT ?
+            """, (user_id, limit + 1))
         
         records = cursor.fetchall()
-        conn.close()
+        has_more = len(records) > limit
+        records = records[:limit]
 
         # Convert records to list of dictionaries
         records_list = []
         for r in records:
+            file_size = r['file_size']
+            if file_size is None:
+                # Rows uploaded before sizes were stored: stat once and persist
+                file_size = backfill_record_metadata(conn, r)
+
             record_dict = {
                 'id': r['record_id'],
                 'file_name': r['file_name'],
+                'original_name': r['original_name'] or r['file_name'],
                 'description': r['description'] if r['description'] else 'Medical Document',
                 'upload_date': r['upload_date'],
+                'mime_type': r['mime_type'],
                 'download_url': url_for('uploaded_file', filename=r['file_name'], _external=False)
             }
-            
-            # Add file size if file exists
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], r['file_name'])
-            if os.path.exists(file_path):
-                file_size = os.path.getsize(file_path)
-                record_dict['file_size'] = f"{round(file_size / (1024 * 1024), 2)} MB"
+            if file_size is not None:
+                record_dict['file_size'] = format_file_size(file_size)
             
             records_list.append(record_dict)
 
-        return jsonify({
+        conn.close()
+
+        next_cursor = encode_records_cursor(records[-1]['upload_date'], records[-1]['record_id']) if has_more else None
+        response = jsonify({
             'status': 'success',
             'records': records_list,
-            'total': len(records_list)
+            'total': summary['total'],
+            'next_cursor': next_cursor
         })
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Failed to fetch records: {str(e)}'}), 500
 
+def backfill_record_metadata(conn, record):
+    """Store size and MIME type for a legacy record; returns the size or None if the file is gone"""
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], record['file_name'])
+    if not os.path.exists(file_path):
+        return None
+    file_size = os.path.getsize(file_path)
+    mime_type = record['mime_type'] or mimetypes.guess_type(record['file_name'])[0]
+    conn.execute("UPDATE UserRecords SET file_size=?, mime_type=? WHERE record_id=?",
+                 (file_size, mime_type, record['record_id']))
+    conn.commit()
+    return file_size
+
 @app.route('/delete_record', methods=['POST'])
 def delete_record():
     """Delete a record and its associated file"""
@@ -196,19 +565,26 @@ def delete_record():
             return jsonify({'status': 'error', 'message': 'Record not found or access denied'}), 404
         
         file_name = record['file_name']
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
-        
-        # Delete from database
-        cursor.execute("DELETE FROM UserRecords WHERE record_id=? AND user_id=?", (record_id, user_id))
-        conn.commit()
-        conn.close()
-        
-        # Delete physical file if it exists
-        if os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"Warning: Could not delete file {file_path}: {e}")
+        folder = app.config['UPLOAD_FOLDER']
+
+        # Uploads are content-addressed, so other records may share this file.
+        # The blob lock keeps a concurrent upload of the same document from
+        # reusing the blob between the reference check and the unlink
+        with record_storage.blob_lock(folder):
+            cursor.execute("DELETE FROM UserRecords WHERE record_id=? AND user_id=?", (record_id, user_id))
+            cursor.execute("SELECT 1 FROM UserRecords WHERE file_name=? LIMIT 1", (file_name,))
+            still_referenced = cursor.fetchone() is not None
+            conn.commit()
+            conn.close()
+
+            # Delete physical file if it exists
+            if not still_referenced:
+                try:
+                    record_storage.remove_blob(folder, file_name)
+                except Exception as e:
+                    log_event("record.blob_delete_failed", level=logging.WARNING, file_name=file_name, error=str(e))
+        # Re-read the counters now so this process stops serving the record at once
+        shared_versions.refresh()
         
         return jsonify({
             'status': 'success', 
@@ -220,92 +596,69 @@ def delete_record():
         conn.close()
         return jsonify({'status': 'error', 'message': f'Delete failed: {str(e)}'}), 500
 
+def lookup_record(user_id, record_id):
+    """Ownership check plus the metadata needed to serve a record, cached per (user, record)"""
+    # Any UserRecords delete/move, in any process, moves the 'records' counter
+    # and so retires every cached entry
+    key = (shared_versions.get('records'), user_id, record_id)
+    record = record_lookup_cache.get(key)
+    if record is not None:
+        return record
+
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT record_id, file_name, original_name, file_digest, mime_type, upload_date FROM UserRecords
+        WHERE record_id=? AND user_id=?
+    """, (record_id, user_id)).fetchone()
+    if not row:
+        conn.close()
+        return None
+    record = dict(row)
+    if not record['file_digest'] and file_delivery.exists(record):
+        # Legacy upload: hash it once so later requests get a strong ETag
+        record['file_digest'] = file_digest(os.path.join(app.config['UPLOAD_FOLDER'], record['file_name']))
+        conn.execute("UPDATE UserRecords SET file_digest=? WHERE record_id=?",
+                     (record['file_digest'], record_id))
+        conn.commit()
+    conn.close()
+    record_lookup_cache.set(key, record)
+    return record
+
+def send_record(record_id, as_attachment):
+    if 'user_id' not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+
+    record = lookup_record(session['user_id'], record_id)
+    if not record:
+        return jsonify({
+            'status': 'error',
+            'message': 'Record not found or access denied'
+        }), 404
+
+    try:
+        return file_delivery.send(record, as_attachment)
+    except NotFound:
+        return jsonify({
+            'status': 'error',
+            'message': 'File not found on server. It may have been deleted.'
+        }), 404
+
 @app.route('/download_record/<int:record_id>')
 def download_record(record_id):
     """Download a specific record file"""
-    if 'user_id' not in session:
-        return jsonify({'status': 'error', 'message': 'Login required'}), 401
-    
-    user_id = session['user_id']
-    
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT file_name FROM UserRecords 
-            WHERE record_id=? AND user_id=?
-        """, (record_id, user_id))
-        
-        record = cursor.fetchone()
-        conn.close()
-        
-        if not record:
-            return jsonify({
-                'status': 'error',
-                'message': 'Record not found or access denied'
-            }), 404
-        
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], record['file_name'])
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return jsonify({
-                'status': 'error',
-                'message': 'File not found on server. It may have been deleted.'
-            }), 404
-        
-        return send_from_directory(
-            app.config['UPLOAD_FOLDER'], 
-            record['file_name'],
-            as_attachment=True  # Force download
-        )
-    
+        return send_record(record_id, as_attachment=True)  # Force download
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Error downloading file: {str(e)}'
         }), 500
+
 @app.route('/view_record/<int:record_id>')
 def view_record(record_id):
-    """View a specific record file in browser"""
-    if 'user_id' not in session:
-        return jsonify({'status': 'error', 'message': 'Login required'}), 401
-    
-    user_id = session['user_id']
-    
+    """View a specific record file in browser (Range requests let PDF viewers fetch pages lazily)"""
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT file_name FROM UserRecords 
-            WHERE record_id=? AND user_id=?
-        """, (record_id, user_id))
-        
-        record = cursor.fetchone()
-        conn.close()
-        
-        if not record:
-            return jsonify({
-                'status': 'error',
-                'message': 'Record not found or access denied'
-            }), 404
-        
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], record['file_name'])
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            return jsonify({
-                'status': 'error',
-                'message': 'File not found on server. It may have been deleted.'
-            }), 404
-        
-        # Serve the file for viewing (inline display)
-        return send_from_directory(
-            app.config['UPLOAD_FOLDER'], 
-            record['file_name'],
-            as_attachment=False  # Display in browser instead of download
-        )
-    
+        return send_record(record_id, as_attachment=False)  # Display in browser instead of download
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -314,99 +667,296 @@ def view_record(record_id):
 
     
 #  Symptom / Recommendations
-def fetch_symptoms(symptom_list):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholders = ','.join(['?']*len(symptom_list))
-    cursor.execute(f"""
-        SELECT symptom_id, symptom_name, doctor_advice, priority
-        FROM Symptoms
-        WHERE LOWER(symptom_name) IN ({placeholders})
-    """, symptom_list)
-    results = cursor.fetchall()
-    conn.close()
-
-    symptoms_data = [{'id': r['symptom_id'], 'name': r['symptom_name'], 'advice': r['doctor_advice'], 'priority': r['priority']} for r in results]
+def fetch_symptoms(symptoms_text):
+    """Match free text (or a comma list) to symptoms; keeps the 3 best by match score, then priority"""
+    matches = symptom_matcher.match(symptoms_text)
+    symptoms_data = [s for s, _ in matches]
 
     if len(symptoms_data) > 3:
-        symptoms_data.sort(key=lambda x: x['priority'], reverse=True)
+        score = {s['id']: sc for s, sc in matches}
+        symptoms_data = sorted(symptoms_data, key=lambda x: (score[x['id']], x['priority']), reverse=True)
         symptoms_data = symptoms_data[:3]
 
     final_symptom_ids = [s['id'] for s in symptoms_data]
     return final_symptom_ids, symptoms_data
 
 def fetch_recommendations(symptom_ids):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholders = ','.join(['?']*len(symptom_ids))
-    cursor.execute(f"""
-        SELECT DISTINCT R.rec_name, R.rec_type, R.instructions, R.disclaimer
-        FROM Symptom_Recommendation_Mapping M
-        JOIN Recommendations R ON M.rec_id = R.rec_id
-        WHERE M.symptom_id IN ({placeholders})
-        ORDER BY R.rec_type, R.rec_name
-    """, symptom_ids)
-    recommendations_list = cursor.fetchall()
-    conn.close()
-    return recommendations_list
-
-def fetch_doctors(symptom_ids):
-    conn = get_connection()
-    cursor = conn.cursor()
-    placeholders = ','.join(['?']*len(symptom_ids))
-    cursor.execute(f"""
-        SELECT DISTINCT S.specialty_id, S.specialty_name
-        FROM Symptom_Specialty_Mapping M
-        JOIN Specialties S ON M.specialty_id = S.specialty_id
-        WHERE M.symptom_id IN ({placeholders})
-    """, symptom_ids)
-    required_specialties = cursor.fetchall()
-    specialty_ids = [s['specialty_id'] for s in required_specialties]
-
-    doctors_found = []
-    if specialty_ids:
-        spec_placeholders = ','.join(['?']*len(specialty_ids))
-        cursor.execute(f"""
-            SELECT doctor_id, name, rating, experience, availability, specialty_id, biography
-            FROM Doctors
-            WHERE specialty_id IN ({spec_placeholders})
-            ORDER BY rating DESC, experience DESC
-        """, specialty_ids)
-        doctors_found = cursor.fetchall()
-    conn.close()
-    return required_specialties, doctors_found
-
-def log_history(user_id, symptom_names, recommendations_count, doctors_count):
-    conn = get_connection()
-    cursor = conn.cursor()
+    return symptom_graph.recommendations(symptom_ids)
+
+def fetch_doctors(symptom_ids, location=None):
+    """Doctors for the symptoms' specialties; with a (lat, lon) they are ranked by rating and distance"""
+    specialties, doctors = symptom_graph.doctors(symptom_ids)
+    if location and doctors:
+        locations = doctor_locator.index().locations
+
+        def score(doctor):
+            pos = locations.get(doctor['doctor_id'])
+            if pos is None:
+                return -1.0   # no location: after every located doctor
+            return rank_score(haversine_km(location[0], location[1], pos[0], pos[1]), doctor['rating'])
+        doctors = sorted(doctors, key=score, reverse=True)
+    return specialties, doctors
+
+def parse_location(lat, lon):
+    """(lat, lon) floats from request values, or None if missing/invalid"""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+def log_history(user_id, symptoms_data, specialties, recommendations_count, doctors_count):
+    """Queue the analysis for Health_History and the rollups; the commit happens off the request path."""
     today = datetime.date.today().strftime('%Y-%m-%d')
-    symptom_summary = ", ".join([s.title() for s in symptom_names])
+    symptom_summary = ", ".join([s['name'].title() for s in symptoms_data])
     remedy_summary = f"Remedies: {recommendations_count} | Doctors: {doctors_count}"
-
-    try:
-        cursor.execute("""
-            INSERT INTO Health_History (user_id, symptom_name, remedy_suggested, date_recorded)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, symptom_summary, remedy_summary, today))
-        conn.commit()
-    except Exception as e:
-        print(f"Flask History Log Error: {e}")
-    finally:
-        conn.close()
-
+    history_writer.submit(HistoryEntry(
+        user_id, today, symptom_summary, remedy_summary,
+        [s['id'] for s in symptoms_data], [s['specialty_id'] for s in specialties]))
+
+@app.route("/match_symptoms")
+def match_symptoms():
+    """Ranked symptom matches for free text, e.g. for suggestions while typing"""
+    text = request.args.get("q", "").strip()
+    if not text:
+        return jsonify({'status': 'error', 'message': 'q is required'}), 400
+    matches = symptom_matcher.match(text, limit=request.args.get("limit", 10, type=int))
+    return jsonify({
+        'status': 'success',
+        'matches': [{'id': s['id'], 'name': s['name'], 'score': score} for s, score in matches]
+    })
+
+@app.route("/doctors_nearby")
+def doctors_nearby():
+    """
+    Doctors near a point: ?lat=&lon= plus optional k (default 10), radius_km,
+    specialty_id (repeatable), symptoms (free text, mapped to specialties) and
+    sort=score (rating + distance, default) or sort=distance.
+    """
+    location = parse_location(request.args.get("lat"), request.args.get("lon"))
+    if location is None:
+        return jsonify({'status': 'error', 'message': 'Valid lat and lon are required'}), 400
+    k = max(1, min(request.args.get("k", 10, type=int), 100))
+    radius_km = request.args.get("radius_km", type=float)
+    if radius_km is not None and not 0 < radius_km <= 500:
+        return jsonify({'status': 'error', 'message': 'radius_km must be between 0 and 500'}), 400
+
+    specialty_ids = set(request.args.getlist("specialty_id", type=int))
+    symptoms_text = request.args.get("symptoms", "").strip()
+    if symptoms_text:
+        symptom_ids = [s['id'] for s, _ in symptom_matcher.match(symptoms_text)]
+        specialties, _ = symptom_graph.doctors(symptom_ids)
+        specialty_ids.update(s['specialty_id'] for s in specialties)
+        if not specialty_ids:
+            return jsonify({'status': 'success', 'doctors': []})
+    specialty_ids = specialty_ids or None
+
+    if request.args.get("sort") == "distance":
+        if radius_km is not None:
+            found = doctor_locator.within(location[0], location[1], radius_km, specialty_ids)[:k]
+        else:
+            found = doctor_locator.nearest(location[0], location[1], k, specialty_ids)
+        results = [(rank_score(d, doctor['rating']), d, doctor) for d, doctor in found]
+    else:
+        results = doctor_locator.ranked(location[0], location[1], k, specialty_ids, radius_km)
+
+    return jsonify({
+        'status': 'success',
+        'doctors': [{
+            'doctor_id': doctor['doctor_id'],
+            'name': doctor['name'],
+            'specialty_id': doctor['specialty_id'],
+            'specialty': doctor['specialty'],
+            'rating': doctor['rating'],
+            'experience': doctor['experience'],
+            'availability': doctor['availability'],
+            'distance_km': round(distance, 2),
+            'score': round(score, 4)
+        } for score, distance, doctor in results]
+    })
+
+
+#  Analytics (served from the daily rollups kept by history_writer)
+ANALYTICS_DEFAULT_DAYS = 7
+
+@app.route("/analytics/top_symptoms")
+def analytics_top_symptoms():
+    """Most reported symptoms over the last ?days= days (default 7)"""
+    if "user_id" not in session and "doctor_id" not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+    days = clamp_days(request.args.get("days", ANALYTICS_DEFAULT_DAYS, type=int))
+    limit = max(1, min(request.args.get("limit", 10, type=int), 100))
+    return jsonify({'status': 'success', 'days': days, 'symptoms': top_symptoms(get_connection(), days, limit)})
+
+@app.route("/analytics/specialty_demand")
+def analytics_specialty_demand():
+    """How many analyses pointed to each specialty over the last ?days= days"""
+    if "user_id" not in session and "doctor_id" not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+    days = clamp_days(request.args.get("days", ANALYTICS_DEFAULT_DAYS, type=int))
+    return jsonify({'status': 'success', 'days': days, 'specialties': specialty_demand(get_connection(), days)})
+
+@app.route("/analytics/timeline")
+def analytics_timeline():
+    """
+    Symptoms per day over the last ?days= days (default 30): the patient's own,
+    or for a doctor the ?user_id= of a patient who has booked with them.
+    """
+    conn = get_connection()
+    if "user_id" in session:
+        user_id = session["user_id"]
+    elif "doctor_id" in session:
+        user_id = request.args.get("user_id", type=int)
+        if user_id is None:
+            return jsonify({'status': 'error', 'message': 'user_id is required'}), 400
+        booked = conn.execute("SELECT 1 FROM Appointments WHERE doctor_id=? AND user_id=? LIMIT 1",
+                              (session["doctor_id"], user_id)).fetchone()
+        if not booked:
+            return jsonify({'status': 'error', 'message': 'Patient not found'}), 404
+    else:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+    days = clamp_days(request.args.get("days", 30, type=int))
+    return jsonify({'status': 'success', 'user_id': user_id, 'days': days,
+                    'timeline': symptom_timeline(conn, user_id, days)})
 
 #  General Routes
 @app.route("/")
 def homepage():
     return render_template("homepage.html") 
 
+# Operational endpoints describe the app's internals (pool, caches, upstream).
+# They answer only `Authorization: Bearer $OPS_TOKEN`; with no OPS_TOKEN set
+# they exist only under the debug server. Anyone else gets a plain 404.
+OPS_TOKEN = os.environ.get("OPS_TOKEN")
+
+def ops_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if OPS_TOKEN:
+            supplied = request.headers.get("Authorization", "")
+            allowed = hmac.compare_digest(supplied.encode(), f"Bearer {OPS_TOKEN}".encode())
+        else:
+            allowed = app.debug
+        if not allowed:
+            return jsonify({'status': 'error', 'message': 'Not found'}), 404
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route("/db_stats")
+@ops_only
+def db_stats():
+    stats = db_pool.stats()
+    stats['history_writer'] = history_writer.stats()
+    return jsonify(stats)
+
+
+#  Request metrics
+# Every request is timed by endpoint with its SQL statement count and time
+# (fed by db_pool's on_query hook); a sampled JSON line per request goes to
+# the "smarthealth" logger. Scrape everything from /metrics.
+@app.before_request
+def start_request_metrics():
+    start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    timing = finish_request(request.endpoint, request.method, response.status_code)
+    if timing is not None:
+        elapsed, queries, sql_seconds = timing
+        log_event("request", sample_rate=LOG_SAMPLE_RATE, endpoint=request.endpoint, method=request.method,
+                  status=response.status_code, ms=round(elapsed * 1000, 3), sql_queries=queries,
+                  sql_ms=round(sql_seconds * 1000, 3))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exception=None):
+    # Only does anything when after_request did not run
+    finish_request(request.endpoint, request.method, 500)
+
+metrics_registry.gauge_callback(
+    "db_pool_connections", "Pooled SQLite connections by state.",
+    lambda: {(('state', 'in_use'),): db_pool.stats()['in_use'], (('state', 'idle'),): db_pool.stats()['idle']})
+metrics_registry.gauge_callback(
+    "history_writer_queue_depth", "Health history rows waiting to be written.",
+    lambda: history_writer.stats()['queue_depth'])
+metrics_registry.gauge_callback(
+    "gemini_circuit_open", "1 while the Gemini circuit breaker is open.",
+    lambda: int(gemini.breaker.state == "open"))
+
+@app.route("/metrics")
+@ops_only
+def metrics():
+    return Response(metrics_registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and answering requests"""
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
+
+@app.route("/readyz")
+def readyz():
+    """
+    Readiness: the database answers and reference data (and the model, if
+    deployed) is loaded. Both are loaded here if no request has needed them
+    yet, so a process that was not preloaded by serve.py becomes ready too.
+    """
+    checks = {'accepting': not draining.is_set()}
+    try:
+        get_connection().execute("SELECT 1").fetchone()
+        checks['database'] = True
+    except sqlite3.Error:
+        checks['database'] = False
+    try:
+        checks['reference_data'] = symptom_graph.snapshot().version > 0
+    except sqlite3.Error:
+        checks['reference_data'] = False
+    try:
+        checks['model'] = model_store.is_loaded or not model_store.has_artifact() or model_store.load() is not None
+    except Exception as e:
+        log_event("model.load_failed", level=logging.ERROR, error=str(e))
+        checks['model'] = False
+    ready = all(checks.values())
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'pid': os.getpid(),
+                    'checks': checks}), 200 if ready else 503
+
 @app.route("/logout")
 def logout():
+    analysis_store.delete(session.get("analysis_id"))
     session.clear()
+    session.regenerate()
     flash("You have been logged out.", "info")
     return redirect(url_for("homepage"))
 
 
+def check_login(table, id_column, email, password):
+    """
+    Verify an email/password against Users or Doctors.
+    Returns (row, None) on success, (None, message) when throttled or busy,
+    and (None, None) for wrong credentials. Outdated hashes are replaced.
+    """
+    for limiter, key in ((login_ip_limiter, f"ip:{request.remote_addr}"),
+                         (login_email_limiter, f"email:{email.lower()}")):
+        allowed, retry_after = limiter.consume(key)
+        if not allowed:
+            return None, f"Too many login attempts. Please try again in {int(retry_after) + 1} seconds."
+
+    conn = get_connection()
+    row = conn.execute(f"SELECT {id_column}, name, password FROM {table} WHERE email=?", (email,)).fetchone()
+    try:
+        ok, new_hash = credential_verifier.check(password, row["password"] if row else None)
+    except VerifierBusy as e:
+        return None, str(e)
+    if not ok:
+        return None, None
+
+    login_email_limiter.reset(f"email:{email.lower()}")
+    if new_hash:
+        conn.execute(f"UPDATE {table} SET password=? WHERE {id_column}=?", (new_hash, row[id_column]))
+        conn.commit()
+    return row, None
+
 #  Doctor Routes
 @app.route("/doctor_login", methods=["GET", "POST"])
 def doctor_login():
@@ -415,12 +965,15 @@ def doctor_login():
         password = request.form["password"].strip()
         name = request.form.get("name", "").strip()
 
+        doctor, error = check_login("Doctors", "doctor_id", email, password)
+        if error:
+            flash(error, "danger")
+            return render_template("doctor_login.html"), 429
+
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT doctor_id, name FROM Doctors WHERE email=? AND password=?", (email, password))
-        doctor = cursor.fetchone()
-
         if doctor:
+            session.regenerate()
             session["doctor_id"] = doctor["doctor_id"]
             session["doctor_name"] = doctor["name"]
             flash(f"Welcome Dr. {doctor['name']}!", "success")
@@ -437,8 +990,10 @@ def doctor_login():
             cursor.execute("""
                 INSERT INTO Doctors (name, email, password, rating, experience, availability)
                 VALUES (?, ?, ?, 0, 0, 'Available')
-            """, (name, email, password))
+            """, (name, email, credential_verifier.hash(password)))
+            replace_schedule(cursor, cursor.lastrowid, 'Available')
             conn.commit()
+            symptom_graph.invalidate()
             flash("Doctor registered successfully! Please update your profile.", "success")
         except Exception as e:
             flash(f"Registration error: {e}", "danger")
@@ -460,17 +1015,15 @@ def doctor_panel():
     cursor = conn.cursor()
     cursor.execute("SELECT name, specialty, biography FROM Doctors WHERE doctor_id=?", (doctor_id,))
     doctor_data = cursor.fetchone()
+    # Read before the list: changes that land in between are replayed, never lost
+    change_seq = latest_seq(conn, doctor_id)
 
-    cursor.execute("""
-    SELECT A.appointment_id, A.user_id, U.name AS patient_name,
-           A.appointment_date, A.appointment_time, A.status, A.reason
-    FROM Appointments A
-    JOIN Users U ON A.user_id = U.user_id
-    WHERE A.doctor_id = ?
-    ORDER BY A.appointment_date DESC, A.appointment_time DESC
-""", (doctor_id,))
-
-    appointments = cursor.fetchall()
+    query = AppointmentQuery.from_args(request.args, doctor_id=doctor_id)
+    try:
+        appointments, next_cursor = query.page(conn, request.args.get("cursor"))
+    except ValueError:
+        appointments, next_cursor = query.page(conn)
+    summary = query.summary(conn)
     conn.close()
 
     return render_template(
@@ -478,6 +1031,10 @@ def doctor_panel():
         doctor_name=doctor_data["name"],
         profile_data=doctor_data,
         appointments=appointments,
+        next_cursor=next_cursor,
+        appointment_summary=summary,
+        status_filter=query.statuses,
+        change_seq=change_seq,
         active_section="appointments"
     )
 
@@ -520,6 +1077,7 @@ def update_profile():
     """, (name, specialty, biography, doctor_id))
     conn.commit()
     conn.close()
+    symptom_graph.invalidate()
 
     session["doctor_name"] = name
     flash("Profile updated successfully!", "success")
@@ -527,24 +1085,105 @@ def update_profile():
 
 
 
-@app.route("/update_status/<int:appointment_id>/<string:status>")
+@app.route("/update_status/<int:appointment_id>/<string:status>", methods=["GET", "POST"])
 def update_status(appointment_id, status):
+    """POST returns the updated appointment as JSON; GET keeps the old redirect for plain links"""
+    wants_json = request.method == "POST"
     if "doctor_id" not in session:
+        if wants_json:
+            return jsonify({'status': 'error', 'message': 'Login required'}), 401
         return redirect(url_for("doctor_login"))
 
     if status not in ['Approved', 'Rejected']:
+        if wants_json:
+            return jsonify({'status': 'error', 'message': 'Invalid status update.'}), 400
         flash("Invalid status update.", "danger")
         return redirect(url_for("doctor_panel"))
 
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("UPDATE Appointments SET status=? WHERE appointment_id=?", (status, appointment_id))
+    cursor.execute("UPDATE Appointments SET status=? WHERE appointment_id=? AND doctor_id=?",
+                   (status, appointment_id, session["doctor_id"]))
+    updated = cursor.rowcount
     conn.commit()
+    appointment = get_appointment(conn, appointment_id) if updated else None
+    seq = latest_seq(conn, session["doctor_id"])
     conn.close()
-
-    flash(f"Appointment {appointment_id} {status.lower()} successfully!", "success")
+    if updated:
+        change_feed.notify()
+
+    if wants_json:
+        if not updated:
+            return jsonify({'status': 'error', 'message': 'Appointment not found'}), 404
+        return jsonify({'status': 'success', 'appointment': appointment, 'seq': seq})
+
+    if updated:
+        flash(f"Appointment {appointment_id} {status.lower()} successfully!", "success")
+    else:
+        flash("Appointment not found.", "danger")
     return redirect(url_for("doctor_panel"))
 
+@app.route("/appointments/changes")
+def appointment_changes():
+    """Appointments changed since sequence ?since= (from doctor_panel or a previous call)"""
+    if "doctor_id" not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+    since = request.args.get("since", 0, type=int)
+    limit = max(1, min(request.args.get("limit", MAX_CHANGES, type=int), MAX_CHANGES))
+    changes, cursor, has_more = changes_since(get_connection(), session["doctor_id"], since, limit)
+    return jsonify({'status': 'success', 'changes': changes, 'cursor': cursor, 'has_more': has_more})
+
+@app.route("/appointments/stream")
+def appointment_stream():
+    """SSE: pushes 'appointments' events with changed rows; the event id is the resume cursor"""
+    if "doctor_id" not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+    doctor_id = session["doctor_id"]
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", 0, type=int)
+
+    def generate():
+        yield "retry: 3000\n\n"
+        for item in change_feed.stream(doctor_id, since):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            cursor, changes = item
+            yield sse_event({"changes": changes, "cursor": cursor}, event="appointments", event_id=cursor)
+
+    # No stream_with_context: the stream must not pin the request's pooled connection
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/appointments")
+def list_appointments():
+    """
+    One page of the logged-in doctor's or patient's appointments, newest first.
+    Filters: ?status= (repeatable), ?from= / ?to= (YYYY-MM-DD); page with ?cursor=
+    from the previous response's next_cursor.
+    """
+    if "doctor_id" in session:
+        query = AppointmentQuery.from_args(request.args, doctor_id=session["doctor_id"])
+    elif "user_id" in session:
+        query = AppointmentQuery.from_args(request.args, user_id=session["user_id"])
+    else:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+
+    conn = get_connection()
+    try:
+        rows, next_cursor = query.page(conn, request.args.get("cursor"),
+                                       request.args.get("limit", APPOINTMENTS_PAGE_SIZE, type=int))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    summary = query.summary(conn) if not request.args.get("cursor") else None
+    return jsonify({
+        'status': 'success',
+        'appointments': [appointment_dict(row) for row in rows],
+        'next_cursor': next_cursor,
+        'summary': summary
+    })
+
 #  Patient Routes
 @app.route("/patient_login_form", methods=["GET", "POST"])
 def patient_login():
@@ -553,12 +1192,15 @@ def patient_login():
         password = request.form.get("password", "").strip()
         name = request.form.get("name", "").strip()
 
+        user, error = check_login("Users", "user_id", email, password)
+        if error:
+            flash(error, "danger")
+            return render_template("patient_login_form.html", email=email, name=name), 429
+
         conn = get_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT user_id, name FROM Users WHERE email=? AND password=?", (email, password))
-        user = cursor.fetchone()
-
         if user:
+            session.regenerate()
             session["user_id"] = user["user_id"]
             session["user_name"] = user["name"]
             flash(f"Welcome back, {user['name']}!", "success")
@@ -568,13 +1210,16 @@ def patient_login():
         elif name:
             try:
                 cursor.execute("INSERT INTO Users (name, email, password) VALUES (?, ?, ?)",
-                               (name.title(), email, password))
+                               (name.title(), email, credential_verifier.hash(password)))
                 conn.commit()
+                session.regenerate()
                 session["user_id"] = cursor.lastrowid
                 session["user_name"] = name.title()
                 flash(f"New account created for {name.title()}! Welcome!", "success")
             except sqlite3.IntegrityError:
                 flash("Email already registered. Please login.", "warning")
+            except VerifierBusy as e:
+                flash(str(e), "danger")
             except Exception as e:
                 flash(f"Registration failed: {e}", "danger")
             finally:
@@ -597,27 +1242,25 @@ def symptom_analysis():
         flash("Please describe your symptoms.", "danger")
         return redirect(url_for("patient_dashboard"))
 
-    symptom_names_lower = [s.strip().lower() for s in symptoms_text_raw.split(',') if s.strip()]
-    if not symptom_names_lower:
-        flash("No recognizable symptoms entered.", "warning")
-        return redirect(url_for("patient_dashboard"))
-
-    final_symptom_ids, symptoms_data = fetch_symptoms(symptom_names_lower)
+    final_symptom_ids, symptoms_data = fetch_symptoms(symptoms_text_raw)
     if not final_symptom_ids:
         flash("No matching symptoms found in database.", "warning")
         return redirect(url_for("patient_dashboard"))
 
     recommendations = fetch_recommendations(final_symptom_ids)
-    specialties, doctors = fetch_doctors(final_symptom_ids)
-    log_history(session["user_id"], [s['name'] for s in symptoms_data], len(recommendations), len(doctors))
+    location = parse_location(request.form.get("lat"), request.form.get("lon"))
+    specialties, doctors = fetch_doctors(final_symptom_ids, location)
+    log_history(session["user_id"], symptoms_data, specialties, len(recommendations), len(doctors))
 
-    session["analysis"] = {
+    # Only the id goes into the session; the result lists live in analysis_store
+    analysis_store.delete(session.get("analysis_id"))
+    session["analysis_id"] = analysis_store.save({
     "symptoms_data": symptoms_data,
-    "recommendations": [dict(r) for r in recommendations],
+    "recommendations": [r._asdict() for r in recommendations],
     "specialties": [dict(s) for s in specialties],
     "doctors": [dict(d) for d in doctors],
     "symptoms_text": symptoms_text_raw
-    }
+    })
 
 
     return render_template(
@@ -632,12 +1275,26 @@ def symptom_analysis():
         show_booking_section=True if doctors else False
     )
 
+@app.route("/patient_section/<name>")
+def patient_section_fragment(name):
+    """Markup of a static dashboard section; immutable when requested with its current ?v= digest"""
+    if name not in STATIC_PATIENT_SECTIONS:
+        return jsonify({'status': 'error', 'message': 'Unknown section'}), 404
+    fragment = patient_section(name)
+    response = Response(fragment.html, mimetype="text/html")
+    response.set_etag(fragment.digest)
+    if request.args.get("v") == fragment.digest:
+        response.headers['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response.headers['Cache-Control'] = "no-cache"
+    return response.make_conditional(request)
+
 @app.route("/patient_dashboard")
 def patient_dashboard():
     if "user_id" not in session:
         flash("Please log in to access the dashboard.", "warning")
         return redirect(url_for("patient_login"))
-    analysis = session.get("analysis")
+    analysis = analysis_store.load(session.get("analysis_id"))
 
 
 
@@ -670,90 +1327,119 @@ def book_appointment():
             flash("All fields except 'Reason' are required.", "danger")
             return redirect(url_for("book_appointment"))
 
-        conn = get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute("""
-                INSERT INTO Appointments (user_id, doctor_id, appointment_date, appointment_time, status, reason)
-                VALUES (?, ?, ?, ?, 'Pending', ?)
-            """, (user_id, doctor_id, appointment_date, appointment_time, reason))
-            conn.commit()
+            slot_finder.book(user_id, int(doctor_id), appointment_date, appointment_time, reason)
+            change_feed.notify()
             flash("Appointment request submitted successfully! Await doctor approval.", "success")
+        except SlotUnavailable as e:
+            flash(str(e), "danger")
         except Exception as e:
             flash(f"Error booking appointment: {e}", "danger")
-        finally:
-            conn.close()
 
         return redirect(url_for("book_appointment"))
     
     
 
+    directory = doctor_directory.directory()
+
+    log_event("book_appointment.doctors", level=logging.DEBUG, sample_rate=LOG_SAMPLE_RATE,
+              count=len(directory), doctor_ids=[doc['doctor_id'] for doc in directory.doctors[:20]])
+
+    # Newest page of the user's appointment history; older pages come from /appointments
+    query = AppointmentQuery(user_id=user_id)
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    # Fetch all doctors  
-    cursor.execute("""
-        SELECT doctor_id, name, specialty
-        FROM Doctors
-        WHERE name IS NOT NULL AND name != ''
-        ORDER BY name
-    """)
-    doctors_rows = cursor.fetchall()
-    
-    # Convert to list of dicts for easier template access
-    all_doctors = []
-    for row in doctors_rows:
-        all_doctors.append({
-            'doctor_id': row['doctor_id'],
-            'name': row['name'],
-            'specialty': row['specialty'] if row['specialty'] else 'General'
-        })
-    
-    print(f"DEBUG: Found {len(all_doctors)} doctors")  # Debug
-    for doc in all_doctors:
-        print(f"DEBUG: Doctor - ID: {doc['doctor_id']}, Name: {doc['name']}, Specialty: {doc['specialty']}")
-    
-    # Fetch user's appointment history 
-    cursor.execute("""
-        SELECT A.appointment_id, D.name as doctor_name, A.appointment_date, A.appointment_time, 
-               A.status, A.reason
-        FROM Appointments A
-        JOIN Doctors D ON A.doctor_id = D.doctor_id
-        WHERE A.user_id = ?
-        ORDER BY A.appointment_date DESC, A.appointment_time DESC
-    """, (user_id,))
-    appointments_rows = cursor.fetchall()
-    
-    user_appointments = []
-    for row in appointments_rows:
-        user_appointments.append({
-            'appointment_id': row['appointment_id'],
-            'doctor_name': row['doctor_name'],
-            'appointment_date': row['appointment_date'],
-            'appointment_time': row['appointment_time'],
-            'status': row['status'],
-            'reason': row['reason'] if row['reason'] else ''
-        })
-    
+    appointments_rows, next_cursor = query.page(conn)
     conn.close()
+    user_appointments = [appointment_dict(row) for row in appointments_rows]
 
-    if not all_doctors:
+    if not len(directory):
         flash("No doctors available at the moment.", "info")
 
+    # Small directories ship as one cached <option> list; large ones render only
+    # the preselected doctor and the form searches /api/doctors as the patient types
+    selected_doctor_id = request.args.get("doctor_id", type=int)
+    doctor_options_html = None
+    if len(directory) <= INLINE_LIMIT:
+        doctor_options_html = fragment_cache.get(
+            'doctor_options', directory.digest,
+            lambda: render_template("patient/_doctor_options.html", all_doctors=directory.doctors)).html
+
     return render_template(
         "patient_dashboard.html",
         user_name=session.get("user_name", "Patient"),
-        all_doctors=all_doctors,
+        doctor_options_html=doctor_options_html,
+        selected_doctor=directory.get(selected_doctor_id),
         user_appointments=user_appointments,
+        appointments_cursor=next_cursor,
         active_section='appointments',
-        selected_doctor_id = request.args.get("doctor_id", type=int)
-
+        selected_doctor_id=selected_doctor_id
     )
+
+@app.route("/api/doctors")
+def api_doctors():
+    """Doctors whose name or specialty words start with ?q= (all words must match), in name order"""
+    if "user_id" not in session:
+        return jsonify({'status': 'error', 'message': 'Login required'}), 401
+    limit = max(1, min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    payload = doctor_directory.payload(request.args.get("q", "")[:100], limit)
+
+    use_gzip = payload.gzipped is not None and 'gzip' in request.accept_encodings
+    response = Response(payload.gzipped if use_gzip else payload.body, mimetype="application/json")
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    # Each encoding is its own representation, so it gets its own strong ETag
+    response.set_etag(payload.etag + ("-gz" if use_gzip else ""))
+    response.headers['Cache-Control'] = "private, no-cache"
+    return response.make_conditional(request)
+@app.route("/available_slots")
+def available_slots():
+    """Free slots for ?doctor_id= starting at ?date=YYYY-MM-DD (default today) for ?days= (1-31)"""
+    doctor_id = request.args.get("doctor_id", type=int)
+    if not doctor_id:
+        return jsonify({'status': 'error', 'message': 'doctor_id is required'}), 400
+    try:
+        first_day = datetime.date.fromisoformat(request.args.get("date") or datetime.date.today().isoformat())
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'date must be YYYY-MM-DD'}), 400
+    days = max(1, min(request.args.get("days", 1, type=int), 31))
+
+    return jsonify({
+        'status': 'success',
+        'doctor_id': doctor_id,
+        'days': [{'date': day, 'slots': slots} for day, slots in slot_finder.slots(doctor_id, first_day, days)]
+    })
+
 @app.route("/patient_appointments")
 def patient_appointments():
     return redirect(url_for("book_appointment"))
 
 #Chatbot
+CHAT_SYSTEM_INSTRUCTION = (
+    "You are a friendly and knowledgeable AI Health Assistant. "
+    "You can discuss topics such as symptoms, diseases, first aid, nutrition, "
+    "mental health, wellness, and healthcare advice. "
+    "If the user asks something unrelated to health (like programming, jokes, politics, etc.), "
+    "reply: 'I'm sorry, I can only talk about health and wellness topics.' "
+    "Always provide clear, simple, and supportive answers. "
+    "End every health-related response with: "
+    "'Note: I’m not a doctor. Please consult a healthcare professional for an accurate diagnosis.'"
+)
+
+@app.route("/chat_cache_stats")
+@ops_only
+def chat_cache_stats():
+    return jsonify(chat_cache.stats())
+
+GREETINGS = ["hi", "hello", "hey", "good morning", "good evening", "good afternoon", "how are you"]
+GREETING_REPLY = "Hello! 👋 I'm your Smart Health Assistant. How are you feeling today?"
+
+def chat_contents(user_message):
+    return [
+        {"parts": [{"text": CHAT_SYSTEM_INSTRUCTION}]},
+        {"parts": [{"text": user_message}]}
+    ]
+
 @app.route("/api_chat", methods=["POST"])
 def api_chat():
     try:
@@ -763,85 +1449,184 @@ def api_chat():
         if not user_message:
             return jsonify({"error": "Empty message"}), 400
 
-        
-        greetings = ["hi", "hello", "hey", "good morning", "good evening", "good afternoon", "how are you"]
-        if any(greet in user_message for greet in greetings):
-            return jsonify({"response": "Hello! 👋 I'm your Smart Health Assistant. How are you feeling today?"})
-
-        
-        system_instruction = (
-            "You are a friendly and knowledgeable AI Health Assistant. "
-            "You can discuss topics such as symptoms, diseases, first aid, nutrition, "
-            "mental health, wellness, and healthcare advice. "
-            "If the user asks something unrelated to health (like programming, jokes, politics, etc.), "
-            "reply: 'I'm sorry, I can only talk about health and wellness topics.' "
-            "Always provide clear, simple, and supportive answers. "
-            "End every health-related response with: "
-            "'Note: I’m not a doctor. Please consult a healthcare professional for an accurate diagnosis.'"
-        )
-
-        
-        payload = {
-            "contents": [
-                {"parts": [{"text": system_instruction}]},
-                {"parts": [{"text": user_message}]}
-            ]
-        }
-
-        #  4. Send the request to Gemini API
-        response = requests.post(
-            f"{API_URL}?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json=payload
-        )
+        if any(greet in user_message for greet in GREETINGS):
+            return jsonify({"response": GREETING_REPLY})
 
-        response.raise_for_status()
-        result = response.json()
+        # Repeat questions are answered from the cache without calling Gemini
+        cached_reply = chat_cache.get(user_message, CHAT_SYSTEM_INSTRUCTION)
+        if cached_reply is not None:
+            return jsonify({"response": cached_reply})
 
-        #  5. Extract model reply
-        model_reply = result["candidates"][0]["content"]["parts"][0]["text"]
+        # Send the request to Gemini API (pooled, bounded, with timeouts and retries)
+        model_reply = gemini.generate(chat_contents(user_message))
+        chat_cache.set(user_message, CHAT_SYSTEM_INSTRUCTION, model_reply)
 
         return jsonify({"response": model_reply})
 
+    except UpstreamUnavailable as e:
+        log_event("chat.upstream_unavailable", level=logging.WARNING, route="api_chat", error=str(e))
+        return jsonify({"error": "The health assistant is busy. Please try again shortly."}), 503
+
     except requests.exceptions.RequestException as e:
-        print(" API Error:", e)
+        log_event("chat.upstream_error", level=logging.WARNING, route="api_chat", error=str(e))
         return jsonify({"error": "Google Gemini API error"}), 500
 
     except Exception as e:
-        print(" Server Error:", e)
+        log_event("chat.server_error", level=logging.ERROR, route="api_chat", error=repr(e))
         return jsonify({"error": "Internal server error"}), 500
 
+def sse_event(data, event=None, event_id=None):
+    prefix = f"event: {event}\n" if event else ""
+    if event_id is not None:
+        prefix = f"id: {event_id}\n" + prefix
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.route("/api_chat_stream", methods=["POST"])
+def api_chat_stream():
+    """Relay the Gemini reply to the chat widget token by token as server-sent events"""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get("message", "").strip().lower()
+    if not user_message:
+        return jsonify({"error": "Empty message"}), 400
+
+    def generate():
+        if any(greet in user_message for greet in GREETINGS):
+            yield sse_event({"text": GREETING_REPLY})
+            yield sse_event({}, event="done")
+            return
+
+        cached_reply = chat_cache.get(user_message, CHAT_SYSTEM_INSTRUCTION)
+        if cached_reply is not None:
+            yield sse_event({"text": cached_reply})
+            yield sse_event({}, event="done")
+            return
+
+        parts = []
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            for chunk in gemini.stream(chat_contents(user_message)):
+                parts.append(chunk)
+                yield sse_event({"text": chunk})
+            outcome = "ok"
+        except UpstreamUnavailable as e:
+            outcome = "unavailable"
+            log_event("chat.upstream_unavailable", level=logging.WARNING, route="api_chat_stream", error=str(e))
+            yield sse_event({"error": "The health assistant is busy. Please try again shortly."}, event="error")
+            return
+        except requests.exceptions.RequestException as e:
+            log_event("chat.upstream_error", level=logging.WARNING, route="api_chat_stream", error=str(e))
+            yield sse_event({"error": "Google Gemini API error"}, event="error")
+            return
+        except GeneratorExit:
+            outcome = "cancelled"     # the browser went away mid-reply
+            raise
+        finally:
+            gemini_stream_duration.observe(time.perf_counter() - start, outcome)
 
+        if parts:
+            chat_cache.set(user_message, CHAT_SYSTEM_INSTRUCTION, "".join(parts))
+        yield sse_event({}, event="done")
 
-# ML prediction
-with open("disease_model.pkl", "rb") as f:
-    model = pickle.load(f)
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/chat_upstream_stats")
+@ops_only
+def chat_upstream_stats():
+    return jsonify(gemini.get_stats())
 
-# Load symptom list properly
-symptoms = pd.read_csv("symptom_list.csv")["Symptom"].tolist()
+
+
+# ML prediction
+# The model and symptom list load on first use and reload when the files change;
+# run `python predictor.py export` to produce the memory-mappable artifact.
+model_store = ModelStore("disease_model.pkl", "symptom_list.csv", "disease_model.joblib")
 
 @app.route("/")
 def home():
     # Send symptom list to predictor.html
-    return render_template("predictor.html", symptoms=symptoms)
+    return render_template("predictor.html", symptoms=model_store.get().symptoms)
 
 @app.route("/predict", methods=["POST"])
 def predict():
     data = request.get_json()
     selected = data.get("symptoms", [])
 
+    loaded = model_store.get()
+
     # Create input vector (1 = selected, 0 = not selected)
-    input_vector = [1 if s in selected else 0 for s in symptoms]
+    input_vector, _ = encode([selected], loaded.symptom_index)
 
     # Predict disease
-    prediction = model.predict([input_vector])[0]
+    with model_inference_duration.time("predict"):
+        prediction = loaded.model.predict(input_vector)[0]
 
     return jsonify({"message": f"Predicted Disease: {prediction}"})
-@app.route("/get_symptoms")
-def get_symptoms():
-    return jsonify(symptoms)
 
+@app.route("/predict_batch", methods=["POST"])
+def predict_batch():
+    """Score many patients' symptom sets in a single model call"""
+    data = request.get_json(silent=True) or {}
+    patients = data.get("patients")
+    top_k = data.get("top_k")
+
+    if not isinstance(patients, list) or not patients:
+        return jsonify({"status": "error", "message": "'patients' must be a non-empty list"}), 400
+    if len(patients) > MAX_BATCH_SIZE:
+        return jsonify({"status": "error", "message": f"At most {MAX_BATCH_SIZE} patients per batch"}), 400
+    if top_k is not None and (not isinstance(top_k, int) or top_k < 1):
+        return jsonify({"status": "error", "message": "'top_k' must be a positive integer"}), 400
+
+    # Each patient is either a list of symptoms or {"id": ..., "symptoms": [...]}
+    ids = []
+    symptom_sets = []
+    for i, patient in enumerate(patients):
+        if isinstance(patient, dict):
+            ids.append(patient.get("id", i))
+            patient = patient.get("symptoms", [])
+        else:
+            ids.append(i)
+        if not isinstance(patient, list):
+            return jsonify({"status": "error", "message": f"Patient {i}: symptoms must be a list"}), 400
+        symptom_sets.append(patient)
+
+    loaded = model_store.get()
+    X, unknown = encode(symptom_sets, loaded.symptom_index)
+    model_batch_size.observe(len(symptom_sets), "predict_batch")
+    with model_inference_duration.time("predict_batch"):
+        results = score_batch(loaded.model, X, top_k)
+    for patient_id, result, missing in zip(ids, results, unknown):
+        result["id"] = patient_id
+        if missing:
+            result["unknown_symptoms"] = missing
+
+    return jsonify({"status": "success", "count": len(results), "predictions": results})
 
+@app.route("/get_symptoms")
+def get_symptoms():
+    return jsonify(model_store.get().symptoms)
+
+
+
+def preload():
+    """
+    Build everything a worker would otherwise build on its first requests.
+    serve.py calls this in the master before forking, so the workers share the
+    pages copy-on-write instead of each loading its own copy.
+    """
+    symptom_graph.rebuild()
+    symptom_matcher.index()
+    doctor_locator.index()
+    doctor_directory.directory()
+    if model_store.has_artifact():
+        model_store.load()
+    preload_templates()
+    with app.test_request_context():
+        for name in STATIC_PATIENT_SECTIONS:
+            patient_section(name)
 
 if __name__ == "__main__":
+    symptom_graph.rebuild()
+    preload_templates()
     app.run(debug=True)
@@ -0,0 +1,306 @@
+import base64
+import datetime
+import logging
+import os
+import threading
+import time
+
+from metrics import log_event
+
+# Appointment_Changes rows returned per /appointments/changes call
+MAX_CHANGES = 200
+
+APPOINTMENT_STATUSES = ('Pending', 'Approved', 'Rejected')
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+_CHANGES_QUERY = """
+    SELECT C.seq, C.appointment_id, C.op, A.user_id, U.name AS patient_name,
+           A.appointment_date, A.appointment_time, A.status, A.reason
+    FROM Appointment_Changes C
+    LEFT JOIN Appointments A ON A.appointment_id = C.appointment_id
+    LEFT JOIN Users U ON U.user_id = A.user_id
+    WHERE C.doctor_id = ? AND C.seq > ?
+    ORDER BY C.seq
+    LIMIT ?
+"""
+
+_APPOINTMENT_QUERY = """
+    SELECT A.appointment_id, A.user_id, U.name AS patient_name,
+           A.appointment_date, A.appointment_time, A.status, A.reason
+    FROM Appointments A
+    JOIN Users U ON A.user_id = U.user_id
+    WHERE A.appointment_id = ?
+"""
+
+
+def appointment_dict(row):
+    result = {
+        'appointment_id': row['appointment_id'],
+        'user_id': row['user_id'],
+        'patient_name': row['patient_name'],
+        'appointment_date': row['appointment_date'],
+        'appointment_time': row['appointment_time'],
+        'status': row['status'],
+        'reason': row['reason'] or '',
+    }
+    if 'doctor_name' in row.keys():
+        result['doctor_id'] = row['doctor_id']
+        result['doctor_name'] = row['doctor_name']
+    return result
+
+
+def encode_cursor(row):
+    raw = f"{row['appointment_date']}|{row['appointment_time']}|{row['appointment_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(value):
+    """(date, time, appointment_id) from a cursor, or ValueError."""
+    try:
+        appointment_date, appointment_time, appointment_id = \
+            base64.urlsafe_b64decode(value.encode()).decode().split('|')
+        return appointment_date, appointment_time, int(appointment_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class AppointmentQuery:
+    """
+    Filters for one doctor's or one patient's appointments.
+
+    Pages are read newest first with a keyset on (date, time, id), so page N
+    costs the same as page 1; the indexes on (doctor_id|user_id, status, date,
+    time) and (doctor_id|user_id, date, time) serve both the filters and the
+    order.
+    """
+
+    def __init__(self, doctor_id=None, user_id=None, statuses=None, date_from=None, date_to=None):
+        if (doctor_id is None) == (user_id is None):
+            raise ValueError("Exactly one of doctor_id or user_id is required")
+        self.doctor_id = doctor_id
+        self.user_id = user_id
+        self.statuses = [s for s in (statuses or []) if s in APPOINTMENT_STATUSES]
+        self.date_from = _iso_date(date_from)
+        self.date_to = _iso_date(date_to)
+
+    @classmethod
+    def from_args(cls, args, doctor_id=None, user_id=None):
+        """Build from request args: status (repeatable), from, to."""
+        return cls(doctor_id, user_id, args.getlist("status"), args.get("from"), args.get("to"))
+
+    def _where(self):
+        if self.doctor_id is not None:
+            clauses, params = ["A.doctor_id = ?"], [self.doctor_id]
+        else:
+            clauses, params = ["A.user_id = ?"], [self.user_id]
+        if self.date_from:
+            clauses.append("A.appointment_date >= ?")
+            params.append(self.date_from)
+        if self.date_to:
+            clauses.append("A.appointment_date <= ?")
+            params.append(self.date_to)
+        return clauses, params
+
+    def page(self, conn, cursor=None, limit=PAGE_SIZE):
+        """One page of rows, newest first. Returns (rows, next_cursor or None)."""
+        clauses, params = self._where()
+        if self.statuses:
+            clauses.append(f"A.status IN ({','.join('?' * len(self.statuses))})")
+            params.extend(self.statuses)
+        if cursor:
+            clauses.append("(A.appointment_date, A.appointment_time, A.appointment_id) < (?, ?, ?)")
+            params.extend(decode_cursor(cursor))
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        # Column order matches what doctor_session.html unpacks positionally
+        rows = conn.execute(f"""
+            SELECT A.appointment_id, A.user_id, U.name AS patient_name,
+                   A.appointment_date, A.appointment_time, A.status, A.reason,
+                   A.doctor_id, D.name AS doctor_name
+            FROM Appointments A
+            LEFT JOIN Users U ON A.user_id = U.user_id
+            LEFT JOIN Doctors D ON A.doctor_id = D.doctor_id
+            WHERE {' AND '.join(clauses)}
+            ORDER BY A.appointment_date DESC, A.appointment_time DESC, A.appointment_id DESC
+            LIMIT ?
+        """, params + [limit + 1]).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def summary(self, conn):
+        """Appointment count per status (ignoring the status filter) in one aggregate query."""
+        clauses, params = self._where()
+        counts = {status: 0 for status in APPOINTMENT_STATUSES}
+        for status, count in conn.execute(f"""
+            SELECT A.status, COUNT(*) FROM Appointments A
+            WHERE {' AND '.join(clauses)}
+            GROUP BY A.status
+        """, params).fetchall():
+            counts[status or 'Pending'] = counts.get(status or 'Pending', 0) + count
+        counts['total'] = sum(counts.values())
+        return counts
+
+
+def _iso_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value).isoformat()
+    except ValueError:
+        return None
+
+
+def get_appointment(conn, appointment_id):
+    row = conn.execute(_APPOINTMENT_QUERY, (appointment_id,)).fetchone()
+    return appointment_dict(row) if row else None
+
+
+def latest_seq(conn, doctor_id):
+    row = conn.execute("SELECT MAX(seq) FROM Appointment_Changes WHERE doctor_id=?", (doctor_id,)).fetchone()
+    return row[0] or 0
+
+
+def changes_since(conn, doctor_id, since, limit=MAX_CHANGES):
+    """
+    Appointments of `doctor_id` changed after sequence `since`, each with its
+    current state, in change order. Several changes to one appointment collapse
+    into its latest. Returns (changes, cursor, has_more); pass `cursor` back as
+    `since` to continue.
+    """
+    rows = conn.execute(_CHANGES_QUERY, (doctor_id, since, limit + 1)).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        if row['op'] == 'delete' or row['user_id'] is None:
+            change = {'appointment_id': row['appointment_id'], 'deleted': True}
+        else:
+            change = appointment_dict(row)
+        change['seq'] = row['seq']
+        latest.pop(row['appointment_id'], None)
+        latest[row['appointment_id']] = change
+    cursor = rows[-1]['seq'] if rows else since
+    return list(latest.values()), cursor, has_more
+
+
+class ChangeFeed:
+    """
+    Pushes appointment changes to open streams. One poller thread per process
+    asks Appointment_Changes which doctors have new changes, every
+    `poll_interval` seconds or at once after notify() for writes made here,
+    and wakes only those doctors' streams, which then read their own rows.
+    Open panels therefore cost one small query per interval per process
+    instead of one each, and an idle stream touches the database only for
+    its first read.
+
+    Streams end once `stopping` is set (app.py passes its draining event), so
+    a worker being recycled does not wait out its graceful timeout on them.
+
+    `connect` must return a connection that is not bound to the request
+    (ConnectionPool.acquire): a stream outlives the request that opened it and
+    must not hold a pooled connection while idle.
+    """
+
+    def __init__(self, connect, poll_interval=2.0, heartbeat=15.0, stopping=None):
+        self._connect = connect
+        self.poll_interval = poll_interval
+        self.heartbeat = heartbeat
+        self.stopping = stopping or threading.Event()
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._latest = {}       # doctor_id -> newest seq the poller has seen
+        self._watchers = {}     # doctor_id -> open streams
+        self._last_seq = 0
+        self._thread = None
+        self._pid = None
+
+    def notify(self):
+        self._wake.set()
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _ensure_poller(self):
+        # Started by the first stream, and again in a forked child, which does
+        # not inherit the parent's thread
+        with self._cond:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            # Changes up to here are covered by each stream's first read
+            self._last_seq = self._query("SELECT COALESCE(MAX(seq), 0) FROM Appointment_Changes")[0][0]
+            self._latest = {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self._poll()
+            except Exception as e:
+                log_event("change_feed.poll_failed", level=logging.WARNING, error=str(e))
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _poll(self):
+        with self._cond:
+            if not self._watchers:
+                return
+            last_seq = self._last_seq
+        rows = self._query("""
+            SELECT doctor_id, MAX(seq) FROM Appointment_Changes
+            WHERE seq > ? GROUP BY doctor_id
+        """, (last_seq,))
+        if rows:
+            with self._cond:
+                for doctor_id, seq in rows:
+                    self._latest[doctor_id] = seq
+                self._last_seq = max(seq for _, seq in rows)
+                self._cond.notify_all()
+
+    def _wait(self, doctor_id, since, deadline):
+        """True once `doctor_id` has changes after `since`; False at `deadline` or when stopping."""
+        with self._cond:
+            while self._latest.get(doctor_id, 0) <= since and not self.stopping.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return not self.stopping.is_set()
+
+    def stream(self, doctor_id, since):
+        """Yield (cursor, changes) as they happen, or None as a keep-alive every `heartbeat` seconds."""
+        self._ensure_poller()
+        with self._cond:
+            self._watchers[doctor_id] = self._watchers.get(doctor_id, 0) + 1
+        try:
+            last_sent = time.monotonic()
+            pending = True
+            while not self.stopping.is_set():
+                if pending:
+                    conn = self._connect()
+                    try:
+                        changes, since, has_more = changes_since(conn, doctor_id, since)
+                    finally:
+                        conn.close()
+                    if changes:
+                        last_sent = time.monotonic()
+                        yield since, changes
+                    if has_more:
+                        continue
+                pending = self._wait(doctor_id, since, last_sent + self.heartbeat)
+                if not pending and not self.stopping.is_set():
+                    last_sent = time.monotonic()
+                    yield None
+        finally:
+            with self._cond:
+                self._watchers[doctor_id] -= 1
+                if not self._watchers[doctor_id]:
+                    del self._watchers[doctor_id]
+
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import time
+from collections import namedtuple
+
+from flask import request, url_for
+from markupsafe import Markup
+
+# Versioned URLs never change meaning, so browsers and proxies may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DIGEST_LENGTH = 12
+
+Fragment = namedtuple('Fragment', ['html', 'digest'])
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+
+
+class StaticAssets:
+    """
+    Content-hashed URLs for files under the app's static folder.
+
+    Templates call asset_url('js/patient_dashboard.js'), which returns
+    /static/js/patient_dashboard.js?v=<sha256 prefix>. A request whose v= matches
+    the file's current digest is answered with an immutable, year-long
+    Cache-Control; anything else falls back to Flask's revalidating default.
+    Digests are recomputed only when a file's size or mtime changes, and built
+    URLs are reused for `check_interval` seconds before the file is stat'ed again.
+    """
+
+    def __init__(self, app=None, check_interval=2.0):
+        self._digests = {}   # filename -> (mtime_ns, size, digest)
+        self._urls = {}      # (script_root, filename) -> (checked_at, url)
+        self.check_interval = check_interval
+        self.static_folder = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        app.jinja_env.globals['asset_url'] = self.url
+        app.after_request(self._cache_headers)
+
+    def digest(self, filename):
+        path = os.path.join(self.static_folder, filename)
+        st = os.stat(path)
+        cached = self._digests.get(filename)
+        if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+            with open(path, 'rb') as f:
+                cached = (st.st_mtime_ns, st.st_size, content_digest(f.read()))
+            self._digests[filename] = cached
+        return cached[2]
+
+    def url(self, filename):
+        key = (request.script_root, filename)
+        now = time.monotonic()
+        cached = self._urls.get(key)
+        if cached is None or now - cached[0] > self.check_interval:
+            cached = (now, url_for('static', filename=filename, v=self.digest(filename)))
+            self._urls[key] = cached
+        return cached[1]
+
+    def _cache_headers(self, response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+        version = request.args.get('v')
+        try:
+            current = version and self.digest(request.view_args['filename'])
+        except (OSError, KeyError):
+            return response
+        if version and version == current:
+            response.headers['Cache-Control'] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return response
+
+
+class FragmentCache:
+    """
+    Rendered HTML for template fragments that depend only on reference data
+    (doctor dropdowns) or on nothing at all (static dashboard sections).
+
+    get(name, version, build) returns a Fragment(html, digest); build() is
+    called on a miss and must return the rendered string. Pass the data's
+    version (e.g. symptom_graph's) so edits render a new entry instead of
+    serving a stale one.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, name, version, build):
+        key = (name, version)
+        fragment = self.cache.get(key)
+        if fragment is None:
+            html = build()
+            fragment = Fragment(Markup(html), content_digest(html.encode()))
+            self.cache.set(key, fragment)
+        return fragment
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
@@ -0,0 +1,116 @@
+"""
+Benchmark password hashing cost and login verification throughput.
+
+    python benchmarks/credentials_bench.py [--logins 200] [--concurrency 1 4 16] [--workers 2]
+
+First times one scrypt hash at several N values (pbkdf2 for comparison), then
+runs `--logins` verifications through CredentialVerifier from 1..C request
+threads and reports logins/sec and latency percentiles at the default cost.
+While logins run, a probe thread measures how long a trivial piece of Python
+work takes, showing how much the KDF pool slows everything else down.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from credentials import SCRYPT_N, CredentialVerifier, PasswordHasher, VerifierBusy
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def time_hash(hasher, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.hash('correct horse battery staple')
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def probe(stop, samples):
+    """Time a small pure-Python task every 10 ms: a stand-in for serving another page."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        sum(i * i for i in range(2000))
+        samples.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def run_logins(verifier, stored, logins, concurrency):
+    latencies = []
+    busy = [0]
+    lock = threading.Lock()
+    per_thread = max(1, logins // concurrency)
+
+    def worker():
+        for _ in range(per_thread):
+            start = time.perf_counter()
+            try:
+                verifier.check('correct horse battery staple', stored)
+            except VerifierBusy:
+                with lock:
+                    busy[0] += 1
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    stop = threading.Event()
+    probe_samples = []
+    probe_thread = threading.Thread(target=probe, args=(stop, probe_samples))
+    probe_thread.start()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    probe_thread.join()
+    return latencies, busy[0], elapsed, probe_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark password hashing and login verification")
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--workers', type=int, default=None, help="KDF pool size (default: CredentialVerifier's)")
+    parser.add_argument('--n', type=int, default=SCRYPT_N, help="scrypt N for the throughput runs")
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}")
+    print("\nSingle hash cost (median of 5):")
+    for n in (2 ** 12, 2 ** 13, 2 ** 14, 2 ** 15, 2 ** 16):
+        print(f"  scrypt N={n:<6} r=8 p=1: {time_hash(PasswordHasher(n=n)):7.1f} ms")
+    print(f"  pbkdf2_sha256 600k:       {time_hash(PasswordHasher(scheme='pbkdf2_sha256'), 3):7.1f} ms")
+
+    hasher = PasswordHasher(n=args.n)
+    verifier = CredentialVerifier(hasher, max_workers=args.workers, max_pending=1000)
+    stored = hasher.hash('correct horse battery staple')
+    idle = []
+    stop = threading.Event()
+    t = threading.Thread(target=probe, args=(stop, idle))
+    t.start()
+    time.sleep(0.3)
+    stop.set()
+    t.join()
+    print(f"\nVerification through CredentialVerifier (N={args.n}, {verifier.max_workers} workers); "
+          f"probe task idle p50 {percentile(idle, 0.5):.2f} ms")
+    for concurrency in args.concurrency:
+        latencies, busy, elapsed, probes = run_logins(verifier, stored, args.logins, concurrency)
+        print(f"  {concurrency:>3} threads: {len(latencies) / elapsed:7.1f} logins/s  "
+              f"p50 {percentile(latencies, 0.5):7.1f} ms  p95 {percentile(latencies, 0.95):7.1f}  "
+              f"p99 {percentile(latencies, 0.99):7.1f}  busy {busy}  "
+              f"probe p50 {percentile(probes, 0.5):.2f} ms p95 {percentile(probes, 0.95):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark the doctor GeoIndex on synthetic data.
+
+    python benchmarks/geo_index_bench.py [--doctors 100000] [--queries 500]
+
+Generates doctors clustered around a few Indian cities plus a uniform
+background, then times index build, k-nearest (with and without a specialty
+filter), radius and ranked queries. k-nearest results are checked against a
+brute-force scan, whose latency is reported for comparison.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from geo_index import GeoIndex, haversine_km
+
+CITIES = [(18.5204, 73.8567), (19.0760, 72.8777), (28.6139, 77.2090),
+          (12.9716, 77.5946), (13.0827, 80.2707), (22.5726, 88.3639)]
+
+
+def synthetic_doctors(count, specialties=5, seed=42):
+    rng = random.Random(seed)
+    doctors = []
+    for doctor_id in range(1, count + 1):
+        if rng.random() < 0.8:
+            lat, lon = rng.choice(CITIES)
+            lat, lon = rng.gauss(lat, 0.15), rng.gauss(lon, 0.15)
+        else:
+            lat, lon = rng.uniform(8, 32), rng.uniform(69, 89)
+        doctors.append({
+            'doctor_id': doctor_id,
+            'specialty_id': rng.randint(1, specialties),
+            'rating': round(rng.uniform(3, 5), 1),
+            'location_lat': lat,
+            'location_lon': lon,
+        })
+    return doctors
+
+
+def brute_force_nearest(doctors, lat, lon, k, specialty_ids=None):
+    scored = [(haversine_km(lat, lon, d['location_lat'], d['location_lon']), d['doctor_id'])
+              for d in doctors if specialty_ids is None or d['specialty_id'] in specialty_ids]
+    scored.sort()
+    return scored[:k]
+
+
+def timed(fn, queries):
+    timings = []
+    results = []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(fn(*q))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, results
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]
+    print(f"{label:>28}: mean {statistics.mean(timings):7.3f} ms  p50 {p(0.5):7.3f}  "
+          f"p95 {p(0.95):7.3f}  p99 {p(0.99):7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the doctor GeoIndex")
+    parser.add_argument('--doctors', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--cell-deg', type=float, default=0.05)
+    args = parser.parse_args()
+
+    doctors = synthetic_doctors(args.doctors)
+    start = time.perf_counter()
+    index = GeoIndex(doctors, cell_deg=args.cell_deg)
+    print(f"Built index over {index.size} doctors in {len(index.cells)} cells "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = random.Random(7)
+    points = []
+    for _ in range(args.queries):
+        lat, lon = rng.choice(CITIES)
+        points.append((rng.gauss(lat, 0.2), rng.gauss(lon, 0.2)))
+
+    timings, _ = timed(lambda lat, lon: index.nearest(lat, lon, 10), points)
+    report("nearest k=10", timings)
+    timings, filtered = timed(lambda lat, lon: index.nearest(lat, lon, 10, {3}), points)
+    report("nearest k=10, 1 specialty", timings)
+    timings, _ = timed(lambda lat, lon: index.within(lat, lon, 5.0), points)
+    report("within 5 km", timings)
+    timings, _ = timed(lambda lat, lon: index.ranked(lat, lon, 10, {1, 2}), points)
+    report("ranked k=10, 2 specialties", timings)
+
+    sample = points[:min(50, len(points))]
+    timings, expected = timed(lambda lat, lon: brute_force_nearest(doctors, lat, lon, 10, {3}), sample)
+    report("brute force k=10 (sample)", timings)
+    mismatches = sum(
+        [d['doctor_id'] for _, d in got] != [doctor_id for _, doctor_id in want]
+        for got, want in zip(filtered, expected)
+    )
+    print(f"k-nearest agreement with brute force: {len(sample) - mismatches}/{len(sample)}")
+
+
+if __name__ == '__main__':
+    main()
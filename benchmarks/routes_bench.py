@@ -0,0 +1,417 @@
+"""
+Load-test the main Flask routes and write a JSON baseline.
+
+    python benchmarks/seed.py bench.db --scale 0.1
+    python benchmarks/routes_bench.py bench.db [--mode client http] [--requests 300]
+                                      [--concurrency 8] [--out baseline.json]
+                                      [--compare previous.json] [--url http://host:port]
+
+Two ways of driving the app, each run per scenario:
+
+  client  Flask test client in this process, one request at a time: the cost
+          of the route itself, without the HTTP server.
+  http    `--concurrency` threads with keep-alive sessions against a real
+          server: the app served by werkzeug's threaded server in a
+          subprocess, or whatever is listening at --url (it must use the
+          seeded database).
+
+Scenarios log in as the seeded user<n>/doctor<n> accounts. api_chat talks to
+an in-process stub Gemini (benchmarks/stub_gemini.py) answering after
+--chat-delay seconds, with a unique question per request so the reply cache
+does not hide it. predict is skipped when the model files are not present.
+Bookings and analyses write to the database, so each run works on a fresh
+copy of it and the seeded file stays comparable between runs.
+
+Each scenario reports p50/p95/p99/mean/max latency in ms, throughput and any
+unexpected statuses. --compare prints the change against an earlier baseline
+and exits 1 when p95 or throughput got worse by more than --threshold.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from seed import BENCH_PASSWORD, doctor_email, table_counts, user_email
+import stub_gemini
+
+SYMPTOM_PHRASES = ['headache', 'cough', 'acidity', 'fever', 'joint pain',
+                   'bad headache and a cough', 'fever with joint pain', 'acidity after meals and headache']
+CHAT_TOPICS = ['a sore throat', 'back pain', 'acidity', 'a mild fever', 'poor sleep', 'a sprained ankle']
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Fixtures:
+    """What the scenarios pick from: bench doctors with their working hours, model symptoms."""
+
+    def __init__(self, database):
+        conn = sqlite3.connect(database)
+        try:
+            self.doctor_hours = conn.execute("""
+                SELECT S.doctor_id, S.start_minute, S.end_minute, S.slot_minutes
+                FROM Doctor_Schedule S JOIN Doctors D ON D.doctor_id = S.doctor_id
+                WHERE D.email LIKE '%@bench.test' AND S.weekday IS NULL
+            """).fetchall()
+        finally:
+            conn.close()
+        if not self.doctor_hours:
+            raise SystemExit(f"{database} has no bench doctors; create it with benchmarks/seed.py")
+        self.model_symptoms = None
+
+
+# A scenario is (role, build) where build(fixtures, rng, n) returns
+# (method, path, form, json body, expected statuses)
+
+def _symptom_analysis(fx, rng, n):
+    return 'POST', '/symptom_analysis', {'symptoms_input': rng.choice(SYMPTOM_PHRASES)}, None, (200,)
+
+
+def _book_appointment(fx, rng, n):
+    doctor_id, start, end, step = rng.choice(fx.doctor_hours)
+    minute = start + step * rng.randrange(max(1, (end - start) // step))
+    day = datetime.date.today() + datetime.timedelta(days=rng.randint(1, 180))
+    form = {'doctor_id': doctor_id, 'appointment_date': day.isoformat(),
+            'appointment_time': f"{minute // 60:02d}:{minute % 60:02d}", 'reason': 'Benchmark booking'}
+    return 'POST', '/book_appointment', form, None, (302,)
+
+
+def _book_appointment_page(fx, rng, n):
+    return 'GET', '/book_appointment', None, None, (200,)
+
+
+def _doctor_panel(fx, rng, n):
+    return 'GET', '/doctor_panel', None, None, (200,)
+
+
+def _get_records(fx, rng, n):
+    return 'GET', '/get_records', None, None, (200,)
+
+
+def _predict(fx, rng, n):
+    picked = rng.sample(fx.model_symptoms, min(len(fx.model_symptoms), rng.randint(1, 4)))
+    return 'POST', '/predict', None, {'symptoms': picked}, (200,)
+
+
+def _api_chat(fx, rng, n):
+    # Unique per request so every call reaches the (stub) upstream
+    message = f"what can I do about {rng.choice(CHAT_TOPICS)}, case {n} {rng.getrandbits(32)}"
+    return 'POST', '/api_chat', None, {'message': message}, (200,)
+
+
+SCENARIOS = {
+    'symptom_analysis': ('patient', _symptom_analysis),
+    'book_appointment': ('patient', _book_appointment),
+    'book_appointment_page': ('patient', _book_appointment_page),
+    'doctor_panel': ('doctor', _doctor_panel),
+    'get_records': ('patient', _get_records),
+    'predict': (None, _predict),
+    'api_chat': (None, _api_chat),
+}
+
+
+class TestClientDriver:
+    """Flask test client in this process."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        return self.app.test_client()
+
+    def send(self, client, method, path, form=None, body=None):
+        response = client.open(path, method=method, data=form, json=body)
+        status = response.status_code
+        response.close()
+        return status, response.get_data()
+
+
+class HTTPDriver:
+    """requests sessions against a running server."""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+
+    def session(self):
+        return self.requests.Session()
+
+    def send(self, client, method, path, form=None, body=None):
+        response = client.request(method, self.base_url + path, data=form, json=body,
+                                  allow_redirects=False, timeout=60)
+        return response.status_code, response.content
+
+
+def login(driver, client, role, n):
+    if role == 'patient':
+        path, email = '/patient_login_form', user_email(n)
+    else:
+        path, email = '/doctor_login', doctor_email(n)
+    for _ in range(30):
+        status, _ = driver.send(client, 'POST', path, {'email': email, 'password': BENCH_PASSWORD})
+        if status == 302:
+            return client
+        if status != 429:
+            raise SystemExit(f"Login as {email} failed with HTTP {status}")
+        time.sleep(2)   # the per-IP login limiter refills one attempt every 2 s
+    raise SystemExit(f"Login as {email} kept being throttled")
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    ms = [t * 1000 for t in latencies]
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': dict(sorted((str(k), v) for k, v in statuses.items())),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+    if ms:
+        result['latency_ms'] = {
+            'p50': round(percentile(ms, 0.50), 3),
+            'p95': round(percentile(ms, 0.95), 3),
+            'p99': round(percentile(ms, 0.99), 3),
+            'mean': round(statistics.fmean(ms), 3),
+            'max': round(max(ms), 3),
+        }
+    return result
+
+
+def run_scenario(driver, fixtures, name, requests_count, concurrency, warmup, seed):
+    role, build = SCENARIOS[name]
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    errors = [0]
+
+    def worker(index):
+        rng = random.Random(f"{seed}:{name}:{index}")
+        client = driver.session()
+        if role:
+            login(driver, client, role, index + 1)
+        for _ in range(warmup):
+            method, path, form, body, _ = build(fixtures, rng, -1)
+            driver.send(client, method, path, form, body)
+        barrier.wait()
+        while True:
+            n = next(counter)
+            if n >= requests_count:
+                return
+            method, path, form, body, expected = build(fixtures, rng, n)
+            start = time.perf_counter()
+            try:
+                status, _ = driver.send(client, method, path, form, body)
+            except Exception as e:
+                with lock:
+                    errors[0] += 1
+                    statuses['exception'] = statuses.get('exception', 0) + 1
+                print(f"  {name}: {e}")
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+                if status not in expected:
+                    errors[0] += 1
+
+    # Everyone logs in and warms up first; the clock starts when all are ready
+    barrier = threading.Barrier(concurrency + 1)
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return summarize(latencies, statuses, errors[0], time.perf_counter() - start)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(env, log_file):
+    """The app under werkzeug's threaded server in a subprocess; returns (process, base URL)."""
+    port = free_port()
+    code = ("import app; from werkzeug.serving import run_simple; app.symptom_graph.rebuild(); "
+            f"run_simple('127.0.0.1', {port}, app.app, threaded=True)")
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=log_file)
+    base_url = f"http://127.0.0.1:{port}"
+    import requests
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with {process.returncode}; see {log_file.name}")
+        try:
+            requests.get(base_url + '/', timeout=1)
+            return process, base_url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("Server did not start within 60s")
+
+
+def model_symptoms(driver):
+    client = driver.session()
+    status, body = driver.send(client, 'GET', '/get_symptoms')
+    return json.loads(body) if status == 200 else None
+
+
+def run_mode(mode, driver, fixtures, args):
+    fixtures.model_symptoms = model_symptoms(driver)
+    results = {}
+    for name in args.scenarios:
+        if name == 'predict' and not fixtures.model_symptoms:
+            print(f" [{mode}] predict: skipped (model files not found)")
+            continue
+        concurrency = 1 if mode == 'client' else args.concurrency
+        results[name] = run_scenario(driver, fixtures, name, args.requests, concurrency, args.warmup, args.seed)
+        r = results[name]
+        lat = r.get('latency_ms', {})
+        print(f" [{mode}] {name:<22} {r['throughput_rps']:8.1f} req/s  p50 {lat.get('p50', 0):8.2f} ms  "
+              f"p95 {lat.get('p95', 0):8.2f}  p99 {lat.get('p99', 0):8.2f}  errors {r['errors']}")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current, threshold):
+    """Print the change per scenario; returns the names that regressed."""
+    regressions = []
+    print(f"\nAgainst {previous['meta'].get('commit') or 'previous run'} "
+          f"({previous['meta'].get('timestamp')}), threshold {threshold:.0%}:")
+    for mode, scenarios in current['results'].items():
+        for name, new in scenarios.items():
+            old = previous.get('results', {}).get(mode, {}).get(name)
+            if not old or 'latency_ms' not in old or 'latency_ms' not in new:
+                continue
+            changes = []
+            for q in ('p50', 'p95', 'p99'):
+                before, after = old['latency_ms'][q], new['latency_ms'][q]
+                changes.append(f"{q} {before:.2f}->{after:.2f} ({(after - before) / before:+.0%})" if before else q)
+            rps_change = (new['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] \
+                if old['throughput_rps'] else 0.0
+            p95_change = (new['latency_ms']['p95'] - old['latency_ms']['p95']) / old['latency_ms']['p95'] \
+                if old['latency_ms']['p95'] else 0.0
+            regressed = p95_change > threshold or rps_change < -threshold
+            if regressed:
+                regressions.append(f"{mode}/{name}")
+            print(f" {'REGRESSED' if regressed else 'ok':<9} [{mode}] {name:<22} {'  '.join(changes)}  "
+                  f"throughput {rps_change:+.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Flask routes and write a JSON baseline")
+    parser.add_argument('database', help="database made by benchmarks/seed.py")
+    parser.add_argument('--mode', nargs='+', choices=('client', 'http'), default=['client', 'http'])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=300, help="measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=5, help="unmeasured requests per worker first")
+    parser.add_argument('--concurrency', type=int, default=8, help="http mode worker threads")
+    parser.add_argument('--chat-delay', type=float, default=0.2, help="stub Gemini reply delay in seconds")
+    parser.add_argument('--url', help="benchmark this running server instead of starting one")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', help="write the results here as JSON")
+    parser.add_argument('--compare', help="earlier --out file to diff against")
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    database = os.path.abspath(args.database)
+    if not os.path.exists(database):
+        parser.error(f"{database} not found; create it with benchmarks/seed.py")
+    fixtures = Fixtures(database)
+    stub = stub_gemini.start(delay=args.chat_delay)
+    workdir = tempfile.mkdtemp(prefix="routes-bench-")
+    working_copy = os.path.join(workdir, 'health.db')
+    source, target = sqlite3.connect(database), sqlite3.connect(working_copy)
+    source.backup(target)
+    source.close()
+    target.close()
+    # The app reads these at import time, here and in the server subprocess
+    os.environ.update({
+        'HEALTH_DB': working_copy,
+        'SESSION_DB': os.path.join(workdir, 'sessions.db'),
+        'GEMINI_API_BASE': f"http://127.0.0.1:{stub.server_address[1]}",
+        'GEMINI_API_KEY': 'bench',
+        'LOG_SAMPLE_RATE': '0',
+    })
+    os.chdir(ROOT)   # model files and symptom_list.csv are looked up from the repo root
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'tables': table_counts(database),
+            'args': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        },
+        'results': {},
+    }
+
+    if 'client' in args.mode:
+        import app
+        app.symptom_graph.rebuild()
+        report['results']['client'] = run_mode('client', TestClientDriver(app.app), fixtures, args)
+        app.history_writer.flush()
+
+    if 'http' in args.mode:
+        process = None
+        with open(os.path.join(workdir, 'server.log'), 'w') as log_file:
+            try:
+                if args.url:
+                    base_url = args.url
+                else:
+                    process, base_url = start_server(dict(os.environ), log_file)
+                report['results']['http'] = run_mode('http', HTTPDriver(base_url), fixtures, args)
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait(10)
+    stub.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Seed a synthetic database for load tests.
+
+    python benchmarks/seed.py bench.db [--scale 0.01] [--users N] [--doctors N]
+                              [--appointments N] [--history N] [--records N] [--force]
+
+The schema and catalogue come from db_setup (so migrations, triggers and the
+seed symptoms/specialties are the real ones); users, doctors, appointments,
+health history and record metadata are then generated on top of it. Default
+sizes are 100k users, 10k doctors, 1M appointments, 5M history rows and 200k
+records; --scale multiplies all of them, and each can be set on its own.
+Output is deterministic for a given --seed.
+
+Every synthetic account uses BENCH_PASSWORD; emails are user<n>@bench.test
+and doctor<n>@bench.test, numbered from 1.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import db_setup
+from bulk_load import bulk_load
+from credentials import PasswordHasher
+from health_analytics import HistoryEntry, record_history
+from migrations import INDEXES, create_indexes, drop_indexes
+
+BENCH_PASSWORD = 'bench-password'
+DEFAULTS = {'users': 100000, 'doctors': 10000, 'appointments': 1000000, 'history': 5000000, 'records': 200000}
+BATCH_SIZE = 20000
+
+CITIES = [(18.5204, 73.8567), (19.0760, 72.8777), (28.6139, 77.2090),
+          (12.9716, 77.5946), (13.0827, 80.2707), (22.5726, 88.3639)]
+HOURS = ['09:00-13:00', '10:00-14:00', '11:00-17:00', '14:00-18:00', '16:00-20:00', '17:00-21:00']
+STATUSES = ['Pending'] * 3 + ['Approved'] * 6 + ['Rejected']
+REASONS = ['Follow-up', 'Persistent cough', 'Back pain', 'Skin rash', 'Routine check-up', None]
+FILE_TYPES = [('report.pdf', 'application/pdf'), ('scan.png', 'image/png'), ('prescription.jpg', 'image/jpeg')]
+
+
+def user_email(n):
+    return f"user{n}@bench.test"
+
+
+def doctor_email(n):
+    return f"doctor{n}@bench.test"
+
+
+def chunks(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def synthetic_doctors(count, specialty_names, password_hash, rng):
+    for n in range(1, count + 1):
+        lat, lon = rng.choice(CITIES)
+        yield {
+            'name': f"Dr. Bench {n}",
+            'specialty_name': rng.choice(specialty_names),
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'experience': rng.randint(1, 35),
+            'location_lat': round(lat + rng.gauss(0, 0.15), 5),
+            'location_lon': round(lon + rng.gauss(0, 0.15), 5),
+            'availability': f"{rng.choice(('Online', 'Offline'))}/{rng.choice(HOURS)}",
+            'email': doctor_email(n),
+            'password': password_hash,
+        }
+
+
+def seed(database, counts, seed=42, verbose=True):
+    """Build `database` from scratch; returns {table: row count}."""
+    rng = random.Random(seed)
+    # One hash for every synthetic account: hashing a million scrypt passwords
+    # is not what this is measuring
+    password_hash = PasswordHasher().hash(BENCH_PASSWORD)
+
+    db_setup.DB_NAME = database
+    db_setup.setup_database(fresh=True)
+
+    conn = sqlite3.connect(database)
+    specialty_names = [r[0] for r in conn.execute("SELECT specialty_name FROM Specialties ORDER BY specialty_id")]
+    conn.close()
+
+    start = time.perf_counter()
+    bulk_load({'doctors': synthetic_doctors(counts['doctors'], specialty_names, password_hash, rng)},
+              database, verbose=False)
+    if verbose:
+        print(f" Doctors: {counts['doctors']:,} in {time.perf_counter() - start:.1f}s")
+
+    conn = sqlite3.connect(database, timeout=30)
+    conn.isolation_level = None
+    conn.execute("PRAGMA cache_size = -262144")
+    cursor = conn.cursor()
+    doctor_ids = [r[0] for r in cursor.execute("SELECT doctor_id FROM Doctors WHERE email LIKE '%@bench.test'")]
+    symptoms = [r[0] for r in cursor.execute("SELECT symptom_id FROM Symptoms")]
+    names = dict(cursor.execute("SELECT symptom_id, symptom_name FROM Symptoms"))
+    specialties = {}
+    for symptom_id, specialty_id in cursor.execute("SELECT symptom_id, specialty_id FROM Symptom_Specialty_Mapping"):
+        specialties.setdefault(symptom_id, []).append(specialty_id)
+
+    deferred = [i for i in INDEXES if i[1].split('(')[0] in ('Appointments', 'Health_History', 'UserRecords')]
+    today = datetime.date.today()
+
+    def timed(label, rows, sql=None, write=None):
+        start = time.perf_counter()
+        total = 0
+        for batch in chunks(rows):
+            if write:
+                write(batch)
+            else:
+                cursor.executemany(sql, batch)
+            total += len(batch)
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f" {label}: {total:,} in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        drop_indexes(cursor, deferred)
+        first_user = cursor.execute("SELECT COALESCE(MAX(user_id), 0) + 1 FROM Users").fetchone()[0]
+        timed("Users",
+              ((first_user + n - 1, f"Bench Patient {n}", user_email(n), password_hash)
+               for n in range(1, counts['users'] + 1)),
+              "INSERT INTO Users (user_id, name, email, password) VALUES (?, ?, ?, ?)")
+        user_ids = range(first_user, first_user + counts['users'])
+
+        def appointments():
+            for _ in range(counts['appointments']):
+                day = today + datetime.timedelta(days=rng.randint(-365, 90))
+                slot = rng.randint(18, 41)   # 09:00 .. 20:30 in half hours
+                status = 'Pending' if day >= today and rng.random() < 0.7 else rng.choice(STATUSES)
+                yield (rng.choice(user_ids), rng.choice(doctor_ids), day.isoformat(),
+                       f"{slot // 2:02d}:{slot % 2 * 30:02d}", status, rng.choice(REASONS))
+        timed("Appointments", appointments(), """
+            INSERT INTO Appointments (user_id, doctor_id, appointment_date, appointment_time, status, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """)
+
+        def history():
+            for _ in range(counts['history']):
+                picked = rng.sample(symptoms, rng.randint(1, min(3, len(symptoms))))
+                specialty_ids = sorted({sp for sid in picked for sp in specialties.get(sid, [])})
+                yield HistoryEntry(
+                    rng.choice(user_ids), (today - datetime.timedelta(days=rng.randint(0, 730))).isoformat(),
+                    ", ".join(names[sid].title() for sid in picked),
+                    f"Remedies: {rng.randint(1, 6)} | Doctors: {rng.randint(0, 10)}",
+                    picked, specialty_ids)
+        timed("Health history", history(), write=lambda batch: record_history(cursor, batch))
+
+        def records():
+            for n in range(counts['records']):
+                name, mime = rng.choice(FILE_TYPES)
+                uploaded = datetime.datetime.combine(today, datetime.time()) - datetime.timedelta(
+                    seconds=rng.randint(0, 730 * 86400))
+                yield (rng.choice(user_ids), f"bench-{n:08d}-{name}", f"Synthetic record {n}",
+                       uploaded.strftime("%Y-%m-%d %H:%M:%S"), rng.randint(20000, 4000000), None, mime)
+        timed("Records", records(), """
+            INSERT INTO UserRecords (user_id, file_name, description, upload_date, file_size, file_digest, mime_type)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """)
+
+        start = time.perf_counter()
+        create_indexes(cursor, deferred)
+        cursor.execute("ANALYZE")
+        cursor.execute("COMMIT")
+        if verbose:
+            print(f" Rebuilt {len(deferred)} indexes in {time.perf_counter() - start:.1f}s")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return table_counts(database)
+
+
+def table_counts(database):
+    conn = sqlite3.connect(database)
+    try:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('Users', 'Doctors', 'Appointments', 'Health_History', 'UserRecords')}
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a synthetic database for benchmarks")
+    parser.add_argument('database')
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies every default size")
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f'--{name}', type=int, default=None, help=f"default {default:,} x scale")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="overwrite an existing database")
+    args = parser.parse_args()
+
+    if os.path.exists(args.database) and not args.force:
+        parser.error(f"{args.database} exists; pass --force to replace it")
+    counts = {name: getattr(args, name) if getattr(args, name) is not None else max(1, int(default * args.scale))
+              for name, default in DEFAULTS.items()}
+    start = time.perf_counter()
+    print(seed(args.database, counts, args.seed))
+    print(f" Seeded {args.database} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Stand-in for the Gemini API so api_chat can be load-tested without a key or
+network access.
+
+    python benchmarks/stub_gemini.py [--port 8089] [--delay 0.2] [--chunks 8]
+    GEMINI_API_BASE=http://127.0.0.1:8089 python app.py
+
+Answers generateContent with one JSON reply and streamGenerateContent (?alt=sse)
+with `--chunks` SSE events, after sleeping `--delay` seconds to imitate model
+latency. routes_bench.py starts one in-process.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _reply(text):
+    return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'}}]}
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    delay = 0.2
+    chunks = 8
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+            question = body['contents'][-1]['parts'][0]['text']
+        except (ValueError, KeyError, IndexError):
+            self.send_error(400)
+            return
+        time.sleep(self.delay)
+        words = f"Stub answer to: {question}. Rest, drink water and see a doctor if it persists.".split()
+
+        if 'streamGenerateContent' in self.path:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            step = max(1, len(words) // self.chunks)
+            for i in range(0, len(words), step):
+                event = json.dumps(_reply(" ".join(words[i:i + step]) + " "))
+                self.wfile.write(f"data: {event}\r\n\r\n".encode())
+                self.wfile.flush()
+            self.close_connection = True
+            return
+
+        payload = json.dumps(_reply(" ".join(words))).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start(port=0, delay=0.2, chunks=8):
+    """Serve on 127.0.0.1:`port` (0 = any free port) from a daemon thread; returns the server."""
+    handler = type('Handler', (StubGeminiHandler,), {'delay': delay, 'chunks': chunks})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-gemini", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini API for load tests")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--delay', type=float, default=0.2, help="seconds before each reply")
+    parser.add_argument('--chunks', type=int, default=8, help="SSE events per streamed reply")
+    args = parser.parse_args()
+    server = start(args.port, args.delay, args.chunks)
+    print(f" Stub Gemini on http://127.0.0.1:{server.server_address[1]} (delay {args.delay}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
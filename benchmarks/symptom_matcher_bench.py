@@ -0,0 +1,133 @@
+"""
+Benchmark the free-text symptom matcher against the old exact comma-list lookup.
+
+    python benchmarks/symptom_matcher_bench.py [health.db] [--repeat N]
+
+Uses the Symptoms table of the given database (default health.db, falling back
+to the db_setup seed names) and a corpus of realistic patient phrasings with
+the symptoms each one should produce. Reports recall/precision for both
+approaches and per-query matcher latency.
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from symptom_matcher import MatchIndex
+
+SEED_SYMPTOMS = [('headache', 2), ('cough', 1), ('acidity', 1), ('fever', 3), ('joint pain', 2)]
+
+# (what the patient typed, symptoms it should match)
+CORPUS = [
+    ("headache", {"headache"}),
+    ("head ache", {"headache"}),
+    ("I have a terrible headache since morning", {"headache"}),
+    ("my head hurts a lot", {"headache"}),
+    ("throbbing head and I feel hot", {"headache"}),
+    ("migraine again", {"headache"}),
+    ("hedache", {"headache"}),
+    ("headaches every evening", {"headache"}),
+    ("cough", {"cough"}),
+    ("coughing all night", {"cough"}),
+    ("dry cough for a week", {"cough"}),
+    ("I keep coughng", {"cough"}),
+    ("coughs and a headache", {"cough", "headache"}),
+    ("acidity", {"acidity"}),
+    ("stomach burning after meals", {"acidity"}),
+    ("burning in my chest after eating", {"acidity"}),
+    ("heartburn", {"acidity"}),
+    ("acid reflux at night", {"acidity"}),
+    ("bad indigestion and sour burps", {"acidity"}),
+    ("acidty", {"acidity"}),
+    ("fever", {"fever"}),
+    ("high temperature since yesterday", {"fever"}),
+    ("feeling feverish", {"fever"}),
+    ("fevers on and off", {"fever"}),
+    ("child has a fevr", {"fever"}),
+    ("joint pain", {"joint pain"}),
+    ("my joints hurt", {"joint pain"}),
+    ("aching joints in the morning", {"joint pain"}),
+    ("knee pain when climbing stairs", {"joint pain"}),
+    ("stiff joints and pain", {"joint pain"}),
+    ("headache, cough, fever", {"headache", "cough", "fever"}),
+    ("fever and joint pain", {"fever", "joint pain"}),
+    ("high temperature and my joints ache", {"fever", "joint pain"}),
+    ("heartburn, head ache", {"acidity", "headache"}),
+    ("coughing with a fever", {"cough", "fever"}),
+    ("my head is fine but there is pain in my knee", {"joint pain"}),
+    ("pain", set()),
+    ("I feel tired", set()),
+    ("sneezing", set()),
+    ("stomach pain", set()),
+]
+
+
+def load_symptoms(db_path):
+    if db_path and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT symptom_id, symptom_name, priority FROM Symptoms").fetchall()
+        conn.close()
+        if rows:
+            return [{'id': r[0], 'name': r[1], 'priority': r[2]} for r in rows]
+    return [{'id': i + 1, 'name': n, 'priority': p} for i, (n, p) in enumerate(SEED_SYMPTOMS)]
+
+
+def exact_lookup(symptoms):
+    """What symptom_analysis did before: comma split + exact LOWER(symptom_name)."""
+    by_name = {s['name'].lower(): s for s in symptoms}
+    return lambda text: [by_name[t.strip().lower()] for t in text.split(',') if t.strip().lower() in by_name]
+
+
+def score(lookup):
+    tp = fp = fn = 0
+    for text, expected in CORPUS:
+        found = {s['name'] for s in lookup(text)}
+        tp += len(found & expected)
+        fp += len(found - expected)
+        fn += len(expected - found)
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark free-text symptom matching")
+    parser.add_argument('db', nargs='?', default='health.db')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    symptoms = load_symptoms(args.db)
+
+    start = time.perf_counter()
+    index = MatchIndex(symptoms)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"Index: {len(symptoms)} symptoms, {len(index.phrases)} phrases, "
+          f"{len(index.token_index)} tokens, built in {build_ms:.2f} ms")
+
+    for label, lookup in (("exact comma list", exact_lookup(symptoms)),
+                          ("matcher", lambda text: [s for s, _ in index.match(text)])):
+        precision, recall = score(lookup)
+        print(f"{label:>17}: precision {precision:.2f}  recall {recall:.2f}")
+
+    timings = []
+    for _ in range(args.repeat):
+        for text, _ in CORPUS:
+            start = time.perf_counter()
+            index.match(text)
+            timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    p = lambda q: timings[min(len(timings) - 1, int(q * len(timings)))]
+    print(f"Latency over {len(timings)} queries: mean {statistics.mean(timings):.1f} us, "
+          f"p50 {p(0.50):.1f} us, p95 {p(0.95):.1f} us, p99 {p(0.99):.1f} us")
+
+    for text, expected in CORPUS:
+        found = {s['name'] for s, _ in index.match(text)}
+        if found != expected:
+            print(f"  mismatch: {text!r} expected {sorted(expected)} got {sorted(found)}")
+
+
+if __name__ == '__main__':
+    main()
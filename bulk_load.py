@@ -0,0 +1,253 @@
+"""
+Bulk-load the reference catalogue (specialties, symptoms, recommendations,
+doctors and the two symptom mapping tables) from CSV or JSONL files.
+
+    python bulk_load.py --doctors doctors.csv --symptoms symptoms.jsonl [--db health.db]
+
+Column names follow the tables. Rows are upserted on their natural key
+(specialty_name, symptom_name, rec_name + rec_type, doctor email, mapping
+pair), so re-running a load updates rows in place instead of duplicating
+them; empty fields never overwrite stored values. Doctors may name their
+specialty (specialty_name) instead of giving specialty_id, and mapping files
+may use symptom_name / rec_name + rec_type / specialty_name instead of ids.
+
+The whole load is one transaction: the secondary indexes of the loaded tables
+are dropped first and rebuilt once at the end, and rows are written in
+executemany batches as they are read.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import time
+
+from credentials import hash_many, is_hashed
+from migrations import DB_NAME, INDEXES, create_indexes, drop_indexes, migrate
+from scheduling import sync_all_schedules
+
+BATCH_SIZE = 5000
+DEFAULT_SPECIALTY = "General Physician (GP)"
+
+# (source name, table, columns, natural key), in load order: doctors need
+# specialties, and the mappings need symptoms, recommendations and specialties
+CATALOGUE = [
+    ('specialties', 'Specialties',
+     ('specialty_name', 'description'), ('specialty_name',)),
+    ('symptoms', 'Symptoms',
+     ('symptom_name', 'description', 'doctor_advice', 'priority'), ('symptom_name',)),
+    ('recommendations', 'Recommendations',
+     ('rec_name', 'rec_type', 'instructions', 'disclaimer'), ('rec_name', 'rec_type')),
+    ('doctors', 'Doctors',
+     ('name', 'specialty_id', 'rating', 'experience', 'location_lat', 'location_lon',
+      'availability', 'email', 'password', 'specialty', 'biography'), ('email',)),
+    ('symptom_recommendations', 'Symptom_Recommendation_Mapping',
+     ('symptom_id', 'rec_id'), ('symptom_id', 'rec_id')),
+    ('symptom_specialties', 'Symptom_Specialty_Mapping',
+     ('symptom_id', 'specialty_id'), ('symptom_id', 'specialty_id')),
+]
+
+
+def read_rows(path):
+    """Stream dict rows from a .csv or .jsonl/.ndjson file."""
+    if path.endswith(('.jsonl', '.ndjson')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+def batches(rows, size=BATCH_SIZE):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def clean(value):
+    """Strip text and turn empty CSV fields into NULL."""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def upsert_sql(table, columns, key):
+    updates = [c for c in columns if c not in key]
+    action = "NOTHING" if not updates else "UPDATE SET " + ", ".join(
+        f"{c} = COALESCE(excluded.{c}, {table}.{c})" for c in updates)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT({', '.join(key)}) DO {action}")
+
+
+def _lookups(cursor):
+    """Name -> id maps the doctor and mapping rows resolve against."""
+    cursor.execute("SELECT specialty_id, specialty_name FROM Specialties")
+    specialty_names = dict(cursor.fetchall())
+    specialties = {name.lower(): sid for sid, name in specialty_names.items()}
+    cursor.execute("SELECT symptom_id, symptom_name FROM Symptoms")
+    symptoms = {name.lower(): sid for sid, name in cursor.fetchall()}
+    cursor.execute("SELECT rec_id, rec_name, rec_type FROM Recommendations")
+    recommendations = {(name.lower(), rec_type.lower()): rid for rid, name, rec_type in cursor.fetchall()}
+    return {'specialties': specialties, 'specialty_names': specialty_names,
+            'symptoms': symptoms, 'recommendations': recommendations}
+
+
+def _resolve(row, id_column, name_lookup, *name_columns):
+    """row[id_column] if given, else the id of the (lower-cased) name columns in name_lookup."""
+    value = clean(row.get(id_column))
+    if value is not None:
+        return int(value)
+    names = [clean(row.get(c)) for c in name_columns]
+    if any(n is None for n in names):
+        return None
+    key = names[0].lower() if len(names) == 1 else tuple(n.lower() for n in names)
+    return name_lookup.get(key)
+
+
+def derive_doctor_fields(batch, specialty_names):
+    """
+    Fill specialty text and biography for a whole batch of doctor tuples
+    (CATALOGUE column order) in one pass; rows that already carry them keep
+    theirs. Plaintext passwords are hashed for the batch in parallel.
+    """
+    pending = [i for i, row in enumerate(batch) if row[8] is not None and not is_hashed(row[8])]
+    hashed = dict(zip(pending, hash_many([batch[i][8] for i in pending])))
+    derived = []
+    for i, (name, sid, rating, experience, lat, lon, availability, email, password, specialty, biography) in enumerate(batch):
+        specialty = specialty or specialty_names.get(sid, DEFAULT_SPECIALTY)
+        if biography is None:
+            biography = (f"{name} is a board-certified {specialty} with {experience or 0} years of experience. "
+                         f"Available {(availability or 'on request').split('/')[0]}.")
+        password = hashed.get(i, password)
+        derived.append((name, sid, rating, experience, lat, lon, availability, email, password, specialty, biography))
+    return derived
+
+
+def prepare(source, batch, lookups):
+    """Turn a batch of dict rows into parameter tuples; rows that do not resolve are dropped."""
+    if source == 'doctors':
+        # Unknown specialties fall back to the GP, as get_specialty_name always did
+        fallback = lookups['specialties'].get(DEFAULT_SPECIALTY.lower())
+        rows = []
+        for r in batch:
+            sid = _resolve(r, 'specialty_id', lookups['specialties'], 'specialty_name')
+            if sid is None and clean(r.get('specialty')):
+                sid = lookups['specialties'].get(clean(r['specialty']).lower())
+            sid = sid or fallback
+            if sid is None:
+                continue
+            rows.append((clean(r.get('name')), sid) + tuple(clean(r.get(c)) for c in (
+                'rating', 'experience', 'location_lat', 'location_lon', 'availability',
+                'email', 'password', 'specialty', 'biography')))
+        return derive_doctor_fields(rows, lookups['specialty_names'])
+    if source == 'symptom_recommendations':
+        pairs = [(_resolve(r, 'symptom_id', lookups['symptoms'], 'symptom_name'),
+                  _resolve(r, 'rec_id', lookups['recommendations'], 'rec_name', 'rec_type')) for r in batch]
+        return [p for p in pairs if None not in p]
+    if source == 'symptom_specialties':
+        pairs = [(_resolve(r, 'symptom_id', lookups['symptoms'], 'symptom_name'),
+                  _resolve(r, 'specialty_id', lookups['specialties'], 'specialty_name')) for r in batch]
+        return [p for p in pairs if None not in p]
+    columns = next(c for name, _, c, _ in CATALOGUE if name == source)
+    return [tuple(clean(r.get(c)) for c in columns) for r in batch]
+
+
+def bulk_load(sources, database=DB_NAME, batch_size=BATCH_SIZE, defer_indexes=True, verbose=True):
+    """
+    Upsert `sources` ({source name: iterable of dict rows}) into `database` in
+    one transaction. Returns {source name: (rows written, rows skipped)}.
+    """
+    unknown = set(sources) - {name for name, *_ in CATALOGUE}
+    if unknown:
+        raise ValueError(f"Unknown sources: {', '.join(sorted(unknown))}")
+    migrate(database)
+
+    conn = sqlite3.connect(database, timeout=30)
+    conn.isolation_level = None  # explicit BEGIN/COMMIT around the whole load
+    conn.execute("PRAGMA cache_size = -65536")
+    cursor = conn.cursor()
+    tables = {table for name, table, *_ in CATALOGUE if name in sources}
+    deferred = [i for i in INDEXES if i[1].split('(')[0] in tables] if defer_indexes else []
+    results = {}
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        drop_indexes(cursor, deferred)
+        lookups = None
+        for source, table, columns, key in CATALOGUE:
+            if source not in sources:
+                continue
+            if source in ('doctors', 'symptom_recommendations', 'symptom_specialties') and lookups is None:
+                lookups = _lookups(cursor)
+            sql = upsert_sql(table, columns, key)
+            start = time.perf_counter()
+            read = written = 0
+            for batch in batches(sources[source], batch_size):
+                params = prepare(source, batch, lookups)
+                cursor.executemany(sql, params)
+                read += len(batch)
+                written += len(params)
+            elapsed = time.perf_counter() - start
+            results[source] = (written, read - written)
+            # Later sources must see the ids this one just created
+            if source in ('specialties', 'symptoms', 'recommendations'):
+                lookups = None
+            if verbose:
+                skipped = f", {read - written:,} skipped (unresolved references)" if read != written else ""
+                print(f" {table}: {written:,} rows in {elapsed:.2f}s "
+                      f"({written / elapsed if elapsed else 0:,.0f} rows/s){skipped}")
+
+        if 'doctors' in sources:
+            # Structured hours for the slot finder
+            sync_all_schedules(cursor)
+        start = time.perf_counter()
+        create_indexes(cursor, deferred)
+        cursor.execute("ANALYZE")
+        cursor.execute("COMMIT")
+        if verbose and deferred:
+            print(f" Rebuilt {len(deferred)} indexes in {time.perf_counter() - start:.2f}s")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load catalogue CSV/JSONL files into the database")
+    parser.add_argument('--db', default=DB_NAME)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--keep-indexes', action='store_true',
+                        help="maintain indexes row by row instead of rebuilding them (small top-up loads)")
+    for source, *_ in CATALOGUE:
+        parser.add_argument('--' + source.replace('_', '-'), dest=source, metavar='FILE')
+    args = parser.parse_args()
+
+    sources = {}
+    for source, *_ in CATALOGUE:
+        path = getattr(args, source)
+        if path:
+            if not os.path.exists(path):
+                parser.error(f"{path} does not exist")
+            sources[source] = read_rows(path)
+    if not sources:
+        parser.error("nothing to load; pass at least one of --" +
+                     ", --".join(s.replace('_', '-') for s, *_ in CATALOGUE))
+
+    start = time.perf_counter()
+    results = bulk_load(sources, args.db, args.batch_size, defer_indexes=not args.keep_indexes)
+    total = sum(written for written, _ in results.values())
+    elapsed = time.perf_counter() - start
+    print(f"\n Loaded {total:,} rows into {args.db} in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s).")
+
+
+if __name__ == "__main__":
+    main()
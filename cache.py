@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SQLiteCache:
+    """Persistent key -> JSON value store with expiry, used as a second cache tier."""
+
+    # Expired rows are swept once every this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path, table='cache_entries', ttl=86400):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connect()
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                cache_key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        self._pid = os.getpid()
+        self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def _db(self):
+        # Call with the lock held. A forked worker opens its own connection;
+        # the parent's one is left alone, SQLite handles must not cross fork()
+        if self._pid != os.getpid():
+            self._connect()
+        return self._conn
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._db().execute(
+                f"SELECT value FROM {self.table} WHERE cache_key=? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._db().execute(
+                f"INSERT OR REPLACE INTO {self.table} (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._conn.commit()
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, key):
+        with self._lock:
+            self._db().execute(f"DELETE FROM {self.table} WHERE cache_key=?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            cur = self._db().execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cur.rowcount
+
+    def stats(self):
+        with self._lock:
+            entries = self._db().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {'entries': entries, 'hits': self.hits, 'misses': self.misses}
+
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(message):
+    """'What to do for FEVER??' and 'what to do for fever' share one cache entry."""
+    message = _PUNCTUATION.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", message).strip()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for chatbot replies, keyed on the normalized question plus the
+    system instruction (so changing the prompt never serves stale answers).
+    """
+
+    def __init__(self, memory, persistent=None):
+        self.memory = memory
+        self.persistent = persistent
+
+    @staticmethod
+    def make_key(message, system_instruction):
+        raw = normalize_question(message) + "\x00" + system_instruction
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, message, system_instruction):
+        key = self.make_key(message, system_instruction)
+        reply = self.memory.get(key)
+        if reply is None and self.persistent is not None:
+            reply = self.persistent.get(key)
+            if reply is not None:
+                self.memory.set(key, reply)
+        return reply
+
+    def set(self, message, system_instruction, reply):
+        key = self.make_key(message, system_instruction)
+        self.memory.set(key, reply)
+        if self.persistent is not None:
+            self.persistent.set(key, reply)
+
+    def stats(self):
+        stats = {'memory': self.memory.stats()}
+        if self.persistent is not None:
+            stats['persistent'] = self.persistent.stats()
+        return stats
@@ -0,0 +1,221 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# scrypt cost: n=2**14, r=8 uses 16 MB and roughly 30-50 ms of CPU per hash.
+# Raise N as hardware allows; stored hashes keep their own parameters and are
+# upgraded on the next successful login.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Used only where hashlib.scrypt is unavailable (OpenSSL without scrypt)
+PBKDF2_ITERATIONS = 600000
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+SCHEMES = ('scrypt', 'pbkdf2_sha256')
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def is_hashed(value):
+    """True for strings produced by PasswordHasher.hash; False for legacy plaintext."""
+    return isinstance(value, str) and value.split('$', 1)[0] in SCHEMES and value.count('$') == 3
+
+
+class PasswordHasher:
+    """
+    Salted KDF hashes in a self-describing format:
+
+        scrypt$n=16384,r=8,p=1$<salt>$<key>
+        pbkdf2_sha256$i=600000$<salt>$<key>
+
+    verify() reads the parameters from the stored hash, so the cost can be
+    changed without invalidating existing passwords; needs_rehash() reports
+    hashes made with other settings.
+    """
+
+    def __init__(self, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, iterations=PBKDF2_ITERATIONS, scheme=None):
+        self.scheme = scheme or ('scrypt' if hasattr(hashlib, 'scrypt') else 'pbkdf2_sha256')
+        if self.scheme == 'scrypt':
+            self.params = {'n': n, 'r': r, 'p': p}
+        else:
+            self.params = {'i': iterations}
+
+    @staticmethod
+    def _derive(scheme, params, password, salt):
+        if scheme == 'scrypt':
+            n, r, p = params['n'], params['r'], params['p']
+            return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                  maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, params['i'], KEY_BYTES)
+
+    @staticmethod
+    def _parse(stored):
+        scheme, params, salt, key = stored.split('$')
+        params = {k: int(v) for k, v in (item.split('=') for item in params.split(','))}
+        return scheme, params, _unb64(salt), _unb64(key)
+
+    def hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        key = self._derive(self.scheme, self.params, password, salt)
+        params = ','.join(f"{k}={v}" for k, v in self.params.items())
+        return f"{self.scheme}${params}${_b64(salt)}${_b64(key)}"
+
+    def verify(self, password, stored):
+        if not is_hashed(stored):
+            return False
+        try:
+            scheme, params, salt, key = self._parse(stored)
+            return hmac.compare_digest(self._derive(scheme, params, password, salt), key)
+        except (ValueError, KeyError, TypeError):
+            return False
+
+    def needs_rehash(self, stored):
+        try:
+            scheme, params, _, _ = self._parse(stored)
+        except (ValueError, KeyError, TypeError):
+            return True
+        return scheme != self.scheme or params != self.params
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+class CredentialVerifier:
+    """
+    Runs hashing and verification on a small thread pool. hashlib's KDFs
+    release the GIL, so at most `max_workers` logins burn CPU at once while
+    the remaining request threads keep serving pages. Callers beyond
+    `max_pending` in flight get VerifierBusy instead of an ever-growing queue.
+
+    Unknown emails are checked against a dummy hash so a miss takes as long
+    as a wrong password.
+    """
+
+    def __init__(self, hasher=None, max_workers=None, max_pending=64, timeout=10.0):
+        self.hasher = hasher or PasswordHasher()
+        self.max_workers = max_workers or max(2, min(4, os.cpu_count() or 1))
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._dummy = self.hasher.hash(os.urandom(8).hex())
+        self._stats = {'verifications': 0, 'hashes': 0, 'rehashes': 0, 'rejected_busy': 0, 'kdf_time_total': 0.0}
+
+    def _pool(self):
+        # A forked worker gets its own pool; threads do not survive fork
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="kdf")
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected_busy'] += 1
+            raise VerifierBusy("Too many logins in progress, please try again.")
+        try:
+            start = time.perf_counter()
+            future = self._pool().submit(fn, *args)
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                raise VerifierBusy("Login timed out, please try again.")
+            with self._lock:
+                self._stats['kdf_time_total'] += time.perf_counter() - start
+            return result
+        finally:
+            self._slots.release()
+
+    def _check(self, password, stored):
+        if stored is None or not is_hashed(stored):
+            self.hasher.verify(password, self._dummy)
+            # Plaintext written before hashing existed: accept once, then it is replaced
+            ok = stored is not None and hmac.compare_digest(password.encode(), stored.encode())
+        else:
+            ok = self.hasher.verify(password, stored)
+        new_hash = self.hasher.hash(password) if ok and self.hasher.needs_rehash(stored) else None
+        return ok, new_hash
+
+    def check(self, password, stored):
+        """(matches, replacement hash or None). `stored` is None for an unknown account."""
+        ok, new_hash = self._run(self._check, password, stored)
+        with self._lock:
+            self._stats['verifications'] += 1
+            self._stats['rehashes'] += new_hash is not None
+        return ok, new_hash
+
+    def hash(self, password):
+        result = self._run(self.hasher.hash, password)
+        with self._lock:
+            self._stats['hashes'] += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['kdf_time_total'] = round(stats['kdf_time_total'], 3)
+        stats['workers'] = self.max_workers
+        return stats
+
+
+def hash_many(passwords, hasher=None, max_workers=None):
+    """Hash a list of passwords in parallel (migrations, bulk loads). Returns hashes in order."""
+    hasher = hasher or PasswordHasher()
+    if len(passwords) < 2:
+        return [hasher.hash(p) for p in passwords]
+    with ThreadPoolExecutor(max_workers or max(2, os.cpu_count() or 1)) as pool:
+        return list(pool.map(hasher.hash, passwords))
+
+
+class RateLimiter:
+    """
+    In-memory token buckets keyed by string ("email:...", "ip:..."). Each key
+    holds up to `capacity` tokens and regains `refill_per_sec`; consume() spends
+    one. Only the `max_keys` most recently used keys are tracked.
+    """
+
+    def __init__(self, capacity, refill_per_sec, max_keys=100000):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, last refill monotonic time)
+        self._lock = threading.Lock()
+
+    def consume(self, key, cost=1):
+        """(allowed, seconds until the next token if not allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_sec)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else (cost - tokens) / self.refill_per_sec
+        return allowed, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self):
+        return len(self._buckets)
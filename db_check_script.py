@@ -1,4 +1,126 @@
 import sqlite3
+import sys
+
+# Every query app.py issues, with sample parameters, for the --explain report.
+# Keep this in step with app.py when a route's SQL changes.
+APP_QUERIES = [
+    ("symptom_graph: symptoms",
+     "SELECT symptom_id, symptom_name, doctor_advice, priority FROM Symptoms", ()),
+    ("symptom_graph: recommendations",
+     "SELECT rec_name, rec_type, instructions, disclaimer FROM Recommendations ORDER BY rec_type, rec_name, rec_id", ()),
+    ("symptom_graph: specialties",
+     "SELECT specialty_id, specialty_name FROM Specialties", ()),
+    ("symptom_graph: symptom -> recommendation map",
+     "SELECT symptom_id, rec_id FROM Symptom_Recommendation_Mapping ORDER BY mapping_id", ()),
+    ("symptom_graph: symptom -> specialty map",
+     "SELECT symptom_id, specialty_id FROM Symptom_Specialty_Mapping ORDER BY map_id", ()),
+    ("symptom_graph: doctors by rating",
+     "SELECT doctor_id, name, rating, experience, availability, specialty_id, biography FROM Doctors ORDER BY rating DESC, experience DESC", ()),
+    ("symptom lookup by name",
+     "SELECT symptom_id, symptom_name, doctor_advice, priority FROM Symptoms WHERE LOWER(symptom_name) IN (?, ?)", ('fever', 'cough')),
+    ("upload_record / upload_sessions: save_record",
+     "INSERT INTO UserRecords (user_id, file_name, description, upload_date, file_size, file_digest, mime_type) VALUES (?, ?, ?, ?, ?, ?, ?)", (1, 'f.pdf', 'd', '2025-01-01 00:00:00', 1, 'x', 'application/pdf')),
+    ("get_records: ETag summary",
+     "SELECT COUNT(*) AS total, MAX(record_id) AS max_id, TOTAL(record_id) AS id_sum FROM UserRecords WHERE user_id=?", (1,)),
+    ("get_records: first page",
+     "SELECT record_id, file_name, description, upload_date, file_size, mime_type FROM UserRecords WHERE user_id=? ORDER BY upload_date DESC, record_id DESC LIMIT ?", (1, 51)),
+    ("get_records: next page",
+     "SELECT record_id, file_name, description, upload_date, file_size, mime_type FROM UserRecords WHERE user_id=? AND (upload_date, record_id) < (?, ?) ORDER BY upload_date DESC, record_id DESC LIMIT ?", (1, '2025-01-01 00:00:00', 10, 51)),
+    ("delete_record / download_record / view_record: ownership check",
+     "SELECT file_name FROM UserRecords WHERE record_id=? AND user_id=?", (1, 1)),
+    ("delete_record",
+     "DELETE FROM UserRecords WHERE record_id=? AND user_id=?", (1, 1)),
+    ("delete_record: shared blob check",
+     "SELECT 1 FROM UserRecords WHERE file_name=? LIMIT 1", ('f.pdf',)),
+    ("history_writer: log_history batch",
+     "INSERT INTO Health_History (user_id, symptom_name, remedy_suggested, date_recorded) VALUES (?, ?, ?, ?)", (1, 'Fever', 'Remedies: 1 | Doctors: 1', '2025-01-01')),
+    ("history_writer: per-symptom history",
+     "INSERT INTO Health_History_Symptoms (user_id, symptom_id, date_recorded) VALUES (?, ?, ?)", (1, 1, '2025-01-01')),
+    ("history_writer: daily symptom rollup",
+     "INSERT INTO Daily_Symptom_Counts (day, symptom_id, count) VALUES (?, ?, ?) ON CONFLICT(day, symptom_id) DO UPDATE SET count = count + excluded.count", ('2025-01-01', 1, 1)),
+    ("analytics: top symptoms",
+     """SELECT C.symptom_id, S.symptom_name, SUM(C.count) AS total
+        FROM Daily_Symptom_Counts C JOIN Symptoms S ON S.symptom_id = C.symptom_id
+        WHERE C.day BETWEEN ? AND ? GROUP BY C.symptom_id ORDER BY total DESC, S.symptom_name LIMIT ?""", ('2025-01-01', '2025-01-07', 10)),
+    ("analytics: specialty demand",
+     """SELECT D.specialty_id, P.specialty_name, SUM(D.count) AS total
+        FROM Daily_Specialty_Demand D JOIN Specialties P ON P.specialty_id = D.specialty_id
+        WHERE D.day BETWEEN ? AND ? GROUP BY D.specialty_id ORDER BY total DESC, P.specialty_name""", ('2025-01-01', '2025-01-07')),
+    ("analytics: patient timeline",
+     """SELECT U.day, U.symptom_id, S.symptom_name, U.count
+        FROM Daily_User_Symptoms U JOIN Symptoms S ON S.symptom_id = U.symptom_id
+        WHERE U.user_id = ? AND U.day BETWEEN ? AND ? ORDER BY U.day, U.count DESC, S.symptom_name""", (1, '2025-01-01', '2025-01-30')),
+    ("doctor_login",
+     "SELECT doctor_id, name, password FROM Doctors WHERE email=?", ('priya@gmail.com',)),
+    ("doctor_login: rehash",
+     "UPDATE Doctors SET password=? WHERE doctor_id=?", ('h', 1)),
+    ("doctor_login: registration",
+     "INSERT INTO Doctors (name, email, password, rating, experience, availability) VALUES (?, ?, ?, 0, 0, 'Available')", ('n', 'e', 'p')),
+    ("doctor_panel / doctor_profile: profile",
+     "SELECT name, specialty, biography FROM Doctors WHERE doctor_id=?", (1,)),
+    ("appointment query: doctor page",
+     """SELECT A.appointment_id, A.user_id, U.name AS patient_name,
+               A.appointment_date, A.appointment_time, A.status, A.reason,
+               A.doctor_id, D.name AS doctor_name
+        FROM Appointments A
+        LEFT JOIN Users U ON A.user_id = U.user_id
+        LEFT JOIN Doctors D ON A.doctor_id = D.doctor_id
+        WHERE A.doctor_id = ?
+        ORDER BY A.appointment_date DESC, A.appointment_time DESC, A.appointment_id DESC
+        LIMIT ?""", (1, 21)),
+    ("appointment query: doctor page by status, next page",
+     """SELECT A.appointment_id, A.user_id, U.name AS patient_name,
+               A.appointment_date, A.appointment_time, A.status, A.reason,
+               A.doctor_id, D.name AS doctor_name
+        FROM Appointments A
+        LEFT JOIN Users U ON A.user_id = U.user_id
+        LEFT JOIN Doctors D ON A.doctor_id = D.doctor_id
+        WHERE A.doctor_id = ? AND A.status IN (?) AND (A.appointment_date, A.appointment_time, A.appointment_id) < (?, ?, ?)
+        ORDER BY A.appointment_date DESC, A.appointment_time DESC, A.appointment_id DESC
+        LIMIT ?""", (1, 'Pending', '2025-01-01', '10:00', 10, 21)),
+    ("appointment query: doctor status summary",
+     "SELECT A.status, COUNT(*) FROM Appointments A WHERE A.doctor_id = ? GROUP BY A.status", (1,)),
+    ("update_profile",
+     "UPDATE Doctors SET name=?, specialty=?, biography=? WHERE doctor_id=?", ('n', 's', 'b', 1)),
+    ("update_status",
+     "UPDATE Appointments SET status=? WHERE appointment_id=?", ('Approved', 1)),
+    ("patient_login",
+     "SELECT user_id, name, password FROM Users WHERE email=?", ('test@user.com',)),
+    ("patient_login: rehash",
+     "UPDATE Users SET password=? WHERE user_id=?", ('h', 1)),
+    ("patient_login: registration",
+     "INSERT INTO Users (name, email, password) VALUES (?, ?, ?)", ('n', 'e', 'p')),
+    ("book_appointment: insert",
+     "INSERT INTO Appointments (user_id, doctor_id, appointment_date, appointment_time, status, reason) VALUES (?, ?, ?, ?, 'Pending', ?)", (1, 1, '2025-01-01', '10:00', '')),
+    ("book_appointment: doctor list",
+     "SELECT doctor_id, name, specialty FROM Doctors WHERE name IS NOT NULL AND name != '' ORDER BY name", ()),
+    ("appointment query: patient page",
+     """SELECT A.appointment_id, A.user_id, U.name AS patient_name,
+               A.appointment_date, A.appointment_time, A.status, A.reason,
+               A.doctor_id, D.name AS doctor_name
+        FROM Appointments A
+        LEFT JOIN Users U ON A.user_id = U.user_id
+        LEFT JOIN Doctors D ON A.doctor_id = D.doctor_id
+        WHERE A.user_id = ?
+        ORDER BY A.appointment_date DESC, A.appointment_time DESC, A.appointment_id DESC
+        LIMIT ?""", (1, 21)),
+    ("slot_finder: schedule windows",
+     "SELECT start_minute, end_minute, slot_minutes FROM Doctor_Schedule WHERE doctor_id=? AND (weekday IS NULL OR weekday=?) ORDER BY start_minute", (1, 0)),
+    ("slot_finder: booked appointments",
+     "SELECT appointment_date, appointment_time FROM Appointments WHERE doctor_id=? AND appointment_date BETWEEN ? AND ? AND status NOT IN ('Rejected', 'Cancelled')", (1, '2025-01-01', '2025-01-07')),
+    ("appointment feed: changes since",
+     """SELECT C.seq, C.appointment_id, C.op, A.user_id, U.name AS patient_name,
+               A.appointment_date, A.appointment_time, A.status, A.reason
+        FROM Appointment_Changes C
+        LEFT JOIN Appointments A ON A.appointment_id = C.appointment_id
+        LEFT JOIN Users U ON U.user_id = A.user_id
+        WHERE C.doctor_id = ? AND C.seq > ?
+        ORDER BY C.seq
+        LIMIT ?""", (1, 0, 201)),
+    ("appointment feed: latest seq",
+     "SELECT MAX(seq) FROM Appointment_Changes WHERE doctor_id=?", (1,)),
+]
+
 
 # Run this script separately to check your database
 def check_database():
@@ -40,5 +162,36 @@ def check_database():
     except Exception as e:
         print(f" ERROR: {e}")
 
+# Print the EXPLAIN QUERY PLAN tree for every query in APP_QUERIES
+def explain_queries(db_name='health.db'):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    print(f"✓ Schema version: {cursor.fetchone()[0]}")
+
+    full_scans = 0
+    for label, sql, params in APP_QUERIES:
+        print(f"\n▶ {label}")
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        except sqlite3.Error as e:
+            print(f"  ERROR: {e}")
+            continue
+        rows = cursor.fetchall()
+        depth = {0: 0}
+        for node_id, parent_id, _, detail in rows:
+            depth[node_id] = depth.get(parent_id, 0) + 1
+            print(f"  {'  ' * (depth[node_id] - 1)}{detail}")
+            if detail.startswith("SCAN") and "USING" not in detail:
+                full_scans += 1
+        if not rows:
+            print("  (no plan: direct row write)")
+
+    print(f"\n✓ {len(APP_QUERIES)} queries explained, {full_scans} full table scan(s).")
+    conn.close()
+
 if __name__ == "__main__":
-    check_database()
+    if "--explain" in sys.argv:
+        explain_queries()
+    else:
+        check_database()
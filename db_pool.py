@@ -0,0 +1,228 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from flask import g, has_app_context
+
+
+# Applied to every new connection. WAL lets readers run while a writer commits,
+# and synchronous=NORMAL is durable enough in WAL mode without an fsync per commit.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def _is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+
+class PooledCursor(sqlite3.Cursor):
+    """
+    Cursor that reports busy/locked timeouts back to the owning pool and, when
+    the pool has an on_query hook, how long each statement took.
+    """
+
+    def execute(self, sql, parameters=()):
+        pool = self.connection.pool
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        except sqlite3.OperationalError as e:
+            if _is_busy_error(e):
+                pool.record_busy_timeout()
+            raise
+        finally:
+            if pool.on_query is not None:
+                pool.on_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        pool = self.connection.pool
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        except sqlite3.OperationalError as e:
+            if _is_busy_error(e):
+                pool.record_busy_timeout()
+            raise
+        finally:
+            if pool.on_query is not None:
+                pool.on_query(sql, time.perf_counter() - start)
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose close() hands it back to the pool.
+
+    Connections checked out for a Flask request stay bound to it until the app
+    context is torn down, so the existing `conn.close()` calls in the route
+    handlers are harmless and later helpers in the same request reuse it.
+    """
+
+    pool = None
+    request_bound = False
+
+    def cursor(self, factory=PooledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        if self.request_bound:
+            return
+        self.pool.release(self)
+
+    def disconnect(self):
+        sqlite3.Connection.close(self)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of WAL-mode SQLite connections with checkout statistics.
+    on_query(sql, seconds), if given, is called after every statement run
+    through a pooled cursor (execute time only, up to the first row).
+    """
+
+    def __init__(self, database, max_size=8, timeout=10, statement_cache_size=256, on_query=None):
+        self.database = database
+        self.on_query = on_query
+        self.max_size = max_size
+        self.timeout = timeout
+        self.statement_cache_size = statement_cache_size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'connections_created': 0,
+            'checkouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'pool_timeouts': 0,
+            'busy_timeouts': 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            factory=PooledConnection,
+            cached_statements=self.statement_cache_size,
+            check_same_thread=False,  # a connection is only ever used by one checkout at a time
+        )
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        for pragma in PRAGMAS:
+            conn.execute(pragma).fetchall()
+        return conn
+
+    def _after_fork(self):
+        # SQLite handles must not cross fork(): a forked worker drops the
+        # parent's idle connections unclosed and starts an empty pool
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._idle = queue.LifoQueue()
+                self._size = 0
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            self._after_fork()
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._size < self.max_size:
+                    self._size += 1
+                    grow = True
+                else:
+                    grow = False
+            if grow:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+                with self._lock:
+                    self._stats['connections_created'] += 1
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['pool_timeouts'] += 1
+                    raise sqlite3.OperationalError("connection pool exhausted")
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+        return conn
+
+    def release(self, conn):
+        conn.request_bound = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.disconnect()
+            with self._lock:
+                self._size -= 1
+            return
+        self._idle.put(conn)
+
+    def record_busy_timeout(self):
+        with self._lock:
+            self._stats['busy_timeouts'] += 1
+
+    def connection(self):
+        """Return the connection bound to the current app context, or a fresh checkout outside Flask."""
+        if not has_app_context():
+            return self.acquire()
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = self.acquire()
+            conn.request_bound = True
+            g._db_conn = conn
+        return conn
+
+    def teardown(self, exception=None):
+        conn = g.pop('_db_conn', None)
+        if conn is not None:
+            self.release(conn)
+
+    def init_app(self, app):
+        app.teardown_appcontext(self.teardown)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['size'] - stats['idle']
+        stats['max_size'] = self.max_size
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.disconnect()
+            with self._lock:
+                self._size -= 1
@@ -1,155 +1,19 @@
 import sqlite3
 import os
+import sys
 
-DB_NAME = 'health.db'
-
-def get_specialty_name(specialty_id):
-    mapping = {
-        1: "General Physician (GP)",
-        2: "Otolaryngologist (ENT)",
-        3: "Gastroenterologist",
-        4: "Dermatologist", 
-        5: "Orthopedic"
-    }
-    return mapping.get(specialty_id, "General Physician (GP)")
+from bulk_load import bulk_load
+from credentials import PasswordHasher
 
+DB_NAME = 'health.db'
 
-def setup_database():
 
-    if os.path.exists(DB_NAME):
+def setup_database(fresh=False):
+    """Upsert the seed catalogue into DB_NAME; fresh=True deletes the database first."""
+    if fresh and os.path.exists(DB_NAME):
         os.remove(DB_NAME)
         print(f" Existing database {DB_NAME} deleted for fresh setup.")
-        
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    
-
-   
-
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Symptoms (
-            symptom_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            symptom_name TEXT NOT NULL UNIQUE,
-            description TEXT,
-            doctor_advice TEXT,
-            priority INTEGER DEFAULT 1
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Recommendations (
-            rec_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            rec_name TEXT NOT NULL,
-            rec_type TEXT NOT NULL CHECK(rec_type IN ('Home Remedy', 'Dietary', 'Ayurvedic', 'Tablet')),
-            instructions TEXT NOT NULL,
-            disclaimer TEXT
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Symptom_Recommendation_Mapping (
-            mapping_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            symptom_id INTEGER NOT NULL,
-            rec_id INTEGER NOT NULL,
-            FOREIGN KEY (symptom_id) REFERENCES Symptoms (symptom_id) ON DELETE CASCADE,
-            FOREIGN KEY (rec_id) REFERENCES Recommendations (rec_id) ON DELETE CASCADE
-        )
-    ''')
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Specialties (
-            specialty_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            specialty_name TEXT NOT NULL UNIQUE,
-            description TEXT
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Specialties (
-            specialty_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            specialty_name TEXT NOT NULL UNIQUE,
-            description TEXT
-        )
-    ''')
-
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Doctors (
-            doctor_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            specialty_id INTEGER NOT NULL,
-            rating REAL,
-            experience INTEGER,
-            location_lat REAL,
-            location_lon REAL,
-            availability TEXT,
-            email TEXT UNIQUE,
-            password TEXT,
-            specialty TEXT,           -- ADDED: Required for Flask Profile view
-            biography TEXT,           -- ADDED: Required for Flask Profile view
-            FOREIGN KEY (specialty_id) REFERENCES Specialties (specialty_id) ON DELETE CASCADE
-        )
-    ''')
 
-    
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Symptom_Specialty_Mapping (
-            map_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            symptom_id INTEGER NOT NULL,
-            specialty_id INTEGER NOT NULL,
-            FOREIGN KEY (symptom_id) REFERENCES Symptoms (symptom_id) ON DELETE CASCADE,
-            FOREIGN KEY (specialty_id) REFERENCES Specialties (specialty_id) ON DELETE CASCADE
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE,
-            password TEXT NOT NULL
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS Appointments (
-            appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            doctor_id INTEGER,
-            appointment_date TEXT,
-            appointment_time TEXT,
-            status TEXT DEFAULT 'Pending',
-            reason TEXT,       
-            FOREIGN KEY (user_id) REFERENCES Users(user_id),
-            FOREIGN KEY (doctor_id) REFERENCES Doctors(doctor_id)
-        )
-    ''')
-    
-    cursor.execute(''' 
-        CREATE TABLE IF NOT EXISTS Health_History(
-            user_id INTEGER,
-            symptom_name TEXT,
-            remedy_suggested TEXT,
-            date_recorded TEXT,
-            FOREIGN KEY (user_id) REFERENCES Users(user_id)
-        )
-    ''')
-
-    cursor.execute(''' 
-        CREATE TABLE IF NOT EXISTS UserRecords (
-    record_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER NOT NULL,
-    file_name TEXT NOT NULL,
-    description TEXT,
-    upload_date TEXT NOT NULL,
-    FOREIGN KEY (user_id) REFERENCES Users(user_id)
-);
-    ''')
-
-    
     symptoms = [
         ('headache', 'Pain or discomfort in the head or face.', 
          'Seek immediate help if headache is sudden and severe, accompanied by a stiff neck, confusion, or loss of consciousness.', 2),
@@ -196,15 +60,6 @@ def setup_database():
     ]
 
     
-    doctors_final_data = []
-    for data in doctors_raw_data:
-        specialty_text = get_specialty_name(data[1])
-        # Create a detailed biography text using the data
-        biography = f"{data[0]} is a board-certified {specialty_text} with {data[3]} years of experience. Available {data[6].split('/')[0]}."
-        
-        # New Tuple: (name, specialty_id, rating, experience, lat, lon, availability, email, password, specialty_TEXT, biography_TEXT)
-        doctors_final_data.append(data + (specialty_text, biography))
-        
     symptom_recommendation_mappings = [
         (1, 1), (1, 2), (1, 3),
         (2, 1), (2, 4),
@@ -222,24 +77,33 @@ def setup_database():
    
 
 
-    cursor.executemany("INSERT INTO Symptoms (symptom_name, description, doctor_advice, priority) VALUES (?, ?, ?, ?)", symptoms)
-    cursor.executemany("INSERT INTO Recommendations (rec_name, rec_type, instructions, disclaimer) VALUES (?, ?, ?, ?)", recommendations)
-    cursor.executemany("INSERT INTO Specialties (specialty_name, description) VALUES (?, ?)", specialties_data)
-    
+    # Mappings are loaded by name, so they stay correct on an existing database
+    # whose ids differ from a fresh one. Specialty text and biography are derived
+    # by the loader.
+    bulk_load({
+        'specialties': [dict(zip(('specialty_name', 'description'), row)) for row in specialties_data],
+        'symptoms': [dict(zip(('symptom_name', 'description', 'doctor_advice', 'priority'), row)) for row in symptoms],
+        'recommendations': [dict(zip(('rec_name', 'rec_type', 'instructions', 'disclaimer'), row)) for row in recommendations],
+        'doctors': [dict(zip(('name', 'specialty_name', 'rating', 'experience', 'location_lat', 'location_lon',
+                              'availability', 'email', 'password'), (row[0], specialties_data[row[1] - 1][0]) + row[2:]))
+                    for row in doctors_raw_data],
+        'symptom_recommendations': [
+            {'symptom_name': symptoms[s - 1][0], 'rec_name': recommendations[r - 1][0], 'rec_type': recommendations[r - 1][1]}
+            for s, r in symptom_recommendation_mappings],
+        'symptom_specialties': [
+            {'symptom_name': symptoms[s - 1][0], 'specialty_name': specialties_data[p - 1][0]}
+            for s, p in symptom_specialty_mappings],
+    }, DB_NAME, verbose=False)
 
-    cursor.executemany(
-        """INSERT INTO Doctors 
-        (name, specialty_id, rating, experience, location_lat, location_lon, availability, email, password, specialty, biography) 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-        doctors_final_data
-    )
-    
-    cursor.executemany("INSERT INTO Symptom_Recommendation_Mapping (symptom_id, rec_id) VALUES (?, ?)", symptom_recommendation_mappings)
-    cursor.executemany("INSERT INTO Symptom_Specialty_Mapping (symptom_id, specialty_id) VALUES (?, ?)", symptom_specialty_mappings)
-    
-    
-    cursor.execute("INSERT INTO Users (user_id, name, email, password) VALUES (1, 'Test Patient 1', 'test@user.com', 'pass');")
-    cursor.execute("INSERT INTO Appointments (user_id, doctor_id, appointment_date, appointment_time, status) VALUES (1, 1, '2025-11-15', '11:00', 'Pending');")
+    conn = sqlite3.connect(DB_NAME)
+    cursor = conn.cursor()
+    cursor.execute("INSERT OR IGNORE INTO Users (user_id, name, email, password) VALUES (1, 'Test Patient 1', 'test@user.com', ?);",
+                   (PasswordHasher().hash('pass'),))
+    cursor.execute("""
+        INSERT INTO Appointments (user_id, doctor_id, appointment_date, appointment_time, status)
+        SELECT 1, doctor_id, '2025-11-15', '11:00', 'Pending' FROM Doctors WHERE email = 'priya@gmail.com'
+        AND NOT EXISTS (SELECT 1 FROM Appointments WHERE user_id = 1 AND appointment_date = '2025-11-15' AND appointment_time = '11:00')
+    """)
 
 
     conn.commit()
@@ -249,4 +113,4 @@ def setup_database():
 
 
 if __name__ == "__main__":
-    setup_database()
+    setup_database(fresh="--fresh" in sys.argv[1:])
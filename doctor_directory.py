@@ -0,0 +1,141 @@
+import bisect
+import gzip
+import hashlib
+import json
+import re
+import threading
+from collections import namedtuple
+
+DIRECTORY_QUERY = """
+    SELECT doctor_id, name, specialty
+    FROM Doctors
+    WHERE name IS NOT NULL AND name != ''
+    ORDER BY name
+"""
+
+# Booking pages inline the whole <option> list up to this many doctors;
+# past it the form searches /api/doctors instead
+INLINE_LIMIT = 300
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Smaller bodies are not worth a gzip round trip
+GZIP_MIN_BYTES = 512
+
+# body/gzipped are bytes (gzipped is None for small bodies); etag identifies body
+Payload = namedtuple('Payload', ['body', 'gzipped', 'etag'])
+
+
+def search_tokens(text):
+    """Lower-cased words of a name or query: 'Dr. Anil Rao' -> ['dr', 'anil', 'rao']"""
+    return re.findall(r"[0-9a-z]+", (text or "").lower())
+
+
+class Directory:
+    """
+    Immutable list of bookable doctors in name order, with a sorted token
+    index for prefix search.
+
+    Every word of a doctor's name and specialty is a token; search('an ra')
+    returns doctors that have a token starting with 'an' and one starting with
+    'ra', still in name order. Each word is bisected into the sorted tokens;
+    the narrowest range gives the candidates and the other words are only
+    checked against those.
+    """
+
+    def __init__(self, rows):
+        self.doctors = [{
+            'doctor_id': row['doctor_id'],
+            'name': row['name'],
+            'specialty': row['specialty'] if row['specialty'] else 'General'
+        } for row in rows]
+        self.positions = {doc['doctor_id']: i for i, doc in enumerate(self.doctors)}
+        self._tokens = [set(search_tokens(f"{doc['name']} {doc['specialty']}")) for doc in self.doctors]
+        index = sorted((token, i) for i, tokens in enumerate(self._tokens) for token in tokens)
+        self._keys = [token for token, _ in index]
+        self._owners = [i for _, i in index]
+        # Same rows -> same digest in every process, so ETags survive restarts
+        self.digest = hashlib.sha256(
+            json.dumps(self.doctors, sort_keys=True).encode()).hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.doctors)
+
+    def get(self, doctor_id):
+        position = self.positions.get(doctor_id)
+        return None if position is None else self.doctors[position]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        words = search_tokens(query)
+        if not words:
+            return self.doctors[:limit]
+        # Candidates come from the word with the fewest matching tokens
+        ranges = [(bisect.bisect_left(self._keys, word), bisect.bisect_left(self._keys, word + "\uffff"), word)
+                  for word in words]
+        lo, hi, first = min(ranges, key=lambda r: r[1] - r[0])
+        rest = [word for word in words if word != first]
+
+        found = []
+        for i in sorted(set(self._owners[lo:hi])):
+            tokens = self._tokens[i]
+            if all(any(token.startswith(word) for token in tokens) for word in rest):
+                found.append(self.doctors[i])
+                if len(found) == limit:
+                    break
+        return found
+
+
+class DoctorDirectory:
+    """
+    Directory of the Doctors table kept in step with a SymptomGraph, like
+    DoctorGeoIndex: doctor registration and profile edits invalidate the graph,
+    and the directory is reloaded the first time it is used after the graph's
+    version changes.
+
+    payload() returns ready-to-send JSON (plain and gzipped) for a search,
+    cached per directory digest so repeated prefixes cost one dict lookup.
+    """
+
+    def __init__(self, graph, connect, cache):
+        self.graph = graph
+        self._connect = connect
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._directory = None
+        self._version = None
+
+    def directory(self):
+        version = self.graph.snapshot().version
+        directory = self._directory
+        if directory is not None and self._version == version:
+            return directory
+        with self._lock:
+            if self._directory is None or self._version != version:
+                conn = self._connect()
+                try:
+                    rows = conn.execute(DIRECTORY_QUERY).fetchall()
+                finally:
+                    conn.close()
+                self._directory = Directory(rows)
+                self._version = version
+            return self._directory
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        return self.directory().search(query, limit)
+
+    def payload(self, query, limit=DEFAULT_LIMIT):
+        directory = self.directory()
+        query = " ".join(search_tokens(query))
+        key = (directory.digest, query, limit)
+        payload = self.cache.get(key)
+        if payload is None:
+            body = json.dumps({
+                'status': 'success',
+                'version': directory.digest,
+                'total': len(directory),
+                'query': query,
+                'doctors': directory.search(query, limit),
+            }).encode()
+            gzipped = gzip.compress(body, 6) if len(body) >= GZIP_MIN_BYTES else None
+            payload = Payload(body, gzipped, hashlib.sha256(body).hexdigest()[:16])
+            self.cache.set(key, payload)
+        return payload
@@ -0,0 +1,99 @@
+import datetime
+import hashlib
+import os
+
+from flask import Response, request, send_from_directory
+from werkzeug.exceptions import NotFound
+
+from record_storage import CHUNK_SIZE
+
+
+def file_digest(path):
+    """SHA-256 of a file on disk, read in CHUNK_SIZE pieces."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _last_modified(record):
+    try:
+        return datetime.datetime.strptime(record['upload_date'], "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+class FileDelivery:
+    """
+    Sends stored record files with validators so repeat views cost a 304.
+
+    Blobs are content-addressed and never rewritten, so the SHA-256 digest is a
+    strong ETag. A matching If-None-Match is answered before the file is touched;
+    otherwise werkzeug's conditional send_file handles Range requests (partial
+    PDF rendering) and If-Modified-Since.
+
+    With `accel_prefix` set (an nginx `internal` location aliased to the upload
+    folder) the body is handed to the proxy through X-Accel-Redirect. Flask's
+    USE_X_SENDFILE does the same for Apache/lighttpd via send_file.
+
+    `record` is a dict with file_name, original_name, file_digest, mime_type and
+    upload_date. Files go out under original_name (the name the patient
+    uploaded); rows from before it was stored fall back to file_name.
+    """
+
+    def __init__(self, upload_folder, accel_prefix=None, max_age=3600):
+        self.upload_folder = upload_folder
+        self.accel_prefix = accel_prefix
+        self.max_age = max_age
+
+    def _validators(self, response, record):
+        # Legacy rows whose file was never hashed (e.g. it is missing) have no digest
+        if record['file_digest']:
+            response.set_etag(record['file_digest'])
+        last_modified = _last_modified(record)
+        if last_modified:
+            response.last_modified = last_modified
+        # private: records belong to one patient and must stay out of shared caches
+        response.headers['Cache-Control'] = f"private, max-age={self.max_age}"
+        return response
+
+    def exists(self, record):
+        return os.path.exists(os.path.join(self.upload_folder, record['file_name']))
+
+    def not_modified(self, record):
+        """A 304 response if the client already holds this file, else None."""
+        if record['file_digest'] and request.if_none_match.contains(record['file_digest']):
+            return self._validators(Response(status=304), record)
+        return None
+
+    def send(self, record, as_attachment):
+        """Serve the file; raises werkzeug NotFound if it is missing from disk."""
+        cached = self.not_modified(record)
+        if cached is not None:
+            return cached
+
+        download_name = record.get('original_name') or record['file_name']
+        if self.accel_prefix:
+            # The proxy would answer a missing file itself; fail like send_from_directory
+            if not self.exists(record):
+                raise NotFound()
+            response = Response(mimetype=record['mime_type'] or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = self.accel_prefix.rstrip('/') + '/' + record['file_name']
+            disposition = 'attachment' if as_attachment else 'inline'
+            response.headers['Content-Disposition'] = f'{disposition}; filename="{download_name}"'
+            return self._validators(response, record)
+
+        response = send_from_directory(
+            self.upload_folder,
+            record['file_name'],
+            as_attachment=as_attachment,
+            download_name=download_name,
+            mimetype=record['mime_type'],
+            etag=record['file_digest'] or True,
+            last_modified=_last_modified(record),
+            max_age=self.max_age,
+            conditional=True
+        )
+        response.headers['Cache-Control'] = f"private, max-age={self.max_age}"
+        return response
@@ -0,0 +1,204 @@
+import heapq
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0088
+# Great-circle km per degree of latitude (2 * pi * R / 360)
+KM_PER_DEGREE = 111.195
+
+# Ranking: half rating, half proximity; proximity halves every DISTANCE_SCALE_KM
+RATING_WEIGHT = 0.5
+DISTANCE_SCALE_KM = 5.0
+# ranked() without a radius scores this many nearest candidates per result
+CANDIDATE_FACTOR = 4
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def rank_score(distance_km, rating, rating_weight=RATING_WEIGHT, distance_scale=DISTANCE_SCALE_KM):
+    """0..1 score mixing rating (out of 5) with distance; nearer and better-rated is higher."""
+    proximity = 1.0 / (1.0 + distance_km / distance_scale)
+    return rating_weight * min(max(rating or 0, 0), 5) / 5.0 + (1 - rating_weight) * proximity
+
+
+class GeoIndex:
+    """
+    Fixed-grid spatial index over doctor locations.
+
+    Doctors are bucketed into `cell_deg` x `cell_deg` cells (0.05 deg is roughly
+    5 km). nearest() searches rings of cells outward from the query cell and
+    stops once the ring is further away than the k-th best distance found;
+    within() only visits the cells overlapping the radius's bounding box.
+    Entries are (lat, lon, doctor) tuples and the index is never mutated after
+    construction, so it can be swapped in atomically.
+    """
+
+    def __init__(self, doctors, cell_deg=0.05):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.locations = {}     # doctor_id -> (lat, lon)
+        self.size = 0
+        min_x = min_y = max_x = max_y = None
+        for doctor in doctors:
+            lat, lon = doctor['location_lat'], doctor['location_lon']
+            if lat is None or lon is None:
+                continue
+            cell = self._cell(lat, lon)
+            self.cells.setdefault(cell, []).append((lat, lon, doctor))
+            self.locations[doctor['doctor_id']] = (lat, lon)
+            self.size += 1
+            min_x = cell[0] if min_x is None else min(min_x, cell[0])
+            max_x = cell[0] if max_x is None else max(max_x, cell[0])
+            min_y = cell[1] if min_y is None else min(min_y, cell[1])
+            max_y = cell[1] if max_y is None else max(max_y, cell[1])
+        self.bounds = (min_x, min_y, max_x, max_y)
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg)))
+
+    def _ring(self, cx, cy, r):
+        """Cells on the square ring at Chebyshev distance r, clipped to the populated bounds."""
+        min_x, min_y, max_x, max_y = self.bounds
+        if r == 0:
+            yield (cx, cy)
+            return
+        xs = range(max(cx - r, min_x), min(cx + r, max_x) + 1)
+        for y in (cy - r, cy + r):
+            if min_y <= y <= max_y:
+                for x in xs:
+                    yield (x, y)
+        ys = range(max(cy - r + 1, min_y), min(cy + r - 1, max_y) + 1)
+        for x in (cx - r, cx + r):
+            if min_x <= x <= max_x:
+                for y in ys:
+                    yield (x, y)
+
+    def _ring_range(self, cx, cy):
+        """First and last ring that can contain indexed cells."""
+        min_x, min_y, max_x, max_y = self.bounds
+        dx = max(min_x - cx, 0, cx - max_x)
+        dy = max(min_y - cy, 0, cy - max_y)
+        last = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        return max(dx, dy), last
+
+    def _ring_clearance_km(self, lat, r):
+        """Lower bound on the distance from the query to any cell outside ring r."""
+        worst_lat = min(89.9, abs(lat) + (r + 1) * self.cell_deg)
+        return r * self.cell_deg * KM_PER_DEGREE * math.cos(math.radians(worst_lat))
+
+    @staticmethod
+    def _accept(doctor, specialty_ids):
+        return specialty_ids is None or doctor['specialty_id'] in specialty_ids
+
+    def nearest(self, lat, lon, k=10, specialty_ids=None, max_km=None):
+        """The k closest doctors as [(distance_km, doctor)], nearest first."""
+        if not self.size or k <= 0:
+            return []
+        cx, cy = self._cell(lat, lon)
+        heap = []   # max-heap via negated distance, holds the best k so far
+        first, last = self._ring_range(cx, cy)
+        for r in range(first, last + 1):
+            for cell in self._ring(cx, cy, r):
+                for d_lat, d_lon, doctor in self.cells.get(cell, ()):
+                    if not self._accept(doctor, specialty_ids):
+                        continue
+                    distance = haversine_km(lat, lon, d_lat, d_lon)
+                    if max_km is not None and distance > max_km:
+                        continue
+                    item = (-distance, doctor['doctor_id'], doctor)
+                    if len(heap) < k:
+                        heapq.heappush(heap, item)
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, item)
+            clearance = self._ring_clearance_km(lat, r)
+            if len(heap) == k and clearance >= -heap[0][0]:
+                break
+            if max_km is not None and clearance > max_km:
+                break
+        return [(-d, doctor) for d, _, doctor in sorted(heap, reverse=True)]
+
+    def within(self, lat, lon, radius_km, specialty_ids=None):
+        """All doctors within radius_km as [(distance_km, doctor)], nearest first."""
+        if not self.size:
+            return []
+        lat_span = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.9, abs(lat) + lat_span)))
+        lon_span = min(180.0, radius_km / (KM_PER_DEGREE * max(cos_lat, 1e-6)))
+        x0, y0 = self._cell(lat - lat_span, lon - lon_span)
+        x1, y1 = self._cell(lat + lat_span, lon + lon_span)
+        min_x, min_y, max_x, max_y = self.bounds
+        found = []
+        for x in range(max(x0, min_x), min(x1, max_x) + 1):
+            for y in range(max(y0, min_y), min(y1, max_y) + 1):
+                for d_lat, d_lon, doctor in self.cells.get((x, y), ()):
+                    if not self._accept(doctor, specialty_ids):
+                        continue
+                    distance = haversine_km(lat, lon, d_lat, d_lon)
+                    if distance <= radius_km:
+                        found.append((distance, doctor))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def ranked(self, lat, lon, k=10, specialty_ids=None, radius_km=None):
+        """Top k doctors by rank_score as [(score, distance_km, doctor)]."""
+        if radius_km is not None:
+            candidates = self.within(lat, lon, radius_km, specialty_ids)
+        else:
+            candidates = self.nearest(lat, lon, k * CANDIDATE_FACTOR, specialty_ids)
+        scored = [(rank_score(d, doctor['rating']), d, doctor) for d, doctor in candidates]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:k]
+
+
+DOCTOR_LOCATION_QUERY = """
+    SELECT doctor_id, name, specialty_id, specialty, rating, experience, availability,
+           location_lat, location_lon
+    FROM Doctors
+    WHERE location_lat IS NOT NULL AND location_lon IS NOT NULL
+"""
+
+
+class DoctorGeoIndex:
+    """
+    GeoIndex over the Doctors table kept in step with a SymptomGraph: the graph
+    is invalidated whenever doctors are added or edited, and the index is
+    rebuilt the first time it is used after the graph's version changes.
+    """
+
+    def __init__(self, graph, connect, cell_deg=0.05):
+        self.graph = graph
+        self._connect = connect
+        self.cell_deg = cell_deg
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def index(self):
+        version = self.graph.snapshot().version
+        index = self._index
+        if index is not None and self._version == version:
+            return index
+        with self._lock:
+            if self._index is None or self._version != version:
+                conn = self._connect()
+                try:
+                    rows = [dict(r) for r in conn.execute(DOCTOR_LOCATION_QUERY).fetchall()]
+                finally:
+                    conn.close()
+                self._index = GeoIndex(rows, self.cell_deg)
+                self._version = version
+            return self._index
+
+    def nearest(self, lat, lon, k=10, specialty_ids=None, max_km=None):
+        return self.index().nearest(lat, lon, k, specialty_ids, max_km)
+
+    def within(self, lat, lon, radius_km, specialty_ids=None):
+        return self.index().within(lat, lon, radius_km, specialty_ids)
+
+    def ranked(self, lat, lon, k=10, specialty_ids=None, radius_km=None):
+        return self.index().ranked(lat, lon, k, specialty_ids, radius_km)
@@ -0,0 +1,133 @@
+import datetime
+from collections import Counter, namedtuple
+
+# One symptom analysis as queued by log_history. symptom_ids / specialty_ids are
+# the matched symptoms and the (deduplicated) specialties they map to.
+HistoryEntry = namedtuple('HistoryEntry', [
+    'user_id', 'date_recorded', 'symptom_summary', 'remedy_summary', 'symptom_ids', 'specialty_ids'])
+
+MAX_DAYS = 366
+
+
+def record_history(cursor, entries):
+    """
+    Write a batch of HistoryEntry rows: the legacy Health_History summary row,
+    one Health_History_Symptoms row per symptom, and the daily rollups. Rollup
+    increments are summed per key first, so a batch costs one UPSERT per
+    distinct (day, symptom), (user, day, symptom) and (day, specialty).
+    """
+    cursor.executemany("""
+        INSERT INTO Health_History (user_id, symptom_name, remedy_suggested, date_recorded)
+        VALUES (?, ?, ?, ?)
+    """, [(e.user_id, e.symptom_summary, e.remedy_summary, e.date_recorded) for e in entries])
+
+    symptom_rows = [(e.user_id, sid, e.date_recorded) for e in entries for sid in e.symptom_ids]
+    cursor.executemany("""
+        INSERT INTO Health_History_Symptoms (user_id, symptom_id, date_recorded) VALUES (?, ?, ?)
+    """, symptom_rows)
+
+    specialty_demand = Counter((e.date_recorded, sid) for e in entries for sid in set(e.specialty_ids))
+    apply_rollups(cursor, symptom_rows, specialty_demand)
+
+
+def apply_rollups(cursor, symptom_rows, specialty_demand):
+    """Add (user_id, symptom_id, day) events and {(day, specialty_id): n} to the rollup tables."""
+    daily = Counter((day, sid) for _, sid, day in symptom_rows)
+    per_user = Counter((user_id, day, sid) for user_id, sid, day in symptom_rows)
+    cursor.executemany("""
+        INSERT INTO Daily_Symptom_Counts (day, symptom_id, count) VALUES (?, ?, ?)
+        ON CONFLICT(day, symptom_id) DO UPDATE SET count = count + excluded.count
+    """, [(day, sid, n) for (day, sid), n in daily.items()])
+    cursor.executemany("""
+        INSERT INTO Daily_User_Symptoms (user_id, day, symptom_id, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, day, symptom_id) DO UPDATE SET count = count + excluded.count
+    """, [(user_id, day, sid, n) for (user_id, day, sid), n in per_user.items()])
+    cursor.executemany("""
+        INSERT INTO Daily_Specialty_Demand (day, specialty_id, count) VALUES (?, ?, ?)
+        ON CONFLICT(day, specialty_id) DO UPDATE SET count = count + excluded.count
+    """, [(day, sid, n) for (day, sid), n in specialty_demand.items()])
+
+
+def backfill(cursor):
+    """
+    Normalize the comma-joined Health_History.symptom_name summaries written
+    before the rollups existed and build the rollups from them. Names that no
+    longer match a symptom are skipped.
+    """
+    cursor.execute("SELECT symptom_id, LOWER(symptom_name) FROM Symptoms")
+    symptom_ids = {name: sid for sid, name in cursor.fetchall()}
+    cursor.execute("SELECT symptom_id, specialty_id FROM Symptom_Specialty_Mapping")
+    specialties = {}
+    for sid, specialty_id in cursor.fetchall():
+        specialties.setdefault(sid, set()).add(specialty_id)
+
+    cursor.execute("SELECT user_id, symptom_name, date_recorded FROM Health_History ORDER BY rowid")
+    symptom_rows = []
+    specialty_demand = Counter()
+    for user_id, summary, day in cursor.fetchall():
+        ids = [symptom_ids[name.strip().lower()] for name in (summary or '').split(',')
+               if name.strip().lower() in symptom_ids]
+        symptom_rows.extend((user_id, sid, day) for sid in ids)
+        specialty_demand.update((day, sp) for sp in set().union(*(specialties.get(sid, set()) for sid in ids)))
+    cursor.executemany("""
+        INSERT INTO Health_History_Symptoms (user_id, symptom_id, date_recorded) VALUES (?, ?, ?)
+    """, symptom_rows)
+    apply_rollups(cursor, symptom_rows, specialty_demand)
+
+
+def clamp_days(days):
+    """The window length actually used for `days`: between 1 and MAX_DAYS."""
+    return max(1, min(int(days), MAX_DAYS))
+
+
+def _window(days, today=None):
+    days = clamp_days(days)
+    today = today or datetime.date.today()
+    return (today - datetime.timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def top_symptoms(conn, days=7, limit=10, today=None):
+    """Most reported symptoms over the last `days` days as [{symptom_id, name, count}]."""
+    first, last = _window(days, today)
+    rows = conn.execute("""
+        SELECT C.symptom_id, S.symptom_name, SUM(C.count) AS total
+        FROM Daily_Symptom_Counts C
+        JOIN Symptoms S ON S.symptom_id = C.symptom_id
+        WHERE C.day BETWEEN ? AND ?
+        GROUP BY C.symptom_id
+        ORDER BY total DESC, S.symptom_name
+        LIMIT ?
+    """, (first, last, limit)).fetchall()
+    return [{'symptom_id': r[0], 'name': r[1], 'count': r[2]} for r in rows]
+
+
+def specialty_demand(conn, days=7, today=None):
+    """Analyses pointing to each specialty over the last `days` days as [{specialty_id, name, count}]."""
+    first, last = _window(days, today)
+    rows = conn.execute("""
+        SELECT D.specialty_id, P.specialty_name, SUM(D.count) AS total
+        FROM Daily_Specialty_Demand D
+        JOIN Specialties P ON P.specialty_id = D.specialty_id
+        WHERE D.day BETWEEN ? AND ?
+        GROUP BY D.specialty_id
+        ORDER BY total DESC, P.specialty_name
+    """, (first, last)).fetchall()
+    return [{'specialty_id': r[0], 'name': r[1], 'count': r[2]} for r in rows]
+
+
+def symptom_timeline(conn, user_id, days=30, today=None):
+    """One patient's symptoms per day, oldest first, as [{day, symptoms: [{symptom_id, name, count}]}]."""
+    first, last = _window(days, today)
+    rows = conn.execute("""
+        SELECT U.day, U.symptom_id, S.symptom_name, U.count
+        FROM Daily_User_Symptoms U
+        JOIN Symptoms S ON S.symptom_id = U.symptom_id
+        WHERE U.user_id = ? AND U.day BETWEEN ? AND ?
+        ORDER BY U.day, U.count DESC, S.symptom_name
+    """, (user_id, first, last)).fetchall()
+    timeline = []
+    for day, symptom_id, name, count in rows:
+        if not timeline or timeline[-1]['day'] != day:
+            timeline.append({'day': day, 'symptoms': []})
+        timeline[-1]['symptoms'].append({'symptom_id': symptom_id, 'name': name, 'count': count})
+    return timeline
@@ -0,0 +1,265 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from health_analytics import record_history
+from metrics import log_event
+
+_STOP = object()
+
+
+def _is_transient(error):
+    """Errors worth retrying: another connection holds the write lock."""
+    return isinstance(error, sqlite3.OperationalError) and any(
+        word in str(error) for word in ("locked", "busy"))
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for health history entries (health_analytics.HistoryEntry).
+
+    submit() only enqueues, so the request that produced a row never waits
+    for a commit. One background thread drains the queue and commits every
+    `batch_size` rows or `flush_interval` seconds, whichever comes first, so
+    a burst of analyses costs one write transaction instead of one each.
+
+    The queue is bounded. When it is full, submit() waits up to
+    `block_timeout` seconds for room and then puts the row on a spill list
+    that the writer drains with its next batches; the request thread never
+    touches the database.
+
+    A batch that fails because the database is locked or busy (or cannot be
+    opened) is retried with backoff, up to `retries` attempts. Any other
+    error will not go away by retrying (a missing table, a bad row), so the
+    batch is not retried: rows that fail on their own, or a batch that keeps
+    failing, are logged at ERROR, counted in dropped_rows and kept in a
+    bounded quarantine (see quarantined()) while the writer moves on.
+    Rows are also dropped when the spill list is full.
+    close() (registered with atexit by app.py) drains whatever is still queued.
+
+    `connect` must return a connection of the writer's own, not a pooled one:
+    the writer keeps it open and reopens it after an error.
+
+    Each batch is written by record_history, which also updates the daily
+    rollups in the same transaction.
+    """
+
+    def __init__(self, connect, max_queue=10000, batch_size=200, flush_interval=0.5,
+                 block_timeout=0.05, retries=5, max_spill=100000, max_backoff=5.0, max_quarantine=1000):
+        self._connect = connect
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.retries = retries
+        self.max_spill = max_spill
+        self.max_backoff = max_backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill = deque()
+        self._quarantine = deque(maxlen=max_quarantine)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._conn = None
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'spilled_rows': 0,
+            'blocked_time_total': 0.0,
+            'failed_attempts': 0,
+            'dropped_rows': 0,
+            'queue_high_water': 0,
+            'last_batch_size': 0,
+            'last_batch_ms': 0.0,
+        }
+
+    def _ensure_worker(self):
+        # Started on first use, and again in a forked child, which does not
+        # inherit the parent's thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._conn = None   # the parent's connection is not ours to use
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, row):
+        """Queue one HistoryEntry."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            start = time.perf_counter()
+            try:
+                self._queue.put(row, timeout=self.block_timeout)
+            except queue.Full:
+                # The writer is behind: park the row for it rather than writing here
+                with self._lock:
+                    self._stats['blocked_time_total'] += time.perf_counter() - start
+                    spilled = len(self._spill) < self.max_spill
+                    if spilled:
+                        self._spill.append(row)
+                        self._stats['spilled_rows'] += 1
+                    else:
+                        self._stats['dropped_rows'] += 1
+                if not spilled:
+                    log_event("history_writer.dropped", level=logging.ERROR, rows=1, reason="spill full")
+                return
+            with self._lock:
+                self._stats['blocked_time_total'] += time.perf_counter() - start
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats['enqueued'] += 1
+            self._stats['queue_high_water'] = max(self._stats['queue_high_water'], depth)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                # Spilled rows wait for a quiet moment if nothing else arrives
+                spilled = self._take_spill()
+                if spilled:
+                    self._write(spilled)
+                continue
+            if item is _STOP:
+                self._queue.task_done()
+                remaining = self._take_spill(len(self._spill))
+                if remaining:
+                    self._write(remaining)
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            queued = len(batch)
+            try:
+                self._write(batch + self._take_spill())
+            except Exception as e:
+                # _write quarantines what it cannot commit; this is a last resort
+                # so the thread never dies
+                log_event("history_writer.batch_failed", level=logging.ERROR, rows=len(batch), error=str(e))
+            finally:
+                for _ in range(queued + stop):
+                    self._queue.task_done()
+            if stop:
+                remaining = self._take_spill(len(self._spill))
+                if remaining:
+                    self._write(remaining)
+                return
+
+    def _take_spill(self, limit=None):
+        rows = []
+        limit = self.batch_size if limit is None else limit
+        with self._lock:
+            while self._spill and len(rows) < limit:
+                rows.append(self._spill.popleft())
+        return rows
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _reset(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _write(self, rows):
+        """Commit `rows`: transient errors are retried, anything else is quarantined."""
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                conn = self._db()
+            except Exception as e:
+                # Cannot open the database at the moment; treat like a lock
+                error, transient = e, True
+            else:
+                try:
+                    record_history(conn.cursor(), rows)
+                    conn.commit()
+                    break
+                except Exception as e:
+                    error, transient = e, _is_transient(e)
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+            self._reset()
+            attempt += 1
+            with self._lock:
+                self._stats['failed_attempts'] += 1
+            if not transient and len(rows) > 1 and not isinstance(error, sqlite3.OperationalError):
+                # Probably one bad row: write the rest without it
+                for row in rows:
+                    self._write([row])
+                return
+            if not transient or attempt >= self.retries:
+                self._quarantine_rows(rows, error, attempt)
+                return
+            log_event("history_writer.write_failed", level=logging.WARNING, rows=len(rows),
+                      attempt=attempt, error=str(error))
+            time.sleep(min(self.max_backoff, 0.1 * 2 ** attempt))
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._stats['written'] += len(rows)
+            self._stats['batches'] += 1
+            self._stats['last_batch_size'] = len(rows)
+            self._stats['last_batch_ms'] = round(elapsed, 3)
+
+    def _quarantine_rows(self, rows, error, attempts):
+        with self._lock:
+            self._stats['dropped_rows'] += len(rows)
+            self._quarantine.extend(rows)
+        log_event("history_writer.dropped", level=logging.ERROR, rows=len(rows), reason="write failed",
+                  attempts=attempts, error=repr(error), entries=[row._asdict() if hasattr(row, '_asdict') else row for row in rows])
+
+    def quarantined(self):
+        """The most recent rows that could not be written, oldest first."""
+        with self._lock:
+            return list(self._quarantine)
+
+    def flush(self):
+        """Block until every row queued or spilled so far is committed."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+            while self._spill and self._thread.is_alive():
+                time.sleep(self.flush_interval / 10)
+
+    def close(self):
+        """Drain the queue and stop the worker."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['spill_depth'] = len(self._spill)
+        stats['quarantined_rows'] = len(self._quarantine)
+        stats['queue_capacity'] = self._queue.maxsize
+        stats['blocked_time_total'] = round(stats['blocked_time_total'], 6)
+        return stats
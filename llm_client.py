@@ -0,0 +1,224 @@
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling Gemini when the client is saturated or the circuit is open."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class UpstreamBusyError(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and rejects calls
+    for `reset_timeout` seconds, then lets a single trial call through.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError("Upstream circuit is open")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_ignored(self):
+        """The upstream answered, but the call failed for its own reasons (a 4xx): count nothing."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+def _upstream_fault(error):
+    """Errors that say the upstream (or the way to it) is unhealthy: transport, 429 and 5xx."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+def _reply_text(result):
+    return result["candidates"][0]["content"]["parts"][0]["text"]
+
+
+class GeminiClient:
+    """
+    Pooled, bounded client for the Gemini generateContent API.
+
+    - keep-alive connections are reused through one requests.Session
+    - at most `max_concurrency` calls are in flight; callers wait up to
+      `queue_timeout` seconds for a slot before UpstreamBusyError
+    - every call has separate connect and read timeouts
+    - connection errors, timeouts, 429 and 5xx are retried with jittered
+      exponential backoff, and repeated failures of that kind (including a
+      stream that breaks off) open a circuit breaker; other 4xx responses
+      are the caller's problem and never count against the upstream
+    """
+
+    def __init__(self, api_base, api_key, model, connect_timeout=3.05, read_timeout=30,
+                 max_concurrency=8, queue_timeout=5, max_retries=2, backoff_base=0.25,
+                 backoff_max=4.0, breaker=None, on_call=None):
+        self.api_base = api_base.rstrip('/')
+        self.api_key = api_key
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        # on_call(method, seconds, outcome) after every HTTP attempt; outcome is
+        # "ok", "retry" or "error" and seconds runs until the response headers
+        self.on_call = on_call
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Content-Type"] = "application/json"
+        # Sent as a header rather than ?key= so it never shows up in logged URLs
+        self.session.headers["x-goog-api-key"] = api_key
+        self._stats_lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'failures': 0, 'rejected': 0}
+
+    def _url(self, method):
+        return f"{self.api_base}/models/{self.model}:{method}"
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self._count('rejected')
+            raise UpstreamBusyError("Too many concurrent upstream requests")
+
+    def _backoff(self, attempt):
+        # "Full jitter": spreads retries from many workers instead of synchronising them
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+
+    def _post(self, method, payload, stream=False, params=None):
+        self.breaker.before_call()
+        attempt = 0
+        while True:
+            self._count('calls')
+            start = time.perf_counter()
+            try:
+                response = self.session.post(self._url(method), params=params, json=payload,
+                                             timeout=self.timeout, stream=stream)
+                response.raise_for_status()
+                self._observe(method, start, "ok")
+                if not stream:
+                    # A stream only counts as a success once it has been read to the end
+                    self.breaker.record_success()
+                return response
+            except requests.exceptions.RequestException as e:
+                upstream_fault = _upstream_fault(e)
+                if attempt < self.max_retries and upstream_fault:
+                    self._observe(method, start, "retry")
+                    attempt += 1
+                    self._count('retries')
+                    self._backoff(attempt)
+                    continue
+                self._observe(method, start, "error")
+                self._count('failures')
+                if upstream_fault:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_ignored()
+                raise
+
+    def _observe(self, method, start, outcome):
+        if self.on_call is not None:
+            self.on_call(method, time.perf_counter() - start, outcome)
+
+    def generate(self, contents):
+        """Return the full reply text for `contents`."""
+        self._acquire()
+        try:
+            response = self._post("generateContent", {"contents": contents})
+            return _reply_text(response.json())
+        finally:
+            self._slots.release()
+
+    def stream(self, contents):
+        """Yield reply text chunks as Gemini produces them (streamGenerateContent over SSE)."""
+        self._acquire()
+        try:
+            response = self._post("streamGenerateContent", {"contents": contents},
+                                  stream=True, params={"alt": "sse"})
+            outcome = None
+            with response:
+                try:
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data:"):
+                            continue
+                        chunk = json.loads(line[len("data:"):].strip())
+                        try:
+                            text = _reply_text(chunk)
+                        except (KeyError, IndexError):
+                            continue
+                        if text:
+                            yield text
+                    outcome = 'ok'
+                except requests.exceptions.RequestException:
+                    # Broke off after the headers (reset, read timeout): an upstream failure too
+                    outcome = 'failed'
+                    self._count('failures')
+                    self.breaker.record_failure()
+                    raise
+                finally:
+                    if outcome == 'ok':
+                        self.breaker.record_success()
+                    elif outcome is None:
+                        # Abandoned by the caller or unparseable: says nothing about the upstream
+                        self.breaker.record_ignored()
+        finally:
+            self._slots.release()
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['circuit'] = self.breaker.state
+        return stats
@@ -0,0 +1,276 @@
+import bisect
+import json
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+# Seconds; covers a cached page (~1 ms) up to a slow upstream chat call
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# Structured logs: one JSON object per line on stderr. LOG_LEVEL=DEBUG also
+# shows sampled diagnostics; LOG_SAMPLE_RATE is the fraction of them kept.
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 0.01))
+logger = logging.getLogger("smarthealth")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+
+class Registry:
+    """
+    Counters and histograms sharded per thread.
+
+    Each thread updates only its own dict, so recording a value takes no lock
+    (the GIL makes the single dict store atomic). render() merges the shards
+    when /metrics is scraped. A finished thread's shard is folded into a
+    retired shard so values survive while per-request threads come and go.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = {}          # id(shard) -> shard of a live thread
+        self._retired = {}
+        self._metrics = []         # registration order, for stable output
+        self._collectors = []
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            self._shards.pop(id(shard), None)
+            _merge(self._retired, shard)
+
+    def _snapshot(self):
+        merged = {}
+        with self._lock:
+            _merge(merged, self._retired)
+            shards = list(self._shards.values())
+        for shard in shards:
+            _merge(merged, dict(shard))
+        return merged
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(self, name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge_callback(self, name, help_text, fn):
+        """A gauge read at scrape time: fn() returns a number or {label value tuple: number}."""
+        self._collectors.append((name, help_text, fn))
+
+    def render(self):
+        """Everything in the Prometheus text exposition format (version 0.0.4)."""
+        values = self._snapshot()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(values))
+        for name, help_text, fn in self._collectors:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                result = fn()
+            except Exception as e:
+                log_event("metrics.collector_failed", level=logging.WARNING, collector=name, error=str(e))
+                continue
+            if isinstance(result, dict):
+                for labels, value in sorted(result.items()):
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            else:
+                lines.append(f"{name} {_number(result)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge(into, shard):
+    for key, value in shard.items():
+        if isinstance(value, list):
+            current = into.get(key)
+            if current is None:
+                into[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    current[i] += v
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 9))
+    return str(value)
+
+
+class Counter:
+    def __init__(self, registry, name, help_text, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labelvalues, amount=1):
+        shard = self.registry._shard()
+        key = (self.name, labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, values):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for (name, labelvalues), value in sorted((k, v) for k, v in values.items() if k[0] == self.name):
+            lines.append(f"{self.name}{_labels(zip(self.labelnames, labelvalues))} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, registry, name, help_text, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        shard = self.registry._shard()
+        key = (self.name, labelvalues)
+        cells = shard.get(key)
+        if cells is None:
+            # One cell per bucket, then +Inf, then the running sum
+            cells = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def time(self, *labelvalues):
+        return _Timer(self, labelvalues)
+
+    def render(self, values):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for (name, labelvalues), cells in sorted((k, v) for k, v in values.items() if k[0] == self.name):
+            pairs = list(zip(self.labelnames, labelvalues))
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), cells):
+                running += count
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', bound)])} {running}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {_number(cells[-1])}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {running}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+def log_event(event, level=logging.INFO, sample_rate=None, **fields):
+    """
+    One structured (JSON) log line. With a sample_rate only that fraction of
+    calls is written, which keeps per-request diagnostics off the hot path.
+    """
+    if sample_rate is not None and random.random() >= sample_rate:
+        return
+    if not logger.isEnabledFor(level):
+        return
+    record = {'event': event, 'ts': round(time.time(), 3)}
+    if sample_rate is not None:
+        record['sample_rate'] = sample_rate
+    record.update(fields)
+    logger.log(level, json.dumps(record, default=str))
+
+
+# Process-wide registry and the metrics app.py records
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from request start until the view returned a response.",
+    ("endpoint", "method", "status"))
+http_request_sql_queries = registry.histogram(
+    "http_request_sql_queries", "SQL statements executed per request.", ("endpoint",), COUNT_BUCKETS)
+http_request_sql_seconds = registry.histogram(
+    "http_request_sql_seconds", "Time spent in SQL execute() per request.", ("endpoint",))
+sql_query_duration = registry.histogram(
+    "sql_query_duration_seconds", "Duration of one SQL execute()/executemany() call (up to the first row).",
+    ("statement",))
+gemini_request_duration = registry.histogram(
+    "gemini_request_duration_seconds", "Gemini HTTP call until response headers, per attempt.",
+    ("method", "outcome"))
+gemini_stream_duration = registry.histogram(
+    "gemini_stream_duration_seconds", "Whole streamed chat reply, first request to last chunk.", ("outcome",))
+model_inference_duration = registry.histogram(
+    "model_inference_duration_seconds", "Disease model predict() time.", ("route",))
+model_batch_size = registry.histogram(
+    "model_batch_size", "Patients scored per model call.", ("route",), (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+record_uploads = registry.counter(
+    "record_uploads_total", "Stored health record uploads; deduplicated=true reused an existing blob.",
+    ("deduplicated",))
+
+
+# Per-request SQL accounting: the pool's query hook adds to the current
+# thread's request state while a request is being served
+_request_state = threading.local()
+
+
+def start_request():
+    _request_state.sql = [0, 0.0]
+    _request_state.start = time.perf_counter()
+
+
+def record_query(sql, seconds):
+    """ConnectionPool on_query hook."""
+    statement = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "EMPTY"
+    if statement not in ("SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "PRAGMA", "WITH"):
+        statement = "OTHER"
+    sql_query_duration.observe(seconds, statement)
+    totals = getattr(_request_state, 'sql', None)
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += seconds
+
+
+def finish_request(endpoint, method, status):
+    """Record the request's latency and SQL totals; returns (seconds, queries, sql seconds)."""
+    start = getattr(_request_state, 'start', None)
+    totals = getattr(_request_state, 'sql', None)
+    _request_state.start = _request_state.sql = None
+    if start is None:
+        return None
+    elapsed = time.perf_counter() - start
+    endpoint = endpoint or "unmatched"
+    http_request_duration.observe(elapsed, endpoint, method, str(status))
+    http_request_sql_queries.observe(totals[0], endpoint)
+    http_request_sql_seconds.observe(totals[1], endpoint)
+    return elapsed, totals[0], totals[1]
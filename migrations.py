@@ -0,0 +1,566 @@
+import re
+import sqlite3
+import sys
+from collections import Counter
+
+from credentials import PasswordHasher, hash_many, is_hashed
+
+DB_NAME = 'health.db'
+
+# Hashes written by hash_plaintext_passwords(). Pinned so the conversion does
+# not change when credentials.SCRYPT_N is raised; logins then upgrade them to
+# the live settings like any other outdated hash.
+PASSWORD_CONVERSION_PARAMS = {'n': 2 ** 14, 'r': 8, 'p': 1, 'iterations': 600000}
+PASSWORD_BATCH_SIZE = 100
+
+
+# Secondary indexes for the lookups app.py runs on every request, as they
+# stand after the latest migration. Kept as data so bulk loads can drop them
+# and rebuild them afterwards. Migrations spell out the indexes they create
+# instead of reading this list, so a released migration never changes; a new
+# index goes here and into a new migration.
+# Users/Doctors logins already resolve through the UNIQUE(email) autoindex.
+INDEXES = [
+    ("idx_appointments_doctor_date",
+     "Appointments(doctor_id, appointment_date DESC, appointment_time DESC)"),
+    ("idx_appointments_user_date",
+     "Appointments(user_id, appointment_date DESC, appointment_time DESC)"),
+    ("idx_appointments_doctor_status",
+     "Appointments(doctor_id, status, appointment_date DESC, appointment_time DESC)"),
+    ("idx_appointments_user_status",
+     "Appointments(user_id, status, appointment_date DESC, appointment_time DESC)"),
+    ("idx_userrecords_user_page",
+     "UserRecords(user_id, upload_date DESC, record_id DESC)"),
+    ("idx_health_history_user_date",
+     "Health_History(user_id, date_recorded)"),
+    ("idx_doctors_specialty_rating",
+     "Doctors(specialty_id, rating DESC, experience DESC)"),
+    ("idx_doctors_name",
+     "Doctors(name)"),
+    ("idx_symptoms_name_lower",
+     "Symptoms(LOWER(symptom_name))"),
+]
+
+
+def create_indexes(cursor, indexes=INDEXES):
+    for name, definition in indexes:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def drop_indexes(cursor, indexes=INDEXES):
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _baseline_schema(cursor):
+    # The schema db_setup.py has always created. Every statement is
+    # IF NOT EXISTS so databases created before migrations existed upgrade cleanly.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Symptoms (
+            symptom_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symptom_name TEXT NOT NULL UNIQUE,
+            description TEXT,
+            doctor_advice TEXT,
+            priority INTEGER DEFAULT 1
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Recommendations (
+            rec_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rec_name TEXT NOT NULL,
+            rec_type TEXT NOT NULL CHECK(rec_type IN ('Home Remedy', 'Dietary', 'Ayurvedic', 'Tablet')),
+            instructions TEXT NOT NULL,
+            disclaimer TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Symptom_Recommendation_Mapping (
+            mapping_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symptom_id INTEGER NOT NULL,
+            rec_id INTEGER NOT NULL,
+            FOREIGN KEY (symptom_id) REFERENCES Symptoms (symptom_id) ON DELETE CASCADE,
+            FOREIGN KEY (rec_id) REFERENCES Recommendations (rec_id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Specialties (
+            specialty_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            specialty_name TEXT NOT NULL UNIQUE,
+            description TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Doctors (
+            doctor_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            specialty_id INTEGER NOT NULL,
+            rating REAL,
+            experience INTEGER,
+            location_lat REAL,
+            location_lon REAL,
+            availability TEXT,
+            email TEXT UNIQUE,
+            password TEXT,
+            specialty TEXT,           -- ADDED: Required for Flask Profile view
+            biography TEXT,           -- ADDED: Required for Flask Profile view
+            FOREIGN KEY (specialty_id) REFERENCES Specialties (specialty_id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Symptom_Specialty_Mapping (
+            map_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symptom_id INTEGER NOT NULL,
+            specialty_id INTEGER NOT NULL,
+            FOREIGN KEY (symptom_id) REFERENCES Symptoms (symptom_id) ON DELETE CASCADE,
+            FOREIGN KEY (specialty_id) REFERENCES Specialties (specialty_id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE,
+            password TEXT NOT NULL
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Appointments (
+            appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            doctor_id INTEGER,
+            appointment_date TEXT,
+            appointment_time TEXT,
+            status TEXT DEFAULT 'Pending',
+            reason TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id),
+            FOREIGN KEY (doctor_id) REFERENCES Doctors(doctor_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Health_History(
+            user_id INTEGER,
+            symptom_name TEXT,
+            remedy_suggested TEXT,
+            date_recorded TEXT,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS UserRecords (
+            record_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            file_name TEXT NOT NULL,
+            description TEXT,
+            upload_date TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        )
+    ''')
+
+
+def _hot_lookup_indexes(cursor):
+    # The index set as released with this migration; later migrations replace
+    # idx_userrecords_user_date and the two mapping indexes
+    create_indexes(cursor, [
+        ("idx_appointments_doctor_date",
+         "Appointments(doctor_id, appointment_date DESC, appointment_time DESC)"),
+        ("idx_appointments_user_date",
+         "Appointments(user_id, appointment_date DESC, appointment_time DESC)"),
+        ("idx_userrecords_user_date",
+         "UserRecords(user_id, upload_date DESC, file_name, description)"),
+        ("idx_health_history_user_date",
+         "Health_History(user_id, date_recorded)"),
+        ("idx_symptom_rec_map_symptom",
+         "Symptom_Recommendation_Mapping(symptom_id, rec_id)"),
+        ("idx_symptom_spec_map_symptom",
+         "Symptom_Specialty_Mapping(symptom_id, specialty_id)"),
+        ("idx_doctors_specialty_rating",
+         "Doctors(specialty_id, rating DESC, experience DESC)"),
+        ("idx_doctors_name",
+         "Doctors(name)"),
+        ("idx_symptoms_name_lower",
+         "Symptoms(LOWER(symptom_name))"),
+    ])
+    cursor.execute("ANALYZE")
+
+
+def _record_file_metadata(cursor):
+    # Size and SHA-256 are captured while the upload streams to disk, so nothing
+    # has to stat or re-read the file afterwards. file_name is a content-addressed
+    # blob that several rows may share, hence the index for reference counting.
+    cursor.execute("ALTER TABLE UserRecords ADD COLUMN file_size INTEGER")
+    cursor.execute("ALTER TABLE UserRecords ADD COLUMN file_digest TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_userrecords_file_name ON UserRecords(file_name)")
+
+
+def _record_mime_and_paging(cursor):
+    # get_records pages on (upload_date, record_id), so the index carries both
+    cursor.execute("ALTER TABLE UserRecords ADD COLUMN mime_type TEXT")
+    cursor.execute("DROP INDEX IF EXISTS idx_userrecords_user_date")
+    create_indexes(cursor, [("idx_userrecords_user_page", "UserRecords(user_id, upload_date DESC, record_id DESC)")])
+
+
+# Frozen copy of scheduling.parse_availability as released with migration 5.
+# Migrations must not follow later changes to the live parser.
+_AVAILABILITY_RANGE = re.compile(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})")
+
+
+def _parse_availability_v5(text):
+    text = (text or '').strip()
+    mode, _, hours = text.partition('/')
+    if not hours and _AVAILABILITY_RANGE.search(mode):
+        mode, hours = '', mode
+    windows = []
+    for h1, m1, h2, m2 in _AVAILABILITY_RANGE.findall(hours):
+        start, end = int(h1) * 60 + int(m1), int(h2) * 60 + int(m2)
+        if start < end <= 24 * 60:
+            windows.append((start, end))
+    if not windows and mode.strip().lower() == 'available':
+        windows = [(9 * 60, 17 * 60)]
+    return mode.strip() or None, sorted(windows)
+
+
+def _doctor_schedule(cursor):
+    # Structured weekly hours parsed from the free-text Doctors.availability;
+    # weekday NULL means every day. Minutes are since midnight.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Doctor_Schedule (
+            schedule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            doctor_id INTEGER NOT NULL,
+            weekday INTEGER,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL,
+            mode TEXT,
+            slot_minutes INTEGER NOT NULL DEFAULT 30,
+            FOREIGN KEY (doctor_id) REFERENCES Doctors (doctor_id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_doctor_schedule_doctor ON Doctor_Schedule(doctor_id, weekday)")
+    cursor.execute("SELECT doctor_id, availability FROM Doctors")
+    for doctor_id, availability in cursor.fetchall():
+        mode, windows = _parse_availability_v5(availability)
+        cursor.execute("DELETE FROM Doctor_Schedule WHERE doctor_id=?", (doctor_id,))
+        cursor.executemany("""
+            INSERT INTO Doctor_Schedule (doctor_id, weekday, start_minute, end_minute, mode, slot_minutes)
+            VALUES (?, NULL, ?, ?, ?, 30)
+        """, [(doctor_id, start, end, mode) for start, end in windows])
+
+
+def _appointment_change_feed(cursor):
+    # Every write to Appointments appends a row here, so seq is a monotonically
+    # increasing version that doctor panels poll or stream from. A reassigned
+    # appointment is reported as deleted to its previous doctor.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Appointment_Changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            appointment_id INTEGER NOT NULL,
+            doctor_id INTEGER,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_appointment_changes_doctor ON Appointment_Changes(doctor_id, seq)")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_insert AFTER INSERT ON Appointments
+        BEGIN
+            INSERT INTO Appointment_Changes (appointment_id, doctor_id, op)
+            VALUES (NEW.appointment_id, NEW.doctor_id, 'insert');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_update AFTER UPDATE ON Appointments
+        BEGIN
+            INSERT INTO Appointment_Changes (appointment_id, doctor_id, op)
+            SELECT OLD.appointment_id, OLD.doctor_id, 'delete' WHERE OLD.doctor_id IS NOT NEW.doctor_id;
+            INSERT INTO Appointment_Changes (appointment_id, doctor_id, op)
+            VALUES (NEW.appointment_id, NEW.doctor_id, 'update');
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_delete AFTER DELETE ON Appointments
+        BEGIN
+            INSERT INTO Appointment_Changes (appointment_id, doctor_id, op)
+            VALUES (OLD.appointment_id, OLD.doctor_id, 'delete');
+        END
+    ''')
+
+
+def _appointment_status_indexes(cursor):
+    # AppointmentQuery filters on status and pages on (date, time); these serve
+    # the filtered pages and the per-status summary without touching the table
+    create_indexes(cursor, [
+        ("idx_appointments_doctor_status",
+         "Appointments(doctor_id, status, appointment_date DESC, appointment_time DESC)"),
+        ("idx_appointments_user_status",
+         "Appointments(user_id, status, appointment_date DESC, appointment_time DESC)"),
+    ])
+    cursor.execute("ANALYZE")
+
+
+def _catalogue_natural_keys(cursor):
+    # bulk_load.py upserts on these keys. Duplicates are folded into the oldest
+    # row first (mappings repointed), then the keys become UNIQUE; the pair
+    # indexes replace the plain ones migration 2 created on the same columns.
+    cursor.execute("""
+        UPDATE Symptom_Recommendation_Mapping SET rec_id = (
+            SELECT MIN(R2.rec_id) FROM Recommendations R1
+            JOIN Recommendations R2 ON R2.rec_name = R1.rec_name AND R2.rec_type = R1.rec_type
+            WHERE R1.rec_id = Symptom_Recommendation_Mapping.rec_id)
+        WHERE rec_id IN (SELECT rec_id FROM Recommendations)
+    """)
+    cursor.execute("""
+        DELETE FROM Recommendations WHERE rec_id NOT IN (
+            SELECT MIN(rec_id) FROM Recommendations GROUP BY rec_name, rec_type)
+    """)
+    cursor.execute("""
+        DELETE FROM Symptom_Recommendation_Mapping WHERE mapping_id NOT IN (
+            SELECT MIN(mapping_id) FROM Symptom_Recommendation_Mapping GROUP BY symptom_id, rec_id)
+    """)
+    cursor.execute("""
+        DELETE FROM Symptom_Specialty_Mapping WHERE map_id NOT IN (
+            SELECT MIN(map_id) FROM Symptom_Specialty_Mapping GROUP BY symptom_id, specialty_id)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_symptom_rec_map_symptom")
+    cursor.execute("DROP INDEX IF EXISTS idx_symptom_spec_map_symptom")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_recommendations_name_type ON Recommendations(rec_name, rec_type)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_symptom_rec_map_pair ON Symptom_Recommendation_Mapping(symptom_id, rec_id)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_symptom_spec_map_pair ON Symptom_Specialty_Mapping(symptom_id, specialty_id)")
+
+
+def _health_history_rollups(cursor):
+    # One row per (analysis, symptom) instead of the comma-joined summary, plus
+    # daily rollups kept current by the history writer so analytics read a few
+    # pre-aggregated rows instead of scanning the history.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Health_History_Symptoms (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            symptom_id INTEGER NOT NULL,
+            date_recorded TEXT NOT NULL
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_health_history_symptoms_user ON Health_History_Symptoms(user_id, date_recorded)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Daily_Symptom_Counts (
+            day TEXT NOT NULL,
+            symptom_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, symptom_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Daily_User_Symptoms (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            symptom_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day, symptom_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Daily_Specialty_Demand (
+            day TEXT NOT NULL,
+            specialty_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, specialty_id)
+        ) WITHOUT ROWID
+    ''')
+    # Split the comma-joined Health_History.symptom_name summaries written
+    # before the rollups existed and build the rollups from them; names that
+    # no longer match a symptom are skipped. Frozen copy of the released
+    # health_analytics.backfill/apply_rollups.
+    cursor.execute("SELECT symptom_id, LOWER(symptom_name) FROM Symptoms")
+    symptom_ids = {name: sid for sid, name in cursor.fetchall()}
+    cursor.execute("SELECT symptom_id, specialty_id FROM Symptom_Specialty_Mapping")
+    specialties = {}
+    for sid, specialty_id in cursor.fetchall():
+        specialties.setdefault(sid, set()).add(specialty_id)
+
+    cursor.execute("SELECT user_id, symptom_name, date_recorded FROM Health_History ORDER BY rowid")
+    symptom_rows = []
+    specialty_demand = Counter()
+    for user_id, summary, day in cursor.fetchall():
+        ids = [symptom_ids[name.strip().lower()] for name in (summary or '').split(',')
+               if name.strip().lower() in symptom_ids]
+        symptom_rows.extend((user_id, sid, day) for sid in ids)
+        specialty_demand.update((day, sp) for sp in set().union(*(specialties.get(sid, set()) for sid in ids)))
+    cursor.executemany("""
+        INSERT INTO Health_History_Symptoms (user_id, symptom_id, date_recorded) VALUES (?, ?, ?)
+    """, symptom_rows)
+
+    daily = Counter((day, sid) for _, sid, day in symptom_rows)
+    per_user = Counter((user_id, day, sid) for user_id, sid, day in symptom_rows)
+    cursor.executemany("""
+        INSERT INTO Daily_Symptom_Counts (day, symptom_id, count) VALUES (?, ?, ?)
+        ON CONFLICT(day, symptom_id) DO UPDATE SET count = count + excluded.count
+    """, [(day, sid, n) for (day, sid), n in daily.items()])
+    cursor.executemany("""
+        INSERT INTO Daily_User_Symptoms (user_id, day, symptom_id, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, day, symptom_id) DO UPDATE SET count = count + excluded.count
+    """, [(user_id, day, sid, n) for (user_id, day, sid), n in per_user.items()])
+    cursor.executemany("""
+        INSERT INTO Daily_Specialty_Demand (day, specialty_id, count) VALUES (?, ?, ?)
+        ON CONFLICT(day, specialty_id) DO UPDATE SET count = count + excluded.count
+    """, [(day, sid, n) for (day, sid), n in specialty_demand.items()])
+
+
+def _hash_passwords(cursor):
+    # No-op. Hashing every plaintext password here held the write lock for the
+    # whole KDF pass while app.py was importing; hash_plaintext_passwords()
+    # now does it in short batches after migrate() (app.py starts it in a
+    # background thread), and a login replaces any plaintext it meets.
+    pass
+
+
+def hash_plaintext_passwords(database=DB_NAME, batch_size=PASSWORD_BATCH_SIZE, max_workers=None):
+    """
+    Replace legacy plaintext Users/Doctors passwords with hashes. Each batch is
+    hashed outside any transaction and written in its own short one, so logins
+    and writes carry on meanwhile; a password changed in between is left as
+    it is. Only rows that do not look hashed are read, so once everything is
+    converted a run costs one index-free scan per table. Returns the number of
+    rows converted.
+    """
+    hasher = PasswordHasher(**PASSWORD_CONVERSION_PARAMS)
+    conn = sqlite3.connect(database, timeout=30)
+    converted = 0
+    try:
+        for table, id_column in (("Users", "user_id"), ("Doctors", "doctor_id")):
+            last_id = 0
+            while True:
+                rows = conn.execute(f"""
+                    SELECT {id_column}, password FROM {table}
+                    WHERE {id_column} > ? AND password IS NOT NULL
+                      AND password NOT LIKE 'scrypt$%' AND password NOT LIKE 'pbkdf2_sha256$%'
+                    ORDER BY {id_column} LIMIT ?
+                """, (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                plaintext = [(row_id, password) for row_id, password in rows if not is_hashed(password)]
+                if not plaintext:
+                    continue
+                hashes = hash_many([password for _, password in plaintext], hasher, max_workers)
+                with conn:
+                    cursor = conn.executemany(
+                        f"UPDATE {table} SET password=? WHERE {id_column}=? AND password=?",
+                        [(hashed, row_id, password) for (row_id, password), hashed in zip(plaintext, hashes)])
+                converted += cursor.rowcount
+        return converted
+    finally:
+        conn.close()
+
+
+# Tables whose writes invalidate each Cache_Versions counter, with the
+# UPDATE OF columns that matter (None = any column). Doctors excludes
+# password so a login rehash does not reload the catalogue everywhere.
+VERSIONED_TABLES = {
+    'reference': [
+        ("Symptoms", None),
+        ("Recommendations", None),
+        ("Specialties", None),
+        ("Symptom_Recommendation_Mapping", None),
+        ("Symptom_Specialty_Mapping", None),
+        ("Doctors", "name, specialty_id, specialty, rating, experience, availability, biography, "
+                    "location_lat, location_lon"),
+    ],
+    'records': [
+        ("UserRecords", "user_id, file_name, mime_type, upload_date"),
+    ],
+}
+
+
+def _cache_versions(cursor):
+    # One counter per family of in-process caches. Triggers bump it on every
+    # write, whichever process or script makes it, and workers poll the tiny
+    # table to learn that their copies are stale (see shared_state.py).
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Cache_Versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    for name, tables in VERSIONED_TABLES.items():
+        cursor.execute("INSERT OR IGNORE INTO Cache_Versions (name, version) VALUES (?, 0)", (name,))
+        bump = f"UPDATE Cache_Versions SET version = version + 1 WHERE name = '{name}';"
+        for table, columns in tables:
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                event = f"UPDATE OF {columns}" if op == "UPDATE" and columns else op
+                if op == "INSERT" and name == 'records':
+                    continue  # a new record is never in anyone's cache
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table.lower()}_{op.lower()}_version
+                    AFTER {event} ON {table}
+                    BEGIN {bump} END
+                """)
+
+
+def _record_original_name(cursor):
+    # Blobs are stored under their digest, so the name the patient uploaded is
+    # kept separately for downloads. Older rows keep NULL: their file_name is
+    # still the user<id>_<timestamp>_<name> they were always served under.
+    cursor.execute("ALTER TABLE UserRecords ADD COLUMN original_name TEXT")
+
+
+# (version, description, step). Steps run in order inside their own transaction
+# and must never be edited once released; add a new entry instead.
+MIGRATIONS = [
+    (1, "baseline schema", _baseline_schema),
+    (2, "indexes for hot lookup columns", _hot_lookup_indexes),
+    (3, "UserRecords file size and digest", _record_file_metadata),
+    (4, "UserRecords MIME type and keyset paging index", _record_mime_and_paging),
+    (5, "Doctor_Schedule parsed from Doctors.availability", _doctor_schedule),
+    (6, "Appointment_Changes feed maintained by triggers", _appointment_change_feed),
+    (7, "Appointments status filter indexes", _appointment_status_indexes),
+    (8, "UNIQUE natural keys for catalogue upserts", _catalogue_natural_keys),
+    (9, "Normalized health history and daily rollups", _health_history_rollups),
+    (10, "No-op (plaintext passwords are hashed after migrating)", _hash_passwords),
+    (11, "Cache_Versions counters maintained by triggers", _cache_versions),
+    (12, "UserRecords original upload name", _record_original_name),
+]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(database=DB_NAME, verbose=False):
+    """Bring `database` up to the latest schema version in place. Returns the final version."""
+    conn = sqlite3.connect(database, timeout=30)
+    conn.isolation_level = None  # explicit BEGIN/COMMIT so DDL is transactional
+    try:
+        for version, description, step in MIGRATIONS:
+            if version <= current_version(conn):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have applied it while we waited for the lock
+                if version <= current_version(conn):
+                    conn.execute("COMMIT")
+                    continue
+                step(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if verbose:
+                print(f" Applied migration {version}: {description}")
+        return current_version(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    database = sys.argv[1] if len(sys.argv) > 1 else DB_NAME
+    version = migrate(database, verbose=True)
+    print(f"\n {database} is at schema version {version}.")
+    print(f" Hashed {hash_plaintext_passwords(database)} plaintext passwords.")
@@ -0,0 +1,177 @@
+import csv
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+
+import numpy as np
+
+from metrics import log_event
+
+try:
+    import joblib as _joblib
+except ImportError:  # optional: only needed for the memory-mapped artifact
+    _joblib = None
+
+# Upper bound on patients scored by one /predict_batch request
+MAX_BATCH_SIZE = 10000
+
+
+def build_symptom_index(symptoms):
+    """Map each symptom name to its column in the model's input vector."""
+    return {name: i for i, name in enumerate(symptoms)}
+
+
+def encode(symptom_sets, symptom_index):
+    """
+    One-hot encode a list of symptom sets into a (patients x symptoms) matrix.
+    Returns the matrix and, per patient, the names that are not model features.
+    """
+    X = np.zeros((len(symptom_sets), len(symptom_index)), dtype=np.float32)
+    unknown = []
+    for row, selected in enumerate(symptom_sets):
+        missing = []
+        for name in selected:
+            col = symptom_index.get(name)
+            if col is None:
+                missing.append(name)
+            else:
+                X[row, col] = 1
+        unknown.append(missing)
+    return X, unknown
+
+
+def predict_batch(model, X, top_k=None):
+    """Score every row of X in one model call; with top_k, also rank classes by predict_proba."""
+    if not top_k or not hasattr(model, "predict_proba"):
+        return [{"disease": str(p)} for p in model.predict(X)]
+
+    proba = model.predict_proba(X)
+    classes = model.classes_
+    k = min(int(top_k), len(classes))
+    # argpartition picks the k best columns without sorting every class
+    best = np.argpartition(-proba, k - 1, axis=1)[:, :k]
+    results = []
+    for row, cols in enumerate(best):
+        cols = cols[np.argsort(-proba[row, cols])]
+        ranked = [{"disease": str(classes[c]), "probability": round(float(proba[row, c]), 4)} for c in cols]
+        results.append({"disease": ranked[0]["disease"], "top_k": ranked})
+    return results
+
+
+def read_symptom_list(path):
+    """Read the 'Symptom' column of symptom_list.csv without pandas."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['Symptom'] for row in csv.DictReader(f) if row.get('Symptom')]
+
+
+def _file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class LoadedModel:
+    """A model together with the symptom columns it was trained on."""
+
+    def __init__(self, model, symptoms, source, signature):
+        self.model = model
+        self.symptoms = symptoms
+        self.symptom_index = build_symptom_index(symptoms)
+        self.source = source
+        self.signature = signature
+
+
+class ModelStore:
+    """
+    Loads the disease model on first use and reloads it when the artifact changes.
+
+    If a joblib artifact (see export_mmap_artifact) sits next to the pickle it is
+    preferred and opened with mmap_mode='r', so the large NumPy arrays inside the
+    estimator are mapped from the page cache and shared by every worker process
+    instead of being unpickled into private memory.
+    """
+
+    def __init__(self, model_path="disease_model.pkl", symptoms_path="symptom_list.csv",
+                 mmap_path="disease_model.joblib", check_interval=5.0):
+        self.model_path = model_path
+        self.symptoms_path = symptoms_path
+        self.mmap_path = mmap_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded = None
+        self._next_check = 0.0
+        self.reloads = 0
+
+    def _artifact(self):
+        if self.mmap_path and os.path.exists(self.mmap_path) and _joblib is not None:
+            return self.mmap_path
+        return self.model_path
+
+    def _signature(self, artifact):
+        return (artifact, _file_signature(artifact), _file_signature(self.symptoms_path))
+
+    def _load(self):
+        artifact = self._artifact()
+        signature = self._signature(artifact)
+        if artifact == self.mmap_path:
+            model = _joblib.load(artifact, mmap_mode='r')
+        else:
+            with open(artifact, "rb") as f:
+                model = pickle.load(f)
+        return LoadedModel(model, read_symptom_list(self.symptoms_path), artifact, signature)
+
+    def get(self):
+        loaded = self._loaded
+        if loaded is not None and time.monotonic() < self._next_check:
+            return loaded
+        with self._lock:
+            loaded = self._loaded
+            now = time.monotonic()
+            if loaded is None:
+                loaded = self._loaded = self._load()
+            elif now >= self._next_check and self._signature(self._artifact()) != loaded.signature:
+                try:
+                    loaded = self._loaded = self._load()
+                    self.reloads += 1
+                except Exception as e:
+                    # Keep serving the previous model if the new artifact is unreadable
+                    log_event("model.reload_failed", level=logging.ERROR, keeping=loaded.source, error=str(e))
+            self._next_check = now + self.check_interval
+            return loaded
+
+    def has_artifact(self):
+        """True if the file get() would load (the joblib artifact or the pickle) exists."""
+        return os.path.exists(self._artifact())
+
+    def load(self):
+        """Load eagerly, e.g. in a pre-fork master so workers share the pages."""
+        return self.get()
+
+    @property
+    def is_loaded(self):
+        return self._loaded is not None
+
+
+def export_mmap_artifact(model_path="disease_model.pkl", mmap_path="disease_model.joblib"):
+    """Re-save the pickled model uncompressed with joblib so it can be memory-mapped."""
+    if _joblib is None:
+        raise RuntimeError("joblib is required to export a memory-mappable model")
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    # Write next to the target and rename, so a running ModelStore never sees a partial file
+    tmp_path = mmap_path + ".tmp"
+    _joblib.dump(model, tmp_path, compress=0)
+    os.replace(tmp_path, mmap_path)
+    return mmap_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        print(f" Wrote {export_mmap_artifact(*sys.argv[2:4])}")
+    else:
+        print("usage: python predictor.py export [model.pkl] [model.joblib]")
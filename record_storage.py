@@ -0,0 +1,335 @@
+import contextlib
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single dev-server process, so a thread lock is enough
+    fcntl = None
+
+# Bytes read from the request / written to disk per iteration
+CHUNK_SIZE = 64 * 1024
+
+# Partial uploads and resumable-upload state live here until they are complete
+INCOMING_DIR = '.incoming'
+# A resumable upload that receives no bytes for this long is abandoned
+SESSION_TTL = 24 * 3600
+# Resumable uploads one user may have open at once
+MAX_SESSIONS_PER_USER = 5
+
+
+# Leading bytes of the file types ALLOWED_EXTENSIONS accepts
+_MAGIC_NUMBERS = [
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+]
+
+
+class StoredBlob:
+    """
+    Metadata captured while an upload was written; persisted to UserRecords.
+    The bytes wait at tmp_path until commit_blob() moves them into place, which
+    also sets `deduplicated`.
+    """
+
+    def __init__(self, tmp_path, digest, size, mime_type, extension):
+        self.tmp_path = tmp_path
+        self.file_name = blob_name(digest, extension)
+        self.digest = digest
+        self.size = size
+        self.mime_type = mime_type
+        self.deduplicated = None
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadStateError(Exception):
+    pass
+
+
+class TooManySessions(Exception):
+    pass
+
+
+def _incoming_dir(upload_folder):
+    path = os.path.join(upload_folder, INCOMING_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def sniff_mime_type(head, extension):
+    """MIME type from the file's first bytes, falling back to its extension."""
+    for magic, mime_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mime_type
+    return mimetypes.guess_type(f"f.{extension}")[0] or 'application/octet-stream'
+
+
+def blob_name(digest, extension):
+    """Content-addressed file name: identical documents map to the same blob."""
+    return f"{digest}.{extension.lower()}"
+
+
+_local_lock = threading.RLock()
+
+
+@contextlib.contextmanager
+def _exclusive(f):
+    """Exclusive lock on the open file `f`, held against other threads and processes."""
+    if fcntl is None:
+        with _local_lock:
+            yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def blob_lock(upload_folder):
+    """
+    Serialises adding and removing blobs. A blob is shared by every record with
+    the same digest, so the dedup check in commit_blob and the INSERT that
+    references the blob must not interleave with a delete's "is anything still
+    using it?" check and unlink.
+    """
+    with open(os.path.join(_incoming_dir(upload_folder), 'blobs.lock'), 'a') as f, _exclusive(f):
+        yield
+
+
+def commit_blob(upload_folder, blob):
+    """Move a fully written upload into place, or drop it if the blob already exists. Call under blob_lock."""
+    target = os.path.join(upload_folder, blob.file_name)
+    blob.deduplicated = os.path.exists(target)
+    if blob.deduplicated:
+        os.remove(blob.tmp_path)
+    else:
+        os.replace(blob.tmp_path, target)
+
+
+def discard_upload(blob):
+    """Remove an upload that was never committed."""
+    if blob.deduplicated is None and os.path.exists(blob.tmp_path):
+        os.remove(blob.tmp_path)
+
+
+class BlobWriter:
+    """
+    Write target for one uploaded file part, handed to werkzeug's multipart
+    parser as its stream_factory result: every chunk the parser decodes is
+    hashed and written straight into a temp file next to the blobs, so the
+    upload is neither buffered in memory nor copied a second time. Aborts
+    with UploadTooLarge as soon as more than `max_bytes` arrive.
+    """
+
+    def __init__(self, upload_folder, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._head = b''
+        self._hasher = hashlib.sha256()
+        fd, self.tmp_path = tempfile.mkstemp(dir=_incoming_dir(upload_folder), suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the {self.max_bytes // (1024 * 1024)} MB limit")
+        if len(self._head) < 16:
+            self._head += data[:16 - len(self._head)]
+        self._hasher.update(data)
+        return self._file.write(data)
+
+    # The parser rewinds the container and FileStorage may read it
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def close(self):
+        self._file.close()
+
+    def finish(self, extension):
+        """Close the temp file and return a StoredBlob for commit_blob()."""
+        self._file.close()
+        return StoredBlob(self.tmp_path, self._hasher.hexdigest(), self.size,
+                          sniff_mime_type(self._head, extension), extension)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def remove_blob(upload_folder, file_name):
+    """Unlink a blob no record references any more. Call under blob_lock."""
+    file_path = os.path.join(upload_folder, file_name)
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+
+# Resumable uploads: the client creates a session, PUTs consecutive byte ranges
+# (resuming from the offset GET reports after a dropped connection), then
+# completes it. State is kept on disk so any worker process can continue it.
+# A session expires SESSION_TTL after its last byte; create_session sweeps
+# expired ones and caps each user at MAX_SESSIONS_PER_USER.
+
+def _session_paths(upload_folder, upload_id):
+    # upload_id is always a uuid4 hex we generated; reject anything else outright
+    if len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadStateError("Unknown upload session")
+    base = os.path.join(_incoming_dir(upload_folder), upload_id)
+    return base + '.json', base + '.part'
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def sweep_sessions(upload_folder, ttl=SESSION_TTL):
+    """
+    Remove resumable uploads idle for longer than `ttl`, and temp files left by
+    uploads that died half way. Returns {user_id: open sessions} for the rest.
+    """
+    incoming = _incoming_dir(upload_folder)
+    cutoff = time.time() - ttl
+    open_sessions = {}
+    for name in os.listdir(incoming):
+        path = os.path.join(incoming, name)
+        base, suffix = os.path.splitext(path)
+        if suffix == '.json':
+            part_path = base + '.part'
+            last_active = max(filter(None, (_mtime(path), _mtime(part_path))), default=None)
+            if last_active is not None and last_active < cutoff:
+                _remove(path, part_path)
+                continue
+            try:
+                with open(path) as f:
+                    user_id = json.load(f)['user_id']
+            except (OSError, ValueError, KeyError):
+                continue
+            open_sessions[user_id] = open_sessions.get(user_id, 0) + 1
+        elif suffix == '.part' and not os.path.exists(base + '.json'):
+            last_active = _mtime(path)
+            if last_active is not None and last_active < cutoff:
+                _remove(path)
+    return open_sessions
+
+
+def create_session(upload_folder, user_id, file_name, extension, total_size, description):
+    """Open a resumable upload; raises TooManySessions past MAX_SESSIONS_PER_USER."""
+    # One creator at a time, so concurrent requests cannot both slip under the cap
+    lock_path = os.path.join(_incoming_dir(upload_folder), 'sessions.lock')
+    with open(lock_path, 'a') as lock, _exclusive(lock):
+        if sweep_sessions(upload_folder).get(user_id, 0) >= MAX_SESSIONS_PER_USER:
+            raise TooManySessions(f"At most {MAX_SESSIONS_PER_USER} uploads may be in progress at once")
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = _session_paths(upload_folder, upload_id)
+        state = {
+            'user_id': user_id,
+            'file_name': file_name,
+            'extension': extension,
+            'total_size': total_size,
+            'description': description,
+        }
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump(state, f)
+    return upload_id
+
+
+def load_session(upload_folder, upload_id, user_id):
+    meta_path, part_path = _session_paths(upload_folder, upload_id)
+    try:
+        with open(meta_path) as f:
+            state = json.load(f)
+        part = os.stat(part_path)
+    except FileNotFoundError:
+        raise UploadStateError("Unknown upload session")
+    if state['user_id'] != user_id or part.st_mtime < time.time() - SESSION_TTL:
+        raise UploadStateError("Unknown upload session")
+    state['offset'] = part.st_size
+    return state
+
+
+def append_chunk(upload_folder, upload_id, user_id, start, stream):
+    """
+    Append the request body at byte `start`, which must equal the current offset.
+    The .part file stays locked from the offset check to the last byte, so two
+    PUTs of the same range (a client retry racing the original) cannot both land.
+    """
+    state = load_session(upload_folder, upload_id, user_id)
+    meta_path, part_path = _session_paths(upload_folder, upload_id)
+    try:
+        out = open(part_path, 'r+b')
+    except FileNotFoundError:
+        raise UploadStateError("Unknown upload session")
+    with out, _exclusive(out):
+        # Completed or cancelled while this request waited for the lock
+        if not os.path.exists(meta_path):
+            raise UploadStateError("Unknown upload session")
+        offset = os.fstat(out.fileno()).st_size
+        if start != offset:
+            raise UploadStateError(f"Expected chunk at offset {offset}")
+        out.seek(offset)
+        written = offset
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > state['total_size']:
+                out.truncate(offset)
+                raise UploadTooLarge("Chunk runs past the declared file size")
+            out.write(chunk)
+    return written
+
+
+def complete_session(upload_folder, upload_id, user_id):
+    """Hash the assembled file. Returns (session state, StoredBlob) for commit_blob()."""
+    state = load_session(upload_folder, upload_id, user_id)
+    meta_path, part_path = _session_paths(upload_folder, upload_id)
+    # The parts may have been written by different processes, so hash on completion
+    hasher = hashlib.sha256()
+    with open(part_path, 'rb') as f, _exclusive(f):
+        size = os.fstat(f.fileno()).st_size
+        if not os.path.exists(meta_path):
+            raise UploadStateError("Unknown upload session")
+        if size != state['total_size']:
+            raise UploadStateError(f"Upload incomplete: {size} of {state['total_size']} bytes")
+        head = f.read(16)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(chunk)
+        os.remove(meta_path)
+    # Fresh mtime so the sweep leaves the file alone until save_record moves it
+    os.utime(part_path)
+    mime_type = sniff_mime_type(head, state['extension'])
+    return state, StoredBlob(part_path, hasher.hexdigest(), state['total_size'], mime_type, state['extension'])
+
+
+def abort_session(upload_folder, upload_id, user_id):
+    load_session(upload_folder, upload_id, user_id)
+    _remove(*_session_paths(upload_folder, upload_id))
@@ -0,0 +1,193 @@
+import datetime
+import re
+
+# Length of one bookable appointment unless a schedule row says otherwise
+DEFAULT_SLOT_MINUTES = 30
+# Hours assumed for doctors whose availability is just 'Available' (new registrations)
+DEFAULT_HOURS = [(9 * 60, 17 * 60)]
+# Statuses that no longer hold their slot
+FREED_STATUSES = ('Rejected', 'Cancelled')
+
+_RANGE = re.compile(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})")
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def to_minutes(hhmm):
+    hours, minutes = hhmm.strip().split(':')[:2]
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time {hhmm!r}")
+    return hours * 60 + minutes
+
+
+def to_hhmm(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_availability(text):
+    """
+    'Online/10:00-14:00' -> ('Online', [(600, 840)]). Several ranges may be
+    comma separated. Plain 'Available' gets DEFAULT_HOURS; anything without
+    hours otherwise yields no windows.
+    """
+    text = (text or '').strip()
+    mode, _, hours = text.partition('/')
+    if not hours and _RANGE.search(mode):
+        mode, hours = '', mode
+    windows = []
+    for h1, m1, h2, m2 in _RANGE.findall(hours):
+        start, end = int(h1) * 60 + int(m1), int(h2) * 60 + int(m2)
+        if start < end <= 24 * 60:
+            windows.append((start, end))
+    if not windows and mode.strip().lower() == 'available':
+        windows = list(DEFAULT_HOURS)
+    return mode.strip() or None, sorted(windows)
+
+
+def replace_schedule(cursor, doctor_id, availability):
+    """Rewrite a doctor's Doctor_Schedule rows from an availability string."""
+    mode, windows = parse_availability(availability)
+    cursor.execute("DELETE FROM Doctor_Schedule WHERE doctor_id=?", (doctor_id,))
+    cursor.executemany("""
+        INSERT INTO Doctor_Schedule (doctor_id, weekday, start_minute, end_minute, mode, slot_minutes)
+        VALUES (?, NULL, ?, ?, ?, ?)
+    """, [(doctor_id, start, end, mode, DEFAULT_SLOT_MINUTES) for start, end in windows])
+
+
+def sync_all_schedules(cursor):
+    cursor.execute("SELECT doctor_id, availability FROM Doctors")
+    for doctor_id, availability in cursor.fetchall():
+        replace_schedule(cursor, doctor_id, availability)
+
+
+def free_slots(windows, booked, not_before=None):
+    """
+    Slot start minutes inside `windows` that do not overlap `booked`.
+
+    windows: [(start, end, slot_minutes)] sorted by start
+    booked:  [(start, end)] sorted by start
+    Both lists are walked once (two pointers), so a day costs
+    O(windows + bookings + slots) no matter how many appointments exist overall.
+    """
+    slots = []
+    b = 0
+    for start, end, step in windows:
+        t = start
+        while t + step <= end:
+            if not_before is not None and t < not_before:
+                t += step
+                continue
+            while b < len(booked) and booked[b][1] <= t:
+                b += 1
+            if b < len(booked) and booked[b][0] < t + step:
+                # Overlaps a booking: jump to the first aligned start after it
+                t += step * max(1, -(-(booked[b][1] - t) // step))
+                continue
+            slots.append(t)
+            t += step
+    return slots
+
+
+class SlotFinder:
+    """
+    Free appointment slots from Doctor_Schedule minus booked Appointments.
+
+    Each lookup is two indexed range scans (schedule by doctor, appointments by
+    doctor and date), so cost depends on one doctor's day, not on the number of
+    doctors or the size of the appointment history.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+
+    @staticmethod
+    def _windows(cursor, doctor_id, weekday):
+        cursor.execute("""
+            SELECT start_minute, end_minute, slot_minutes FROM Doctor_Schedule
+            WHERE doctor_id=? AND (weekday IS NULL OR weekday=?)
+            ORDER BY start_minute
+        """, (doctor_id, weekday))
+        return [tuple(r) for r in cursor.fetchall()]
+
+    @staticmethod
+    def _booked(cursor, doctor_id, first_date, last_date):
+        """{date: [(start, end)]} of appointments still holding their slot."""
+        cursor.execute("SELECT MIN(slot_minutes) FROM Doctor_Schedule WHERE doctor_id=?", (doctor_id,))
+        length = cursor.fetchone()[0] or DEFAULT_SLOT_MINUTES
+        cursor.execute(f"""
+            SELECT appointment_date, appointment_time FROM Appointments
+            WHERE doctor_id=? AND appointment_date BETWEEN ? AND ?
+              AND status NOT IN ({','.join('?' * len(FREED_STATUSES))})
+        """, (doctor_id, first_date, last_date) + FREED_STATUSES)
+        booked = {}
+        for day, time_text in cursor.fetchall():
+            try:
+                start = to_minutes(time_text)
+            except (AttributeError, ValueError):
+                continue
+            booked.setdefault(day, []).append((start, start + length))
+        for intervals in booked.values():
+            intervals.sort()
+        return booked
+
+    def _slots(self, cursor, doctor_id, first_day, days, now):
+        booked = self._booked(cursor, doctor_id, first_day.isoformat(),
+                              (first_day + datetime.timedelta(days=days - 1)).isoformat())
+        windows_by_weekday = {}
+        result = []
+        for offset in range(days):
+            day = first_day + datetime.timedelta(days=offset)
+            if day < now.date():
+                result.append((day.isoformat(), []))
+                continue
+            weekday = day.weekday()
+            if weekday not in windows_by_weekday:
+                windows_by_weekday[weekday] = self._windows(cursor, doctor_id, weekday)
+            not_before = now.hour * 60 + now.minute if day == now.date() else None
+            slots = free_slots(windows_by_weekday[weekday], booked.get(day.isoformat(), []), not_before)
+            result.append((day.isoformat(), [to_hhmm(t) for t in slots]))
+        return result
+
+    def slots(self, doctor_id, first_day, days=1, now=None):
+        """[(YYYY-MM-DD, [HH:MM, ...])] for `days` consecutive days."""
+        conn = self._connect()
+        try:
+            return self._slots(conn.cursor(), doctor_id, first_day, days, now or datetime.datetime.now())
+        finally:
+            conn.close()
+
+    def book(self, user_id, doctor_id, day, time_text, reason, now=None):
+        """
+        Insert a Pending appointment if `time_text` is a free slot on `day`.
+        The check and the insert run in one BEGIN IMMEDIATE transaction, so two
+        patients racing for the same slot cannot both succeed. Returns the new
+        appointment_id or raises SlotUnavailable.
+        """
+        try:
+            first_day = datetime.date.fromisoformat(day)
+            start = to_minutes(time_text)
+        except (TypeError, ValueError, AttributeError):
+            raise SlotUnavailable("Invalid date or time.")
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            (_, free), = self._slots(cursor, doctor_id, first_day, 1, now or datetime.datetime.now())
+            if to_hhmm(start) not in free:
+                raise SlotUnavailable("That time is not available for this doctor. Please pick one of the free slots.")
+            cursor.execute("""
+                INSERT INTO Appointments (user_id, doctor_id, appointment_date, appointment_time, status, reason)
+                VALUES (?, ?, ?, ?, 'Pending', ?)
+            """, (user_id, doctor_id, first_day.isoformat(), to_hhmm(start), reason))
+            appointment_id = cursor.lastrowid
+            conn.commit()
+            return appointment_id
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
@@ -0,0 +1,289 @@
+"""
+Pre-fork production server.
+
+    python serve.py [--host 0.0.0.0] [--port 8000] [--workers N]
+                    [--max-requests 10000] [--max-requests-jitter 1000]
+                    [--graceful-timeout 30] [--access-log]
+
+The master imports app (which migrates the database), calls app.preload() to
+build the reference data, model and compiled templates, freezes the GC so
+those objects stay on shared copy-on-write pages, binds the listening socket
+and forks --workers processes (default: WEB_CONCURRENCY, else the CPUs this
+process may run on). Each worker serves the shared socket with werkzeug's
+threaded server.
+
+A worker is recycled after --max-requests requests (plus up to
+--max-requests-jitter, so they do not all restart together): it stops
+accepting, answers /readyz with 503 and closes keep-alive connections, waits
+up to --graceful-timeout for in-flight requests and streams, flushes queued
+health history and exits; the master starts a replacement. Crashed workers
+are replaced the same way.
+
+Signals to the master:
+    TERM, INT   graceful shutdown of every worker, then exit
+    HUP         rolling restart: each worker is replaced by a fresh one
+
+Behind nginx or another reverse proxy, set TRUSTED_PROXY_HOPS to the number
+of proxies so client addresses (used for login throttling) come from
+X-Forwarded-For.
+
+In-process caches stay coherent through Cache_Versions (see shared_state.py).
+Metrics and login throttling remain per worker: /metrics describes the
+worker that answered, and each worker keeps its own login budgets.
+
+POSIX only (needs os.fork).
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+from werkzeug.wsgi import ClosingIterator
+
+# Workers that die this soon after starting are respawned with a pause, so a
+# broken deploy does not fork in a tight loop
+MIN_WORKER_LIFETIME = 1.0
+
+
+def default_workers():
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class RequestCounter:
+    """
+    WSGI middleware for one worker: counts requests served and still in flight
+    (a streamed response counts until it is closed), calls on_limit() once when
+    the `limit`-th request arrives, and asks clients to close keep-alive
+    connections once the worker is draining.
+    """
+
+    def __init__(self, app, limit, on_limit, draining):
+        self.app = app
+        self.limit = limit
+        self.on_limit = on_limit
+        self.draining = draining
+        self._lock = threading.Lock()
+        self.served = 0
+        self.active = 0
+
+    def _done(self):
+        with self._lock:
+            self.active -= 1
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.served += 1
+            self.active += 1
+            reached = self.served == self.limit
+        if reached:
+            self.on_limit()
+
+        def closing_start_response(status, headers, exc_info=None):
+            if self.draining.is_set():
+                headers = [(k, v) for k, v in headers if k.lower() != 'connection'] + [('Connection', 'close')]
+            return start_response(status, headers, exc_info)
+
+        try:
+            body = self.app(environ, closing_start_response)
+        except BaseException:
+            self._done()
+            raise
+        return ClosingIterator(body, self._done)
+
+
+def run_worker(health, sock, host, port, max_requests, graceful_timeout):
+    """Body of a forked worker: serve until told to stop or recycled, then drain."""
+    random.seed()   # forked workers would otherwise share the master's sequence
+    stopping = threading.Event()
+    server = None
+
+    def stop(reason):
+        if stopping.is_set():
+            return
+        stopping.set()
+        health.draining.set()
+        health.log_event("serve.worker_draining", pid=os.getpid(), reason=reason)
+        # shutdown() waits for serve_forever() to return, so never call it from that thread
+        threading.Thread(target=server.shutdown, name="shutdown", daemon=True).start()
+
+    counter = RequestCounter(health.app, max_requests, lambda: stop("max_requests"), health.draining)
+    server = make_server(host, port, counter, threaded=True, fd=sock.fileno())
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop("signal"))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # the master turns Ctrl-C into TERM
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    health.log_event("serve.worker_started", pid=os.getpid(), max_requests=max_requests)
+    server.serve_forever(poll_interval=0.5)
+    server.server_close()
+
+    deadline = time.monotonic() + graceful_timeout
+    while counter.active > 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    health.history_writer.close()
+    health.log_event("serve.worker_exit", pid=os.getpid(), served=counter.served,
+                     abandoned=max(counter.active, 0))
+
+
+class Arbiter:
+    """Master process: keeps `workers` children running and relays signals to them."""
+
+    def __init__(self, health, sock, host, port, workers, max_requests, jitter, graceful_timeout):
+        self.health = health
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}   # pid -> start time (monotonic)
+        self.stopping = False
+        self.restart = False
+
+    def spawn(self):
+        limit = self.max_requests + random.randint(0, self.jitter) if self.max_requests else 0
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return pid
+        code = 1
+        try:
+            run_worker(self.health, self.sock, self.host, self.port, limit, self.graceful_timeout)
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def reap(self):
+        """Forget exited workers; returns how many died right after starting."""
+        early = 0
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                early += 1
+            if code != 0 and not self.stopping:
+                self.health.log_event("serve.worker_died", level=logging.WARNING, pid=pid, exit_code=code)
+        return early
+
+    def kill_all(self, sig):
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                self.workers.pop(pid, None)
+
+    def rolling_restart(self):
+        # Start the replacement before stopping the old worker so capacity never drops
+        for pid in list(self.workers):
+            self.spawn()
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_restart(signum, frame):
+            self.restart = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_restart)
+
+        self.health.log_event("serve.master_started", pid=os.getpid(), address=f"{self.host}:{self.port}",
+                              workers=self.worker_count)
+        while not self.stopping:
+            if self.reap():
+                time.sleep(MIN_WORKER_LIFETIME)
+            if self.restart:
+                self.restart = False
+                self.rolling_restart()
+            while len(self.workers) < self.worker_count and not self.stopping:
+                self.spawn()
+            time.sleep(0.2)
+
+        self.kill_all(signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.kill_all(signal.SIGKILL)
+        self.reap()
+        self.sock.close()
+        self.health.log_event("serve.master_exit", pid=os.getpid())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server for the Smart Health app")
+    parser.add_argument('--host', default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument('--port', type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument('--workers', type=int, default=default_workers())
+    parser.add_argument('--max-requests', type=int, default=10000, help="recycle a worker after this many (0 = never)")
+    parser.add_argument('--max-requests-jitter', type=int, default=1000)
+    parser.add_argument('--graceful-timeout', type=float, default=30.0)
+    parser.add_argument('--backlog', type=int, default=2048)
+    parser.add_argument('--access-log', action='store_true', help="log every request (werkzeug format)")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        parser.error("serve.py needs os.fork(); use `python app.py` on this platform")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    # A session cached in one worker's memory would outlive a logout handled
+    # by another, so with several workers every session read goes to SESSION_DB
+    if args.workers > 1:
+        os.environ.setdefault("SESSION_MEMORY_TTL", "0")
+    logging.getLogger("werkzeug").setLevel(logging.INFO if args.access_log else logging.WARNING)
+
+    import app as health
+
+    start = time.perf_counter()
+    health.preload()
+    # Nothing opened here may be used across fork(); workers open their own connections
+    health.db_pool.close_all()
+    # Move everything loaded so far out of the collector's reach: collections in
+    # the workers then never write to (and so never un-share) those pages
+    gc.collect()
+    gc.freeze()
+    health.log_event("serve.preloaded", seconds=round(time.perf_counter() - start, 3),
+                     frozen_objects=gc.get_freeze_count())
+
+    sock = socket.create_server((args.host, args.port), backlog=args.backlog)
+    # Every worker waits on this socket; non-blocking so the ones that lose the
+    # race for a connection go back to select() instead of blocking in accept()
+    sock.setblocking(False)
+    Arbiter(health, sock, args.host, sock.getsockname()[1], args.workers, args.max_requests,
+            args.max_requests_jitter, args.graceful_timeout).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import secrets
+import time
+import uuid
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class SessionStore:
+    """
+    Session data by id: a persistent backend (SQLiteCache by default, anything
+    with get/set/delete works) behind an optional in-process TTLCache.
+
+    The memory tier is per process. Keep its TTL short, or pass memory=None,
+    when several worker processes share one backend, otherwise a logout seen
+    by one worker can take up to that long to reach the others.
+    """
+
+    def __init__(self, backend, memory=None):
+        self.backend = backend
+        self.memory = memory
+
+    def get(self, sid):
+        record = self.memory.get(sid) if self.memory is not None else None
+        if record is None:
+            record = self.backend.get(sid)
+            if record is not None and self.memory is not None:
+                self.memory.set(sid, record)
+        return record
+
+    def set(self, sid, record, ttl):
+        self.backend.set(sid, record, ttl=ttl)
+        if self.memory is not None:
+            self.memory.set(sid, record)
+
+    def delete(self, sid):
+        self.backend.delete(sid)
+        if self.memory is not None:
+            self.memory.delete(sid)
+
+    def purge_expired(self):
+        return self.backend.purge_expired()
+
+    def stats(self):
+        stats = {'backend': self.backend.stats()}
+        if self.memory is not None:
+            stats['memory'] = self.memory.stats()
+        return stats
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, touched=0.0):
+        def on_update(self):
+            self.modified = True
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.touched = touched
+        self.modified = False
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh id, e.g. on login, so a pre-login id can't be reused."""
+        if not self.new and self.replaced_sid is None:
+            self.replaced_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Keeps session data in a SessionStore; the cookie carries only an opaque
+    random id. Idle sessions expire after `lifetime` seconds; an unchanged
+    session is re-saved at most once per half-lifetime to slide its expiry.
+    """
+
+    def __init__(self, store, lifetime=7 * 24 * 3600):
+        self.store = store
+        self.lifetime = lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) <= 64:
+            record = self.store.get(sid)
+            if record is not None:
+                return ServerSession(record['data'], sid=sid, touched=record['touched'])
+        return ServerSession(sid=new_session_id(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.replaced_sid:
+            self.store.delete(session.replaced_sid)
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+            if session.modified or session.replaced_sid:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        stale = now - session.touched > self.lifetime / 2
+        if session.modified or stale:
+            self.store.set(session.sid, {'data': dict(session), 'touched': now}, ttl=self.lifetime)
+
+        if session.modified or session.new or (session.permanent and stale):
+            response.vary.add('Cookie')
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+
+class AnalysisStore:
+    """
+    Symptom analysis results stored by reference: the session keeps only the
+    id returned by save(), so the result lists are read when a page needs them
+    rather than on every request.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def save(self, analysis):
+        analysis_id = uuid.uuid4().hex
+        self.backend.set(analysis_id, analysis)
+        return analysis_id
+
+    def load(self, analysis_id):
+        if not analysis_id:
+            return None
+        return self.backend.get(analysis_id)
+
+    def delete(self, analysis_id):
+        if analysis_id:
+            self.backend.delete(analysis_id)
@@ -0,0 +1,79 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import log_event
+
+
+class SharedVersions:
+    """
+    Cross-process invalidation signal for in-process caches.
+
+    Cache_Versions holds one counter per family of cached data ('reference'
+    for the symptom/doctor catalogue, 'records' for UserRecords); triggers
+    bump it on every write, so it moves no matter which worker, script or
+    bulk load made the change. get(name) re-reads the table at most every
+    `check_interval` seconds, which bounds how long another worker can serve
+    a stale copy at the cost of one tiny SELECT per interval per process.
+
+    The counters are read on a private connection (reopened after fork), never
+    on a pooled one: a request thread that already holds its pooled connection
+    must not wait for a second. While one thread refreshes, the others keep
+    using the values they have. A database without the table (not migrated
+    yet) or a failed read leaves the last known versions in place.
+    """
+
+    def __init__(self, database, check_interval=1.0, timeout=1.0):
+        self.database = database
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._versions = {}
+        self._next_check = 0.0
+        self.refreshes = 0
+        self.failures = 0
+
+    def _db(self):
+        # Call with the lock held. SQLite handles must not cross fork()
+        if self._conn is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False)
+        return self._conn
+
+    def _read(self):
+        # Call with the lock held
+        try:
+            versions = dict(self._db().execute("SELECT name, version FROM Cache_Versions").fetchall())
+            self.refreshes += 1
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                self.failures += 1
+                log_event("shared_versions.read_failed", level=logging.WARNING, error=str(e))
+            versions = self._versions
+        self._versions = versions
+        self._next_check = time.monotonic() + self.check_interval
+        return versions
+
+    def refresh(self):
+        """Read every counter now; returns {name: version}."""
+        with self._lock:
+            return self._read()
+
+    def get(self, name, fresh=False):
+        if fresh:
+            return self.refresh().get(name, 0)
+        if time.monotonic() >= self._next_check and self._lock.acquire(blocking=False):
+            try:
+                if time.monotonic() >= self._next_check:
+                    self._read()
+            finally:
+                self._lock.release()
+        return self._versions.get(name, 0)
+
+    def stats(self):
+        return {'versions': dict(self._versions), 'refreshes': self.refreshes, 'failures': self.failures,
+                'check_interval': self.check_interval}
@@ -0,0 +1,179 @@
+import threading
+from collections import namedtuple
+
+# Unpacks like the old four-column rows (name, rtype, instructions, disclaimer)
+Recommendation = namedtuple('Recommendation', ['rec_name', 'rec_type', 'instructions', 'disclaimer'])
+
+
+class GraphSnapshot:
+    """Immutable view of the symptom reference tables, built in one pass."""
+
+    def __init__(self, version, symptoms, recommendations, specialties, doctors,
+                 doctor_rank, symptom_recs, symptom_specialties):
+        self.version = version
+        # lower(symptom_name) -> symptom dict (same shape fetch_symptoms returns)
+        self.symptoms = symptoms
+        # rec_id -> (sort position, Recommendation); specialty_id -> sqlite3.Row
+        self.recommendations = recommendations
+        self.specialties = specialties
+        # symptom_id -> [rec_id, ...] / [specialty_id, ...]
+        self.symptom_recs = symptom_recs
+        self.symptom_specialties = symptom_specialties
+        # specialty_id -> [doctor Row, ...] already in rating/experience order
+        self.doctors = doctors
+        # doctor_id -> position in the global rating order, used to merge specialties
+        self.doctor_rank = doctor_rank
+        # Cache_Versions counter read just before loading (None without SharedVersions)
+        self.shared_version = None
+
+
+def _load_snapshot(conn, version):
+    cursor = conn.cursor()
+    # One read transaction: in WAL mode every SELECT below then sees the same
+    # snapshot, so a write landing mid-load cannot leave mappings pointing at
+    # rows the snapshot does not have
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("SELECT symptom_id, symptom_name, doctor_advice, priority FROM Symptoms")
+        symptoms = {}
+        for r in cursor.fetchall():
+            symptoms[r['symptom_name'].lower()] = {
+                'id': r['symptom_id'], 'name': r['symptom_name'],
+                'advice': r['doctor_advice'], 'priority': r['priority']
+            }
+
+        # Templates unpack recommendation rows positionally, so the cached rows keep
+        # exactly the four columns fetch_recommendations always selected. rec_id comes
+        # from the same statement, so ids and rows cannot drift apart under a write.
+        cursor.execute("""
+            SELECT rec_id, rec_name, rec_type, instructions, disclaimer
+            FROM Recommendations
+            ORDER BY rec_type, rec_name, rec_id
+        """)
+        recommendations = {r['rec_id']: (i, Recommendation(*tuple(r)[1:])) for i, r in enumerate(cursor.fetchall())}
+
+        cursor.execute("SELECT specialty_id, specialty_name FROM Specialties")
+        specialties = {r['specialty_id']: r for r in cursor.fetchall()}
+
+        symptom_recs = {}
+        cursor.execute("SELECT symptom_id, rec_id FROM Symptom_Recommendation_Mapping ORDER BY mapping_id")
+        for r in cursor.fetchall():
+            symptom_recs.setdefault(r['symptom_id'], []).append(r['rec_id'])
+
+        symptom_specialties = {}
+        cursor.execute("SELECT symptom_id, specialty_id FROM Symptom_Specialty_Mapping ORDER BY map_id")
+        for r in cursor.fetchall():
+            symptom_specialties.setdefault(r['symptom_id'], []).append(r['specialty_id'])
+
+        cursor.execute("""
+            SELECT doctor_id, name, rating, experience, availability, specialty_id, biography
+            FROM Doctors
+            ORDER BY rating DESC, experience DESC
+        """)
+        doctors = {}
+        doctor_rank = {}
+        for rank, r in enumerate(cursor.fetchall()):
+            doctors.setdefault(r['specialty_id'], []).append(r)
+            doctor_rank[r['doctor_id']] = rank
+    finally:
+        # Read-only, so this only ends the transaction
+        conn.commit()
+
+    return GraphSnapshot(version, symptoms, recommendations, specialties, doctors,
+                         doctor_rank, symptom_recs, symptom_specialties)
+
+
+class SymptomGraph:
+    """
+    In-process graph of symptom -> recommendations, symptom -> specialties and
+    specialty -> doctors, replacing the per-request SQL in symptom_analysis.
+
+    Readers always see a complete snapshot; rebuild() swaps in a new one in a
+    single assignment, so a request that is halfway through an analysis keeps
+    using the snapshot it started with.
+
+    With `shared` (a SharedVersions) the graph also rebuilds when the named
+    Cache_Versions counter moves, i.e. when another process wrote the tables.
+    """
+
+    def __init__(self, connect, shared=None, shared_name='reference'):
+        self._connect = connect
+        self.shared = shared
+        self.shared_name = shared_name
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = 0
+
+    @property
+    def version(self):
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else 0
+
+    def rebuild(self, stale=None):
+        with self._lock:
+            # Another thread already replaced the snapshot this caller found stale
+            if stale is not None and self._snapshot is not stale:
+                return self._snapshot
+            # Read the counter first: a write landing mid-load moves it again
+            shared_version = self.shared.get(self.shared_name, fresh=True) if self.shared else None
+            conn = self._connect()
+            try:
+                snapshot = _load_snapshot(conn, self._version + 1)
+            finally:
+                conn.close()
+            snapshot.shared_version = shared_version
+            self._version = snapshot.version
+            self._snapshot = snapshot
+            return snapshot
+
+    def invalidate(self):
+        """Call after any write to Symptoms, Recommendations, Specialties, Doctors or the mapping tables."""
+        return self.rebuild()
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.rebuild()
+        elif self.shared is not None and self.shared.get(self.shared_name) != snapshot.shared_version:
+            snapshot = self.rebuild(stale=snapshot)
+        return snapshot
+
+    def symptoms(self, symptom_names):
+        snapshot = self.snapshot()
+        found = []
+        seen = set()
+        for name in symptom_names:
+            s = snapshot.symptoms.get(name)
+            if s and s['id'] not in seen:
+                seen.add(s['id'])
+                found.append(s)
+        return found
+
+    def recommendations(self, symptom_ids):
+        snapshot = self.snapshot()
+        picked = {}
+        for symptom_id in symptom_ids:
+            for rec_id in snapshot.symptom_recs.get(symptom_id, ()):
+                if rec_id not in snapshot.recommendations:
+                    continue
+                position, row = snapshot.recommendations[rec_id]
+                # DISTINCT in the old query was over the selected columns, not rec_id
+                picked.setdefault(tuple(row), (position, row))
+        return [row for _, row in sorted(picked.values(), key=lambda p: p[0])]
+
+    def doctors(self, symptom_ids):
+        snapshot = self.snapshot()
+        specialties = []
+        seen = set()
+        for symptom_id in symptom_ids:
+            for specialty_id in snapshot.symptom_specialties.get(symptom_id, ()):
+                if specialty_id not in seen and specialty_id in snapshot.specialties:
+                    seen.add(specialty_id)
+                    specialties.append(snapshot.specialties[specialty_id])
+
+        doctors = []
+        for s in specialties:
+            doctors.extend(snapshot.doctors.get(s['specialty_id'], ()))
+        if len(specialties) > 1:
+            doctors.sort(key=lambda d: snapshot.doctor_rank[d['doctor_id']])
+        return specialties, doctors
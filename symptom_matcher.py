@@ -0,0 +1,223 @@
+import logging
+import re
+import threading
+from collections import defaultdict
+
+from metrics import log_event
+
+# Lay phrasings -> the symptom name they describe. Entries whose symptom is not
+# in the Symptoms table are ignored when the index is built.
+SYNONYMS = {
+    'headache': ['head ache', 'head pain', 'pain in head', 'head hurts', 'head is pounding',
+                 'migraine', 'throbbing head', 'sore head'],
+    'cough': ['coughing', 'dry cough', 'wet cough', 'hacking', 'chesty cough'],
+    'acidity': ['heartburn', 'acid reflux', 'reflux', 'stomach burning', 'burning chest',
+                'burning sensation chest', 'indigestion', 'gerd', 'sour burps'],
+    'fever': ['temperature', 'high temperature', 'feverish', 'pyrexia', 'running hot',
+              'body is hot', 'chills and sweats'],
+    'joint pain': ['joints ache', 'aching joints', 'sore joints', 'joints hurt', 'arthralgia',
+                   'knee pain', 'stiff joints', 'painful joints'],
+}
+
+# Minimum trigram similarity for a misspelt word to count as a vocabulary term
+FUZZY_THRESHOLD = 0.45
+# Alias phrases score slightly below the symptom's own name
+ALIAS_WEIGHT = 0.95
+# Extra words allowed between the words of a multi-word phrase
+MAX_GAP = 3
+
+_SEGMENTS = re.compile(r"[,.;\n!?]+|\band\b|\bbut\b|\balso\b")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def stem(word):
+    """Light suffix stripping: aches/aching/ache -> ach, burning -> burn, painful -> pain."""
+    if len(word) > 4 and word.endswith('ies'):
+        word = word[:-3] + 'y'
+    else:
+        for suffix in ('ing', 'ness', 'ful', 'ish', 'ed', 'ly'):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+                    word = word[:-1]
+                break
+        else:
+            if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+                word = word[:-1]
+    if word.endswith('e') and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    return [stem(w) for w in _NON_WORD.sub(' ', text.lower().replace('_', ' ')).split()]
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MatchIndex:
+    """
+    Immutable inverted index over symptom names and their aliases.
+
+    Every phrase is stored as a bag of stemmed tokens; the token index finds the
+    phrases a query can touch, and a trigram index over the vocabulary maps
+    misspelt words ("hedache", "coughng") to the closest known token. A phrase
+    matches when all of its tokens appear close together within one clause of
+    the text.
+    """
+
+    def __init__(self, symptoms, alias_terms=(), synonyms=SYNONYMS):
+        self.symptoms = {}
+        self.phrases = []           # (symptom_id, tokens, weight)
+        self._seen = set()
+        self.token_index = defaultdict(set)
+        self.trigram_index = defaultdict(set)
+
+        by_name = {}
+        for s in symptoms:
+            self.symptoms[s['id']] = s
+            by_name[' '.join(tokenize(s['name']))] = s['id']
+            self._add_phrase(s['id'], s['name'], 1.0)
+        for name, aliases in synonyms.items():
+            symptom_id = by_name.get(' '.join(tokenize(name)))
+            if symptom_id is not None:
+                for alias in aliases:
+                    self._add_phrase(symptom_id, alias, ALIAS_WEIGHT)
+
+        # Model feature names (high_fever, joint_pain, ...) become aliases of
+        # every symptom whose name they fully contain
+        for term in alias_terms:
+            for symptom_id, score in self._match_segment(tokenize(term)).items():
+                if score >= 1.0:
+                    self._add_phrase(symptom_id, term, ALIAS_WEIGHT)
+
+        for token in self.token_index:
+            for gram in trigrams(token):
+                self.trigram_index[gram].add(token)
+
+    def _add_phrase(self, symptom_id, text, weight):
+        tokens = tuple(tokenize(text))
+        if not tokens or (symptom_id, tokens) in self._seen:
+            return
+        self._seen.add((symptom_id, tokens))
+        phrase_id = len(self.phrases)
+        self.phrases.append((symptom_id, tokens, weight))
+        for token in tokens:
+            self.token_index[token].add(phrase_id)
+
+    def correct(self, token):
+        """
+        Closest vocabulary terms by trigram Jaccard similarity, as [(term, similarity)].
+        Ties are all returned ("acidty" is as close to "acid" as to "acidity").
+        """
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for term in self.trigram_index.get(gram, ()):
+                shared[term] += 1
+        scored = [(term, count / (len(grams) + len(trigrams(term)) - count)) for term, count in shared.items()]
+        best_score = max((score for _, score in scored), default=0.0)
+        if best_score < FUZZY_THRESHOLD:
+            return []
+        return [(term, score) for term, score in scored if score == best_score]
+
+    def _resolve(self, tokens):
+        """Map query tokens to (position, vocabulary term, similarity)."""
+        resolved = []
+        for i, token in enumerate(tokens):
+            if token in self.token_index:
+                resolved.append((i, token, 1.0))
+            elif len(token) >= 4:
+                for term, score in self.correct(token):
+                    resolved.append((i, term, score))
+            # "head ache" -> "headache"
+            if i + 1 < len(tokens):
+                joined = stem(tokens[i] + tokens[i + 1])
+                if joined in self.token_index:
+                    resolved.append((i, joined, 1.0))
+        return resolved
+
+    def _match_segment(self, tokens):
+        positions = defaultdict(list)     # term -> [(position, similarity)]
+        candidates = set()
+        for i, term, score in self._resolve(tokens):
+            positions[term].append((i, score))
+            candidates.update(self.token_index[term])
+
+        scores = {}
+        for phrase_id in candidates:
+            symptom_id, phrase_tokens, weight = self.phrases[phrase_id]
+            if any(t not in positions for t in phrase_tokens):
+                continue
+            # Anchor on each occurrence of the first token and take the nearest
+            # occurrence of every other token
+            best = 0.0
+            for anchor, anchor_score in positions[phrase_tokens[0]]:
+                spots = [anchor]
+                total = anchor_score
+                for t in phrase_tokens[1:]:
+                    pos, s = min(positions[t], key=lambda p: abs(p[0] - anchor))
+                    spots.append(pos)
+                    total += s
+                if max(spots) - min(spots) > len(phrase_tokens) - 1 + MAX_GAP:
+                    continue
+                best = max(best, weight * total / len(phrase_tokens))
+            if best > scores.get(symptom_id, 0.0):
+                scores[symptom_id] = best
+        return scores
+
+    def match(self, text, limit=None):
+        """Rank the symptoms described in free text. Returns [(symptom dict, score), ...]."""
+        scores = {}
+        order = {}
+        for segment in _SEGMENTS.split(text.lower()):
+            tokens = tokenize(segment)
+            if not tokens:
+                continue
+            for symptom_id, score in self._match_segment(tokens).items():
+                order.setdefault(symptom_id, len(order))
+                scores[symptom_id] = max(score, scores.get(symptom_id, 0.0))
+        ranked = sorted(scores, key=lambda sid: (-scores[sid], order[sid]))
+        if limit:
+            ranked = ranked[:limit]
+        return [(self.symptoms[sid], round(scores[sid], 3)) for sid in ranked]
+
+
+class SymptomMatcher:
+    """
+    MatchIndex kept in step with a SymptomGraph: the index is rebuilt the first
+    time it is used after the graph's version changes.
+    """
+
+    def __init__(self, graph, alias_source=None):
+        self.graph = graph
+        self.alias_source = alias_source
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def _alias_terms(self):
+        if self.alias_source is None:
+            return []
+        try:
+            return self.alias_source()
+        except Exception as e:
+            log_event("symptom_matcher.aliases_unavailable", level=logging.WARNING, error=str(e))
+            return []
+
+    def index(self):
+        snapshot = self.graph.snapshot()
+        index = self._index
+        if index is not None and self._version == snapshot.version:
+            return index
+        with self._lock:
+            if self._index is None or self._version != snapshot.version:
+                self._index = MatchIndex(snapshot.symptoms.values(), self._alias_terms())
+                self._version = snapshot.version
+            return self._index
+
+    def match(self, text, limit=None):
+        return self.index().match(text, limit)